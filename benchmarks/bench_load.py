@@ -0,0 +1,194 @@
+"""Load test end-to-end: banyak editor simulasi menjalankan alur lengkap terhadap Bot API tiruan.
+
+Setiap editor: /start → Multiple Post → kirim N gambar → Add Linkbutton → kirim button → /done.
+Update dimasukkan ke update_queue (seperti webhook) dan diproses oleh handler asli di main.py.
+
+Jalankan dari root repo:
+    python benchmarks/bench_load.py --editors 200 --posts 2 --photos 3 --latency 0.02 --retry-rate 0.05
+Exit status 0 kalau semua editor menyelesaikan alurnya, 1 kalau ada langkah yang gagal, 2 untuk argumen salah.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FIRST_EDITOR = 10000
+MAX_EDITORS = 5000
+CHANNEL_ID = -1001000000000
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123:bench")
+os.environ["AUTHORIZED_USERS"] = ",".join(str(FIRST_EDITOR + i) for i in range(MAX_EDITORS))
+os.environ["CHANNEL_ID"] = str(CHANNEL_ID)
+os.environ["DRAFT_STORE"] = "memory"
+os.environ["SCHEDULE_DB_PATH"] = ":memory:"
+os.environ["OUTBOX_DB_PATH"] = ":memory:"
+os.environ["BUTTON_SETS_DB_PATH"] = ":memory:"
+os.environ["POST_INDEX_DB_PATH"] = ":memory:"
+os.environ["IMAGE_CACHE_DB_PATH"] = ":memory:"
+os.environ["METRICS_PORT"] = "0"
+# Batas anti-spam bot sendiri dibuat longgar; yang diukur adalah handler dan Bot API
+os.environ.setdefault("POST_LIMIT", "1000000")
+os.environ.setdefault("CHANNEL_RATE_PER_MINUTE", "1000000")
+os.environ.setdefault("CHANNEL_BURST", "1000")
+os.environ.setdefault("GLOBAL_RATE_PER_SECOND", "1000000")
+
+from telegram import Update  # noqa: E402
+from telegram.ext import TypeHandler  # noqa: E402
+
+import callbacks  # noqa: E402
+import main  # noqa: E402
+from callbacks import decode_callback  # noqa: E402
+from fake_bot_api import (  # noqa: E402
+    FakeBotAPI, callback_update, command_update, find_callback_data, photo_update, text_update,
+)
+
+
+def _action(action):
+    return lambda data: (decode_callback(data) or ("",))[0] == action
+
+
+class Harness:
+    def __init__(self, app, fake):
+        self.app = app
+        self.fake = fake
+        self.latencies = []
+        self.failed_steps = 0
+        self.dropped = 0
+        self._update_ids = iter(range(1, 1 << 62))
+        self._waiting = {}  # update_id -> (waktu masuk, Event)
+        # Group terakhir: update dianggap selesai setelah semua handler (termasuk persist_draft) jalan
+        app.add_handler(TypeHandler(Update, self._finished), group=100)
+        # Update yang dibuang di intake tidak pernah sampai ke _finished
+        main.update_processor.on_drop = self._dropped
+
+    async def _finished(self, update, context):
+        queued_at, event = self._waiting.pop(update.update_id)
+        self.latencies.append(time.perf_counter() - queued_at)
+        event.set()
+
+    def _dropped(self, update, reason):
+        self.dropped += 1
+        self._waiting.pop(update.update_id)[1].set()
+
+    async def send(self, payload):
+        update_id = next(self._update_ids)
+        event = asyncio.Event()
+        self._waiting[update_id] = (time.perf_counter(), event)
+        await self.app.update_queue.put(Update.de_json(dict(payload, update_id=update_id), self.app.bot))
+        await asyncio.wait_for(event.wait(), 60)
+
+    async def press(self, user_id, action):
+        data = find_callback_data(self.fake.last_markup.get(user_id), _action(action))
+        if data is None:
+            # Handler sebelumnya gagal (misalnya kena RetryAfter), tombol tidak pernah tampil
+            self.failed_steps += 1
+            return False
+        await self.send(callback_update(user_id, data))
+        return True
+
+    async def editor(self, user_id, posts, photos):
+        for post in range(posts):
+            await self.send(command_update(user_id, "/start"))
+            if not await self.press(user_id, callbacks.CREATE_MULTIPLE):
+                continue
+            for photo in range(photos):
+                await self.send(photo_update(user_id, f"photo-{user_id}-{post}-{photo}", f"Caption {post}.{photo}"))
+            if await self.press(user_id, callbacks.ADD_LINK):
+                await self.send(text_update(user_id, "🎵 Spotify - https://open.spotify.com/track/bench"))
+            await self.send(command_update(user_id, "/done"))
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+def _published(fake):
+    """Jumlah post yang benar-benar sampai ke channel (panggilan yang dibalas 429 tidak tercatat)."""
+    count = 0
+    for method, params in fake.calls:
+        if str(params.get("chat_id")) != str(CHANNEL_ID):
+            continue
+        if method == "sendPhoto":
+            count += 1
+        elif method == "sendMediaGroup":
+            count += len(params.get("media", []))
+    return count
+
+
+async def run(args):
+    fake = FakeBotAPI(
+        latency=args.latency,
+        retry_after_rate=args.retry_rate,
+        retry_after=args.retry_after,
+        retry_after_chats=None if args.retry_all else {CHANNEL_ID},
+        seed=1,
+    )
+    await fake.start()
+
+    app = main.build_application(base_url=fake.base_url)
+    harness = Harness(app, fake)
+    await app.initialize()
+    await main.post_init(app)
+    await app.start()
+    fake.reset_stats()
+
+    editors = [FIRST_EDITOR + i for i in range(args.editors)]
+    start = time.perf_counter()
+    await asyncio.gather(*(harness.editor(user_id, args.posts, args.photos) for user_id in editors))
+    handled = time.perf_counter() - start
+    # post_stop menunggu antrian publish kosong
+    await app.stop()
+    await main.post_stop(app)
+    total = time.perf_counter() - start
+    await app.shutdown()
+    await fake.stop()
+
+    updates = len(harness.latencies)
+    api_calls = sum(count for method, count in fake.call_counts.items() if method != "429")
+    published = _published(fake)
+    print(f"editor={args.editors} draft/editor={args.posts} gambar/draft={args.photos} "
+          f"latency={args.latency * 1000:.0f}ms retry_rate={args.retry_rate}")
+    print(f"updates: {updates} dalam {handled:.2f}s → {updates / handled:.0f} updates/s")
+    print(f"handler latency: p50={_percentile(harness.latencies, 0.5) * 1000:.1f}ms "
+          f"p99={_percentile(harness.latencies, 0.99) * 1000:.1f}ms "
+          f"max={max(harness.latencies, default=0) * 1000:.1f}ms")
+    print(f"publish selesai setelah {total:.2f}s; post di channel: {published}")
+    print(f"Bot API calls: {api_calls} total, {api_calls / max(published, 1):.2f} per post terkirim "
+          f"(RetryAfter: {fake.call_counts['429']})")
+    for method, count in fake.call_counts.most_common():
+        if method != "429":
+            print(f"  {method:<24} {count}")
+    if harness.failed_steps:
+        print(f"langkah editor yang gagal (tombol tidak muncul): {harness.failed_steps}")
+    if harness.dropped:
+        print(f"update yang dibuang di intake: {harness.dropped}")
+    # Exit status: 0 kalau semua editor menyelesaikan alurnya, 1 kalau ada langkah yang gagal
+    return 1 if harness.failed_steps else 0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("editors_arg", nargs="?", type=int, metavar="editors",
+                        help="jumlah editor (sama dengan --editors)")
+    parser.add_argument("--editors", type=int, default=100)
+    parser.add_argument("--posts", type=int, default=1, help="jumlah draft yang di-publish per editor")
+    parser.add_argument("--photos", type=int, default=3, help="jumlah gambar per draft")
+    parser.add_argument("--latency", type=float, default=0.0, help="latency Bot API tiruan (detik)")
+    parser.add_argument("--retry-rate", type=float, default=0.0, help="peluang 429 RetryAfter per panggilan kirim")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--retry-all", action="store_true",
+                        help="RetryAfter juga untuk chat editor (default: hanya ke channel)")
+    args = parser.parse_args()
+    if args.editors_arg is not None:
+        args.editors = args.editors_arg
+    if not 1 <= args.editors <= MAX_EDITORS:
+        parser.error(f"--editors harus antara 1 dan {MAX_EDITORS}")
+    return args
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(run(parse_args())))
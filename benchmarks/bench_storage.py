@@ -0,0 +1,107 @@
+"""Overhead persistensi draft per update (hook load/persist) dan biaya flush write-behind.
+
+Jalankan dari root repo:  python benchmarks/bench_storage.py [jumlah_user] [post_per_draft]
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123:bench")
+os.environ.setdefault("AUTHORIZED_USERS", "1000")
+
+from telegram import InlineKeyboardButton, Update  # noqa: E402
+
+import main  # noqa: E402
+from sessions import Post, PostData  # noqa: E402
+from storage import DraftPersistence, SQLiteDraftBackend, dump_post_data  # noqa: E402
+
+
+def _update(user_id):
+    return Update.de_json({
+        "update_id": 1,
+        "message": {
+            "message_id": 1, "date": 0, "text": "x",
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "u"},
+        },
+    }, None)
+
+
+def _draft(size):
+    post_data = PostData(is_multiple=True)
+    for i in range(size):
+        buttons = [InlineKeyboardButton(f"Link {j}", url=f"https://example.com/{i}/{j}") for j in range(2)]
+        post_data.entries.append(Post(f"AgACAgUAAxkBAAI{i:020d}", f"Caption post {i} " * 5, buttons))
+    return post_data
+
+
+def _report(name, samples):
+    us = sorted(x * 1e6 for x in samples)
+    p = lambda q: us[min(len(us) - 1, int(q * len(us)))]
+    print(f"{name:<34} n={len(us):<6} mean={statistics.mean(us):8.1f}µs  p50={p(0.5):8.1f}µs  p99={p(0.99):8.1f}µs")
+
+
+async def _timed(fn, updates):
+    samples = []
+    for update in updates:
+        start = time.perf_counter()
+        await fn(update, None)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def run(users, size):
+    path = os.path.join(tempfile.mkdtemp(), "drafts.sqlite3")
+    main.drafts = DraftPersistence(lambda: SQLiteDraftBackend(path), flush_interval=3600)
+    main.posts = main.SessionStore(max_entries=users * 2)
+    await main.drafts.start()
+
+    for user_id in range(users):
+        main.posts[user_id] = _draft(size)
+
+    updates = [_update(random.randrange(users)) for _ in range(20000)]
+    _report("persist_draft (mark_dirty)", await _timed(main.persist_draft, updates))
+    _report("load_draft (draft di memori)", await _timed(main.load_draft, updates))
+
+    # Serialisasi berjalan di event loop, penulisan SQLite di thread terpisah
+    pending = list(main.drafts._dirty.values())
+    start = time.perf_counter()
+    for post_data in pending:
+        dump_post_data(post_data)
+    serialize = time.perf_counter() - start
+    start = time.perf_counter()
+    await main.drafts.flush()
+    total = time.perf_counter() - start
+    print(f"flush {len(pending)} draft x {size} post: serialisasi di loop {serialize * 1000:.1f}ms "
+          f"({serialize / len(pending) * 1e6:.0f}µs/draft), total termasuk tulis SQLite {total * 1000:.1f}ms")
+
+    # Simulasi restart: memori kosong, draft dimuat lazy dari disk
+    main.posts = main.SessionStore(max_entries=users * 2)
+    main.drafts._missing.clear()
+    cold = [_update(user_id) for user_id in range(users)]
+    _report("load_draft (cold, dari SQLite)", await _timed(main.load_draft, cold))
+    _report("load_draft (user tanpa draft)", await _timed(main.load_draft, [_update(users + i) for i in range(users)]))
+    _report("load_draft (tanpa draft, cache)", await _timed(main.load_draft, [_update(users + i) for i in range(users)]))
+
+    await main.drafts.stop()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("users", nargs="?", type=int, default=500, metavar="jumlah_user", help="jumlah user dengan draft")
+    parser.add_argument("size", nargs="?", type=int, default=20, metavar="post_per_draft", help="jumlah post per draft")
+    args = parser.parse_args()
+    if args.users < 1 or args.size < 1:
+        parser.error("jumlah_user dan post_per_draft minimal 1")
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    asyncio.run(run(args.users, args.size))
@@ -0,0 +1,124 @@
+"""Latency update → handler: polling vs webhook, terhadap Bot API tiruan lokal.
+
+Jalankan dari root repo:  python benchmarks/bench_webhook.py [jumlah_update]
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123:bench")
+os.environ.setdefault("AUTHORIZED_USERS", "1000")
+# Draft disimpan di direktori sementara, bukan drafts.sqlite3 di direktori tempat benchmark dijalankan
+_tmpdir = tempfile.TemporaryDirectory()
+os.environ["DRAFT_DB_PATH"] = os.path.join(_tmpdir.name, "drafts.sqlite3")
+os.environ.setdefault("SCHEDULE_DB_PATH", ":memory:")
+os.environ.setdefault("OUTBOX_DB_PATH", ":memory:")
+os.environ.setdefault("BUTTON_SETS_DB_PATH", ":memory:")
+os.environ.setdefault("POST_INDEX_DB_PATH", ":memory:")
+os.environ.setdefault("IMAGE_CACHE_DB_PATH", ":memory:")
+
+from telegram import Update  # noqa: E402
+from telegram.ext import TypeHandler  # noqa: E402
+
+import main  # noqa: E402
+from fake_bot_api import FakeBotAPI, command_update  # noqa: E402
+from webhook import serve_webhook  # noqa: E402
+
+USER_ID = 1000
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _instrument(app, fake, latencies):
+    arrived = {}
+
+    async def probe(update, context):
+        latencies.append(time.perf_counter() - fake.sent_at[update.update_id])
+        arrived[update.update_id].set()
+
+    # Update yang dibuang di intake tidak sampai ke probe; jangan biarkan _drive menunggu sampai timeout
+    main.update_processor.on_drop = lambda update, reason: arrived[update.update_id].set()
+    # Group tersendiri paling awal, supaya tidak bentrok dengan handler lain di group -1
+    app.add_handler(TypeHandler(Update, probe), group=-100)
+    return arrived
+
+
+async def _drive(fake, arrived, count):
+    for _ in range(count):
+        event = asyncio.Event()
+        # update_id berikutnya sudah bisa ditebak karena inject berurutan
+        arrived[len(fake.sent_at) + 1] = event
+        await fake.inject(command_update(USER_ID, "/start"))
+        await asyncio.wait_for(event.wait(), 10)
+
+
+async def bench_polling(count):
+    fake = FakeBotAPI()
+    await fake.start()
+    latencies = []
+    app = main.build_application(base_url=fake.base_url)
+    arrived = _instrument(app, fake, latencies)
+    async with app:
+        await app.updater.start_polling(poll_interval=0, timeout=10)
+        await app.start()
+        await _drive(fake, arrived, count)
+        await app.updater.stop()
+        await app.stop()
+    await fake.stop()
+    return latencies
+
+
+async def bench_webhook(count):
+    fake = FakeBotAPI()
+    await fake.start()
+    latencies = []
+    app = main.build_application(base_url=fake.base_url)
+    arrived = _instrument(app, fake, latencies)
+    port = _free_port()
+    stop = asyncio.Event()
+    server = asyncio.create_task(serve_webhook(
+        app, listen="127.0.0.1", port=port, url_path="/telegram",
+        webhook_url=f"http://127.0.0.1:{port}/telegram", secret_token="bench-secret", stop_event=stop,
+    ))
+    while fake._webhook is None:
+        await asyncio.sleep(0.01)
+    await _drive(fake, arrived, count)
+    stop.set()
+    await server
+    await fake.stop()
+    return latencies
+
+
+def _report(name, latencies):
+    ms = sorted(x * 1000 for x in latencies)
+    p = lambda q: ms[min(len(ms) - 1, int(q * len(ms)))]
+    print(f"{name:<8} n={len(ms):<5} mean={statistics.mean(ms):7.3f}ms  p50={p(0.5):7.3f}ms  "
+          f"p95={p(0.95):7.3f}ms  p99={p(0.99):7.3f}ms")
+
+
+async def run(count):
+    _report("polling", await bench_polling(count))
+    _report("webhook", await bench_webhook(count))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("updates", nargs="?", type=int, default=300, metavar="jumlah_update", help="jumlah update per mode")
+    args = parser.parse_args()
+    if args.updates < 1:
+        parser.error("jumlah_update minimal 1")
+    return args
+
+
+if __name__ == "__main__":
+    asyncio.run(run(parse_args().updates))
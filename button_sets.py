@@ -0,0 +1,128 @@
+"""Set button bernama per user, dipakai ulang di banyak post tanpa menyalin button-nya.
+
+Satu ButtonSet (lihat buttons.py) immutable dan keyboard-nya dibangun sekali; semua post yang
+memakai set itu (di preview, draft tersimpan, dan saat publish) memegang referensi ke objek yang sama.
+"""
+import asyncio
+import json
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from buttons import ButtonSet
+from storage import open_database
+
+MAX_SETS_PER_USER = 50
+_NAME = re.compile(r"^[\w-]{1,32}$")
+
+
+def normalize_name(name):
+    """Nama set dalam huruf kecil, atau None jika tidak valid (huruf, angka, _ dan -, maks. 32)."""
+    name = (name or "").strip().lower()
+    return name if _NAME.match(name) else None
+
+
+def parse_post_range(text, count, current):
+    """Ubah "all", "3" atau "2-5" jadi range index post (0-based); kosong = post `current`. None jika tidak valid."""
+    text = (text or "").strip().lower()
+    if not text:
+        return range(current, current + 1)
+    if text in ("all", "semua"):
+        return range(count)
+    first, _, last = text.partition("-")
+    try:
+        first = int(first)
+        last = int(last) if last else first
+    except ValueError:
+        return None
+    if not 1 <= first <= last <= count:
+        return None
+    return range(first - 1, last)
+
+
+class ButtonSetStore:
+    """Tabel button_sets; semua method dipanggil dari satu thread penulis."""
+
+    def __init__(self, path):
+        self._conn = open_database(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS button_sets ("
+            " user_id INTEGER NOT NULL,"
+            " name TEXT NOT NULL,"
+            " buttons TEXT NOT NULL,"
+            " updated_at REAL NOT NULL,"
+            " PRIMARY KEY (user_id, name))"
+        )
+
+    def load_user(self, user_id):
+        rows = self._conn.execute(
+            "SELECT name, buttons FROM button_sets WHERE user_id = ? ORDER BY name", (user_id,)
+        ).fetchall()
+        return [(name, json.loads(buttons)) for name, buttons in rows]
+
+    def save(self, user_id, name, buttons):
+        self._conn.execute(
+            "INSERT INTO button_sets (user_id, name, buttons, updated_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(user_id, name) DO UPDATE SET buttons = excluded.buttons, updated_at = excluded.updated_at",
+            (user_id, name, json.dumps(buttons), time.time())
+        )
+
+    def delete(self, user_id, name):
+        self._conn.execute("DELETE FROM button_sets WHERE user_id = ? AND name = ?", (user_id, name))
+
+    def close(self):
+        self._conn.close()
+
+
+class ButtonSets:
+    """Set button semua user: dibaca dari SQLite sekali per user lalu di-cache, ditulis langsung (write-through)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._cache = {}  # user_id -> {nama: ButtonSet}
+        self._store = None
+        self._executor = None
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def start(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="button-sets")
+        self._store = await self._run(ButtonSetStore, self.path)
+
+    async def stop(self):
+        if self._store is not None:
+            await self._run(self._store.close)
+            self._store = None
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        self._cache.clear()
+
+    async def for_user(self, user_id):
+        """Dict nama → ButtonSet milik user (jangan diubah langsung)."""
+        sets = self._cache.get(user_id)
+        if sets is None:
+            rows = await self._run(self._store.load_user, user_id)
+            sets = self._cache[user_id] = {name: ButtonSet.load(name, data) for name, data in rows}
+        return sets
+
+    async def get(self, user_id, name):
+        return (await self.for_user(user_id)).get(name)
+
+    async def save(self, user_id, name, buttons):
+        """Simpan (atau ganti) set; kembalikan ButtonSet baru, atau None jika user sudah punya terlalu banyak set."""
+        sets = await self.for_user(user_id)
+        if name not in sets and len(sets) >= MAX_SETS_PER_USER:
+            return None
+        button_set = ButtonSet(name, buttons)
+        await self._run(self._store.save, user_id, name, button_set.dump())
+        sets[name] = button_set
+        return button_set
+
+    async def delete(self, user_id, name):
+        sets = await self.for_user(user_id)
+        if sets.pop(name, None) is None:
+            return False
+        await self._run(self._store.delete, user_id, name)
+        return True
@@ -0,0 +1,53 @@
+"""Parsing tombol link dalam format "Nama Button - URL" (satu baris satu button) dan set button bernama."""
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+
+def parse_button_lines(text):
+    """Kembalikan (list InlineKeyboardButton, list pesan error) dari teks beberapa baris."""
+    buttons = []
+    errors = []
+    for line in text.split("\n"):
+        if not line.strip():  # Skip empty lines
+            continue
+
+        button_data = line.split("-", 1)
+        if len(button_data) != 2:
+            errors.append(f"❌ Format salah (Nama Button - URL): {line}")
+            continue
+
+        button_name = button_data[0].strip()
+        button_url = button_data[1].strip()
+
+        if not button_name:
+            errors.append(f"❌ Nama button tidak boleh kosong: {line}")
+            continue
+
+        if not button_url.startswith("http"):
+            errors.append(f"❌ URL harus dimulai dengan http: {button_url}")
+            continue
+
+        buttons.append(InlineKeyboardButton(button_name, url=button_url))
+    return buttons, errors
+
+
+class ButtonSet:
+    """Set button yang tidak bisa diubah; mengganti isi set berarti membuat objek baru."""
+
+    __slots__ = ("name", "buttons", "markup")
+
+    def __init__(self, name, buttons):
+        buttons = tuple(buttons)
+        object.__setattr__(self, "name", name)
+        object.__setattr__(self, "buttons", buttons)
+        # Dibangun sekali di sini; preview dan publish memakai objek markup yang sama
+        object.__setattr__(self, "markup", InlineKeyboardMarkup([[button] for button in buttons]))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ButtonSet tidak bisa diubah, simpan sebagai set baru")
+
+    def dump(self):
+        return [[button.text, button.url] for button in self.buttons]
+
+    @classmethod
+    def load(cls, name, data):
+        return cls(name, [InlineKeyboardButton(text, url=url) for text, url in data])
@@ -0,0 +1,35 @@
+"""Format callback_data yang ringkas dan berversi: "<versi>:<aksi>:<index post>:<revisi draft>"."""
+
+CALLBACK_VERSION = "1"
+
+# Kode aksi (satu karakter) untuk setiap tombol inline
+CREATE_SINGLE = "s"
+CREATE_MULTIPLE = "m"
+BACK_TO_PREVIEW = "b"
+NEXT_PREVIEW = "n"
+PREV_PREVIEW = "p"
+ADD_LINK = "a"
+DELETE_LINK = "d"
+DONE = "D"
+SCHEDULE = "S"
+CANCEL = "x"
+# Index berisi id job publish, bukan index post
+REPUBLISH = "R"
+# Index berisi id operasi massal (lihat post_index.py)
+BULK_CONFIRM = "B"
+BULK_CANCEL = "C"
+
+
+def encode_callback(action, index=0, revision=0):
+    return f"{CALLBACK_VERSION}:{action}:{index}:{revision}"
+
+
+def decode_callback(data):
+    """Kembalikan (aksi, index, revisi), atau None untuk data lama/rusak."""
+    parts = (data or "").split(":")
+    if len(parts) != 4 or parts[0] != CALLBACK_VERSION:
+        return None
+    try:
+        return parts[1], int(parts[2]), int(parts[3])
+    except ValueError:
+        return None
@@ -0,0 +1,245 @@
+"""Mode cluster: satu proses front menerima webhook lalu meneruskan update ke beberapa proses worker.
+
+Update dirutekan per user (`user_id % jumlah worker`), jadi draft, lock dan cache satu user selalu
+ada di worker yang sama tanpa state bersama di memori; publish ikut tersebar ke banyak core.
+
+Front hanya mem-parse JSON untuk mencari user, menaruh body mentah di antrian worker tujuan, dan
+langsung membalas Telegram. Satu forwarder per worker mengirim antrian itu berurutan (urutan update
+per user terjaga). Saat worker restart (crash, atau rolling restart lewat SIGHUP), update untuk
+worker itu menunggu di antrian front; worker lama menyelesaikan update yang sudah diterima dan
+menyimpan draft ke disk, lalu worker baru memuat draft tersebut saat user kembali.
+"""
+import asyncio
+import hmac
+import logging
+import os
+import secrets
+import signal
+import sys
+
+import httpx
+from telegram import Bot, Update
+
+import metrics
+from metrics import Gauge
+from webhook import SECRET_HEADER, HTTPServer, json_response
+
+logger = logging.getLogger(__name__)
+
+# Batas update yang boleh menunggu per worker; lebih dari ini Telegram diminta mengulang (503)
+MAX_PENDING_PER_WORKER = 10000
+RESTART_DELAY = 1.0
+# Backoff forwarder saat worker belum siap (detik)
+FORWARD_RETRY_MIN = 0.05
+FORWARD_RETRY_MAX = 1.0
+
+
+def routing_key(data):
+    """user_id pengirim update (message, callback_query, ...), atau id chat jika tidak ada pengirim."""
+    for value in data.values():
+        if not isinstance(value, dict):
+            continue
+        sender = value.get("from") or value.get("user")
+        if isinstance(sender, dict) and isinstance(sender.get("id"), int):
+            return sender["id"]
+        chat = value.get("chat") or (value.get("message") or {}).get("chat")
+        if isinstance(chat, dict) and isinstance(chat.get("id"), int):
+            return chat["id"]
+    return 0
+
+
+class WorkerProcess:
+    """Satu proses worker beserta antrian update yang menunggu diteruskan kepadanya."""
+
+    def __init__(self, index, count, command, port, url_path, secret):
+        self.index = index
+        self.count = count
+        self.command = command
+        self.port = port
+        self.url = f"http://127.0.0.1:{port}{url_path}"
+        self.secret = secret
+        self.queue = asyncio.Queue(MAX_PENDING_PER_WORKER)
+        self.process = None
+        self.restarts = 0
+        self._exited = asyncio.Event()
+
+    def _env(self):
+        return dict(
+            os.environ,
+            BOT_MODE="worker",
+            WORKER_INDEX=str(self.index),
+            WORKER_COUNT=str(self.count),
+            WORKER_PORT=str(self.port),
+            CLUSTER_SECRET=self.secret,
+            # Metrik worker disajikan di listener internalnya (127.0.0.1:WORKER_PORT/metrics)
+            METRICS_PORT="0",
+        )
+
+    async def supervise(self, stopping):
+        """Jalankan worker dan hidupkan lagi setiap kali prosesnya berhenti, sampai `stopping` di-set."""
+        while not stopping.is_set():
+            self._exited.clear()
+            self.process = await asyncio.create_subprocess_exec(*self.command, env=self._env())
+            code = await self.process.wait()
+            self._exited.set()
+            if stopping.is_set():
+                break
+            self.restarts += 1
+            logger.warning("Worker %d berhenti (exit %s), dijalankan ulang dalam %ss", self.index, code, RESTART_DELAY)
+            await asyncio.sleep(RESTART_DELAY)
+
+    async def terminate(self):
+        """Minta worker berhenti dengan rapi (SIGTERM) dan tunggu prosesnya selesai."""
+        if self.process is not None and self.process.returncode is None:
+            self.process.send_signal(signal.SIGTERM)
+            await self._exited.wait()
+
+    async def wait_ready(self, client, timeout=60):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while loop.time() < deadline:
+            try:
+                response = await client.get(f"http://127.0.0.1:{self.port}/healthz")
+                if response.status_code == 200:
+                    return True
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+        return False
+
+    async def forward(self, client):
+        """Kirim antrian ke worker satu per satu; update yang gagal diteruskan dicoba terus sampai worker siap."""
+        headers = {SECRET_HEADER: self.secret, "Content-Type": "application/json"}
+        while True:
+            body = await self.queue.get()
+            delay = FORWARD_RETRY_MIN
+            while True:
+                try:
+                    response = await client.post(self.url, content=body, headers=headers)
+                    if response.status_code == 200:
+                        break
+                    if response.status_code in (400, 403, 413):
+                        # Tidak akan berhasil walau diulang
+                        logger.warning("Worker %d menolak update (HTTP %d)", self.index, response.status_code)
+                        break
+                except httpx.HTTPError:
+                    pass
+                # Worker sedang start / stop (503) atau belum mendengarkan
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, FORWARD_RETRY_MAX)
+            self.queue.task_done()
+
+
+def add_front_routes(server, workers, url_path, secret_token=None):
+    async def receive_update(request):
+        if secret_token:
+            received = request.headers.get(SECRET_HEADER, "")
+            if not hmac.compare_digest(received.encode(), secret_token.encode()):
+                return 403, b"", "text/plain"
+        try:
+            data = request.json()
+        except ValueError:
+            return 400, b"", "text/plain"
+        if not isinstance(data, dict):
+            return 400, b"", "text/plain"
+
+        worker = workers[routing_key(data) % len(workers)]
+        try:
+            worker.queue.put_nowait(request.body)
+        except asyncio.QueueFull:
+            # Telegram akan mengirim ulang update ini nanti
+            return 503, b"", "text/plain"
+        return 200, b"", "text/plain"
+
+    async def health(request):
+        running = sum(1 for worker in workers if worker.process is not None and worker.process.returncode is None)
+        status = 200 if running == len(workers) else 503
+        return json_response({
+            "workers": len(workers),
+            "running": running,
+            "pending": [worker.queue.qsize() for worker in workers],
+        }, status)
+
+    server.route("POST", url_path, receive_update)
+    server.route("GET", "/healthz", health)
+
+
+async def serve_cluster(token, command, *, workers, listen, port, url_path, webhook_url, secret_token=None,
+                        worker_base_port=9200, drain_timeout=30, server=None, metrics_server=None):
+    """Jalankan front dan `workers` proses worker sampai SIGINT/SIGTERM; SIGHUP = rolling restart worker.
+
+    `server` boleh diisi HTTPServer yang sudah punya route lain (misalnya /metrics); `metrics_server`
+    berupa (HTTPServer, host, port) untuk listener metrik terpisah.
+    """
+    internal_secret = secrets.token_hex(16)
+    processes = [
+        WorkerProcess(index, workers, command, worker_base_port + index, url_path, internal_secret)
+        for index in range(workers)
+    ]
+    metrics.registry.register(Gauge(
+        "bot_cluster_pending_updates", "Update yang menunggu diteruskan ke worker",
+        lambda: sum(worker.queue.qsize() for worker in processes)))
+    metrics.registry.register(Gauge(
+        "bot_cluster_worker_restarts", "Jumlah worker yang dijalankan ulang setelah berhenti",
+        lambda: sum(worker.restarts for worker in processes)))
+
+    server = server or HTTPServer()
+    add_front_routes(server, processes, url_path, secret_token)
+
+    stop_event = asyncio.Event()
+    restart_requested = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig, callback in ((signal.SIGINT, stop_event.set), (signal.SIGTERM, stop_event.set),
+                          (signal.SIGHUP, restart_requested.set)):
+        try:
+            loop.add_signal_handler(sig, callback)
+        except (NotImplementedError, AttributeError):
+            pass
+
+    stopping = asyncio.Event()
+    async with httpx.AsyncClient(timeout=10, limits=httpx.Limits(max_keepalive_connections=workers)) as client:
+        supervisors = [asyncio.create_task(worker.supervise(stopping)) for worker in processes]
+        forwarders = [asyncio.create_task(worker.forward(client)) for worker in processes]
+        try:
+            await server.start(listen, port)
+            if metrics_server:
+                await metrics_server[0].start(*metrics_server[1:])
+            async with Bot(token) as bot:
+                await bot.set_webhook(
+                    url=webhook_url,
+                    secret_token=secret_token or None,
+                    allowed_updates=Update.ALL_TYPES,
+                )
+            logger.info("Front cluster aktif di %s:%s%s → %d worker", listen, server.port, url_path, workers)
+
+            while not stop_event.is_set():
+                waiters = [asyncio.create_task(stop_event.wait()), asyncio.create_task(restart_requested.wait())]
+                await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+                for waiter in waiters:
+                    waiter.cancel()
+                if restart_requested.is_set() and not stop_event.is_set():
+                    restart_requested.clear()
+                    # Satu per satu: worker lain tetap melayani user-nya selama satu worker berganti
+                    for worker in processes:
+                        logger.info("Rolling restart worker %d", worker.index)
+                        await worker.terminate()
+                        if not await worker.wait_ready(client):
+                            logger.warning("Worker %d belum siap setelah restart", worker.index)
+        finally:
+            await server.stop()
+            if metrics_server:
+                await metrics_server[0].stop()
+            try:
+                # Teruskan update yang sudah diterima sebelum worker dimatikan
+                await asyncio.wait_for(asyncio.gather(*(worker.queue.join() for worker in processes)), drain_timeout)
+            except asyncio.TimeoutError:
+                logger.warning("%d update belum diteruskan saat shutdown", sum(w.queue.qsize() for w in processes))
+            stopping.set()
+            for task in forwarders:
+                task.cancel()
+            await asyncio.gather(*(worker.terminate() for worker in processes))
+            await asyncio.gather(*forwarders, *supervisors, return_exceptions=True)
+
+
+def worker_command(script):
+    return [sys.executable, os.path.abspath(script)]
@@ -0,0 +1,248 @@
+"""Pemrosesan update secara paralel antar user, tetapi berurutan untuk user yang sama.
+
+Sebelum masuk handler, setiap update melewati tahap intake yang membuang kerja sia-sia:
+update_id yang sudah pernah diterima (Telegram mengirim ulang), tap tombol yang sama berulang
+kali dalam jendela singkat, dan callback yang sudah terlalu lama menunggu untuk dijawab. Jumlah
+update yang sedang menunggu atau diproses juga dibatasi (total dan per user); update di atas batas
+itu dibuang, bukan menumpuk sebagai task tanpa batas.
+"""
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+
+from telegram import Update
+from telegram.error import TelegramError
+from telegram.ext import BaseUpdateProcessor
+
+from metrics import Counter, registry
+
+# Batas semaphore bawaan PTB; batas sebenarnya dipegang oleh `_workers` (lihat do_process_update)
+_UNBOUNDED = 1 << 30
+
+# Prioritas slot worker: tombol dan perintah editor dulu, baru pesan biasa (foto, link, import)
+INTERACTIVE = 0
+BULK = 1
+
+DUPLICATE = "duplicate"
+REPEATED_TAP = "repeated_tap"
+STALE_CALLBACK = "stale_callback"
+OVERLOADED = "overloaded"
+
+dropped_updates = registry.register(Counter(
+    "bot_updates_dropped_total", "Update yang dibuang sebelum sampai ke handler", ("reason",)))
+
+
+def update_priority(update):
+    if update.callback_query is not None:
+        return INTERACTIVE
+    message = update.message
+    if message is not None and message.text and message.text.startswith("/"):
+        return INTERACTIVE
+    return BULK
+
+
+class PrioritySlots:
+    """Semaphore dengan antrian per prioritas: slot yang dilepas diberikan ke prioritas terkecil dulu."""
+
+    __slots__ = ("_free", "_waiters")
+
+    def __init__(self, limit, levels=2):
+        self._free = limit
+        self._waiters = tuple(deque() for _ in range(levels))
+
+    @property
+    def waiting(self):
+        return sum(len(waiters) for waiters in self._waiters)
+
+    async def acquire(self, priority):
+        if self._free and not self.waiting:
+            self._free -= 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[priority].append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Slot sudah diserahkan ke kita tepat sebelum dibatalkan: teruskan ke yang lain
+                self.release()
+            else:
+                self._waiters[priority].remove(future)
+            raise
+
+    def release(self):
+        for waiters in self._waiters:
+            while waiters:
+                future = waiters.popleft()
+                if not future.done():
+                    # Serahkan slot langsung, tanpa melewati _free, supaya tidak diserobot
+                    future.set_result(None)
+                    return
+        self._free += 1
+
+    @asynccontextmanager
+    async def slot(self, priority):
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+class _UserLock:
+    __slots__ = ("lock", "users")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0  # jumlah pemegang + yang sedang antre
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Update dari user berbeda berjalan bersamaan; update dari satu user diproses sesuai urutan masuk.
+
+    Lock per user diambil *sebelum* slot worker, sehingga user yang menekan tombol berkali-kali
+    hanya mengantre di lock-nya sendiri dan tidak menghabiskan slot milik editor lain. Saat semua
+    slot terpakai, callback dan perintah mendapat slot berikutnya sebelum pesan biasa.
+
+    - `dedup_size`: jumlah update_id terakhir yang diingat untuk membuang kiriman ulang
+    - `tap_window`: tap tombol yang sama (user, pesan, data) dalam jendela ini (detik) dibuang
+    - `callback_max_age`: callback yang menunggu lebih lama dari ini (detik) sebelum dapat slot
+      dibuang; Telegram sudah tidak menerima jawabannya dan user bisa menekan lagi
+    - `max_pending`: update yang sedang menunggu atau diproses; update baru di atas batas ini dibuang
+    - `max_user_pending`: batas yang sama per user, supaya satu user yang membanjiri bot tidak
+      menghabiskan `max_pending` milik editor lain
+
+    Callback yang dibuang tetap dijawab (tanpa teks) supaya spinner di klien user berhenti.
+    `on_drop(update, reason)` dipanggil untuk setiap update yang dibuang, karena update itu tidak
+    pernah sampai ke handler mana pun (termasuk handler group terakhir yang menandai update selesai).
+    """
+
+    __slots__ = ("_limit", "_workers", "_locks", "on_receive", "on_drop", "dedup_size", "tap_window",
+                 "callback_max_age", "max_pending", "max_user_pending", "_seen", "_taps", "received", "pending")
+
+    def __init__(self, max_concurrent_updates=64, on_receive=None, on_drop=None, dedup_size=4096,
+                 tap_window=1.0, callback_max_age=10.0, max_pending=1000, max_user_pending=50):
+        # BaseUpdateProcessor membuat semaphore dari properti max_concurrent_updates; semaphore itu harus
+        # tanpa batas, kalau tidak update yang menunggu lock user ikut memakan slot sebelum sampai ke sini
+        self._limit = _UNBOUNDED
+        super().__init__(_UNBOUNDED)
+        self._limit = max_concurrent_updates
+        self._workers = PrioritySlots(max_concurrent_updates)
+        self._locks = {}
+        # Dipanggil begitu update keluar dari update_queue, sebelum mengantre lock user
+        self.on_receive = on_receive
+        self.on_drop = on_drop
+        self.dedup_size = dedup_size
+        self.tap_window = tap_window
+        self.callback_max_age = callback_max_age
+        self.max_pending = max_pending
+        self.max_user_pending = max_user_pending
+        self._seen = OrderedDict()  # update_id -> None, urut dari yang paling lama
+        self._taps = OrderedDict()  # (user_id, message_id, data) -> waktu tap yang diproses
+        self.received = 0
+        self.pending = 0  # update yang sedang menunggu lock / slot atau diproses handler
+
+    @property
+    def max_concurrent_updates(self):
+        return self._limit
+
+    @asynccontextmanager
+    async def user_lock(self, user_id):
+        """Kunci yang sama dengan yang dipakai handler; untuk task background yang mengubah draft."""
+        entry = self._locks.get(user_id)
+        if entry is None:
+            entry = self._locks[user_id] = _UserLock()
+        entry.users += 1
+        try:
+            async with entry.lock:
+                yield
+        finally:
+            entry.users -= 1
+            if not entry.users:
+                del self._locks[user_id]
+
+    def _is_duplicate(self, update_id):
+        if update_id in self._seen:
+            return True
+        self._seen[update_id] = None
+        if len(self._seen) > self.dedup_size:
+            self._seen.popitem(last=False)
+        return False
+
+    def _is_repeated_tap(self, query, now):
+        # Jendela dihitung dari tap yang diproses, bukan digeser setiap tap, jadi tap beruntun tetap lolos sesekali
+        while self._taps:
+            key, tapped_at = next(iter(self._taps.items()))
+            if now - tapped_at < self.tap_window:
+                break
+            del self._taps[key]
+        key = (query.from_user.id, query.message.message_id if query.message else query.inline_message_id, query.data)
+        if key in self._taps:
+            return True
+        self._taps[key] = now
+        return False
+
+    async def _drop(self, update, coroutine, reason):
+        coroutine.close()
+        dropped_updates.inc(reason)
+        # Kiriman ulang dijawab oleh update aslinya
+        if isinstance(update, Update) and update.callback_query is not None and reason != DUPLICATE:
+            try:
+                await update.callback_query.answer()
+            except TelegramError:
+                # Callback yang sudah kedaluwarsa memang tidak bisa dijawab lagi
+                pass
+        if self.on_drop is not None:
+            self.on_drop(update, reason)
+
+    async def do_process_update(self, update, coroutine):
+        self.received += 1
+        if self.on_receive is not None:
+            self.on_receive(update)
+        if self.max_pending and self.pending >= self.max_pending:
+            await self._drop(update, coroutine, OVERLOADED)
+            return
+        self.pending += 1
+        try:
+            await self._process(update, coroutine)
+        finally:
+            self.pending -= 1
+
+    async def _process(self, update, coroutine):
+        if not isinstance(update, Update):
+            async with self._workers.slot(BULK):
+                await coroutine
+            return
+
+        received = time.monotonic()
+        if self.dedup_size and self._is_duplicate(update.update_id):
+            await self._drop(update, coroutine, DUPLICATE)
+            return
+        query = update.callback_query
+        if query is not None and self.tap_window and self._is_repeated_tap(query, received):
+            await self._drop(update, coroutine, REPEATED_TAP)
+            return
+
+        priority = update_priority(update)
+        user = update.effective_user
+        if user is None:
+            async with self._workers.slot(priority):
+                await coroutine
+            return
+        entry = self._locks.get(user.id)
+        if entry is not None and self.max_user_pending and entry.users >= self.max_user_pending:
+            await self._drop(update, coroutine, OVERLOADED)
+            return
+        async with self.user_lock(user.id):
+            async with self._workers.slot(priority):
+                if query is not None and self.callback_max_age and time.monotonic() - received > self.callback_max_age:
+                    await self._drop(update, coroutine, STALE_CALLBACK)
+                    return
+                await coroutine
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
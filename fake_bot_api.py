@@ -0,0 +1,382 @@
+"""Bot API tiruan untuk benchmark dan pengujian lokal (tanpa menyentuh Telegram asli).
+
+Pakai dengan `build_application(token, base_url=fake.base_url)`. Mendukung getUpdates (long-poll),
+push webhook, method kirim/edit pesan, serta injeksi latency dan error RetryAfter (HTTP 429).
+"""
+import asyncio
+import itertools
+import json
+import random
+import time
+from collections import Counter
+from email.parser import BytesParser
+from urllib.parse import parse_qsl
+
+import httpx
+
+from webhook import HTTPServer, SECRET_HEADER, json_response
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "FakeBot", "username": "fake_bot"}
+
+# Method yang bisa dibalas RetryAfter tiruan (yang memang kena flood limit di Telegram)
+FLOOD_METHODS = frozenset({
+    "sendMessage", "sendPhoto", "sendMediaGroup", "sendDocument",
+    "editMessageText", "editMessageMedia", "editMessageCaption", "editMessageReplyMarkup",
+})
+
+
+def _maybe_json(value):
+    # PTB mengirim objek kompleks (reply_markup, media, ...) sebagai string JSON
+    if value[:1] in ("[", "{"):
+        try:
+            return json.loads(value)
+        except ValueError:
+            pass
+    return value
+
+
+def _parse_params(request):
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("application/json"):
+        return request.json() or {}
+    if content_type.startswith("multipart/form-data"):
+        message = BytesParser().parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode() + request.body)
+        params = {}
+        for part in message.get_payload():
+            name = part.get_param("name", header="content-disposition")
+            payload = part.get_payload(decode=True)
+            # File upload disimpan sebagai bytes; field biasa sebagai teks
+            params[name] = payload if part.get_filename() else _maybe_json(payload.decode())
+        return params
+    return {key: _maybe_json(value) for key, value in parse_qsl(request.body.decode())}
+
+
+def _chat_id(value):
+    try:
+        return int(value)
+    except ValueError:
+        return hash(value) & 0xFFFFFFFF
+
+
+class FakeBotAPI:
+    """Server Bot API tiruan.
+
+    `latency` adalah jeda (detik) per request, atau dict method → detik. Dengan `retry_after_rate`
+    > 0, sebagian panggilan FLOOD_METHODS (opsional hanya ke `retry_after_chats`) dibalas 429
+    dengan `retry_after` detik.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, retry_after_rate=0.0, retry_after=1,
+                 retry_after_chats=None, seed=None):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.retry_after_rate = retry_after_rate
+        self.retry_after = retry_after
+        self.retry_after_chats = retry_after_chats  # None = semua chat
+        self.server = HTTPServer(max_body_size=50 << 20)
+        self.server.route("POST", "/bot*", self._dispatch)
+        self.server.route("GET", "/file/bot*", self._download)
+        self.calls = []  # (method, params) yang dijawab sukses
+        self.call_counts = Counter()  # semua percobaan per method, plus "429" untuk RetryAfter tiruan
+        self.sent_at = {}
+        self.files = {}  # file_id -> bytes, untuk getFile dan unduhan (lihat add_file)
+        self.last_markup = {}  # chat_id -> inline keyboard (bertombol callback) terakhir dari bot
+        self._random = random.Random(seed)
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._file_ids = itertools.count(1)
+        self._pending = []
+        self._new_update = asyncio.Condition()
+        self._webhook = None
+        self._push_queue = None
+        self._push_task = None
+        self._client = None
+        self._methods = {
+            "getMe": self._get_me,
+            "getUpdates": self._get_updates,
+            "setWebhook": self._set_webhook,
+            "deleteWebhook": self._delete_webhook,
+            "sendMessage": self._send_message,
+            "sendPhoto": self._send_photo,
+            "sendDocument": self._send_document,
+            "sendMediaGroup": self._send_media_group,
+            "editMessageText": self._edit_message_text,
+            "editMessageMedia": self._edit_message_media,
+            "editMessageCaption": self._edit_message_caption,
+            "editMessageReplyMarkup": self._edit_message_reply_markup,
+            "getFile": self._get_file,
+            "answerCallbackQuery": self._ok_true,
+            "deleteMessage": self._ok_true,
+        }
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.server.port}/bot"
+
+    @property
+    def base_file_url(self):
+        return f"http://{self.host}:{self.server.port}/file/bot"
+
+    def add_file(self, content, file_id=None):
+        """Daftarkan isi file yang bisa diambil bot lewat getFile; kembalikan file_id-nya."""
+        file_id = file_id or f"FAKEFILE{next(self._file_ids)}"
+        self.files[file_id] = content
+        return file_id
+
+    async def start(self):
+        await self.server.start(self.host, self.port)
+        self._client = httpx.AsyncClient()
+
+    async def stop(self):
+        if self._push_task:
+            self._push_task.cancel()
+            await asyncio.gather(self._push_task, return_exceptions=True)
+            self._push_task = None
+        await self.server.stop()
+        await self._client.aclose()
+
+    def reset_stats(self):
+        self.calls.clear()
+        self.call_counts.clear()
+
+    # -- Update injection -------------------------------------------------
+
+    async def inject(self, update):
+        """Masukkan update (dict tanpa update_id); dikirim lewat getUpdates atau webhook."""
+        update = dict(update, update_id=next(self._update_ids))
+        self.sent_at[update["update_id"]] = time.perf_counter()
+        if self._webhook:
+            self._push_queue.put_nowait(update)
+        else:
+            async with self._new_update:
+                self._pending.append(update)
+                self._new_update.notify_all()
+        return update["update_id"]
+
+    async def _push_loop(self):
+        while True:
+            update = await self._push_queue.get()
+            url, secret = self._webhook
+            headers = {SECRET_HEADER: secret} if secret else {}
+            try:
+                await self._client.post(url, json=update, headers=headers)
+            except httpx.HTTPError as e:
+                print(f"Fake API webhook push gagal: {e}")
+
+    # -- Bot API methods --------------------------------------------------
+
+    def _latency_for(self, method):
+        if isinstance(self.latency, dict):
+            return self.latency.get(method, 0.0)
+        return self.latency
+
+    def _should_flood(self, method, params):
+        if not self.retry_after_rate or method not in FLOOD_METHODS:
+            return False
+        if self.retry_after_chats is not None and _chat_id(params.get("chat_id", "")) not in self.retry_after_chats:
+            return False
+        return self._random.random() < self.retry_after_rate
+
+    async def _dispatch(self, request):
+        method = request.path.rsplit("/", 1)[-1]
+        handler = self._methods.get(method)
+        if handler is None:
+            return json_response({"ok": False, "error_code": 404, "description": "Not Found"}, 404)
+        params = _parse_params(request)
+        self.call_counts[method] += 1
+
+        latency = self._latency_for(method)
+        if latency:
+            await asyncio.sleep(latency)
+        if self._should_flood(method, params):
+            self.call_counts["429"] += 1
+            return json_response({
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {self.retry_after}",
+                "parameters": {"retry_after": self.retry_after},
+            }, 429)
+
+        self.calls.append((method, params))
+        markup = params.get("reply_markup")
+        if "chat_id" in params and find_callback_data(markup, bool):
+            self.last_markup[_chat_id(params["chat_id"])] = markup
+        return json_response({"ok": True, "result": await handler(params)})
+
+    async def _ok_true(self, params):
+        return True
+
+    async def _get_file(self, params):
+        file_id = params["file_id"]
+        return {
+            "file_id": file_id,
+            "file_unique_id": file_id[:16],
+            "file_size": len(self.files.get(file_id, b"")),
+            "file_path": f"documents/{file_id}",
+        }
+
+    async def _download(self, request):
+        content = self.files.get(request.path.rsplit("/", 1)[-1])
+        if content is None:
+            return 404, b"", "text/plain"
+        return 200, content, "application/octet-stream"
+
+    async def _get_me(self, params):
+        return BOT_USER
+
+    async def _get_updates(self, params):
+        offset = int(params.get("offset", 0) or 0)
+        timeout = float(params.get("timeout", 0) or 0)
+        async with self._new_update:
+            self._pending = [u for u in self._pending if u["update_id"] >= offset]
+            if not self._pending and timeout:
+                try:
+                    await asyncio.wait_for(self._new_update.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+            return list(self._pending)
+
+    async def _set_webhook(self, params):
+        self._webhook = (params["url"], params.get("secret_token"))
+        if self._push_task is None:
+            self._push_queue = asyncio.Queue()
+            self._push_task = asyncio.create_task(self._push_loop())
+        return True
+
+    async def _delete_webhook(self, params):
+        self._webhook = None
+        return True
+
+    def _message(self, params, **extra):
+        return {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": _chat_id(params["chat_id"]), "type": "private"},
+            "from": BOT_USER,
+            **extra,
+        }
+
+    def _file_id(self, media):
+        # Upload (bytes) dan gambar dari URL mendapat file_id baru, persis seperti Telegram
+        if isinstance(media, bytes) or media.startswith(("http://", "https://")):
+            return f"FAKEFILE{next(self._file_ids)}"
+        return media or ""
+
+    async def _send_message(self, params):
+        return self._message(params, text=params.get("text", ""))
+
+    async def _edit_message_text(self, params):
+        return dict(self._message(params, text=params.get("text", "")), message_id=int(params["message_id"]))
+
+    def _photo_message(self, params, photo, caption, **extra):
+        photo = self._file_id(photo)
+        sizes = [{"file_id": photo, "file_unique_id": photo[:16], "width": 1280, "height": 1280}]
+        return self._message(params, photo=sizes, caption=caption, **extra)
+
+    async def _edit_message_media(self, params):
+        media = params.get("media", {})
+        message = self._photo_message(params, media.get("media", ""), media.get("caption"))
+        return dict(message, message_id=int(params["message_id"]))
+
+    async def _edit_message_caption(self, params):
+        message = self._photo_message(params, "", params.get("caption"))
+        return dict(message, message_id=int(params["message_id"]))
+
+    async def _edit_message_reply_markup(self, params):
+        return dict(self._message(params), message_id=int(params["message_id"]))
+
+    async def _send_photo(self, params):
+        return self._photo_message(params, params.get("photo", ""), params.get("caption"))
+
+    async def _send_document(self, params):
+        file_id = self._file_id(params.get("document", ""))
+        document = {"file_id": file_id, "file_unique_id": file_id[:16]}
+        return self._message(params, document=document, caption=params.get("caption"))
+
+    async def _send_media_group(self, params):
+        group_id = str(next(self._message_ids))
+        messages = []
+        for media in params.get("media", []):
+            photo = media.get("media", "")
+            if photo.startswith("attach://"):
+                photo = params.get(photo[len("attach://"):], b"")
+            messages.append(self._photo_message(params, photo, media.get("caption"), media_group_id=group_id))
+        return messages
+
+
+# -- Payload update dari sisi user (tanpa update_id, lihat FakeBotAPI.inject) --
+
+_user_message_ids = itertools.count(1)
+
+
+def _user_message(user_id, **extra):
+    return {
+        "message_id": next(_user_message_ids),
+        "date": int(time.time()),
+        "chat": {"id": user_id, "type": "private"},
+        "from": {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"},
+        **extra,
+    }
+
+
+def command_update(user_id, text):
+    """Buat payload update pesan perintah (tanpa update_id) dari user tertentu."""
+    command = text.split()[0]
+    return {"message": _user_message(
+        user_id, text=text, entities=[{"type": "bot_command", "offset": 0, "length": len(command)}]
+    )}
+
+
+def text_update(user_id, text):
+    return {"message": _user_message(user_id, text=text)}
+
+
+def photo_update(user_id, file_id, caption=None, media_group_id=None):
+    extra = {"photo": [{"file_id": file_id, "file_unique_id": file_id[:16], "width": 1280, "height": 1280}]}
+    if caption is not None:
+        extra["caption"] = caption
+    if media_group_id is not None:
+        extra["media_group_id"] = media_group_id
+    return {"message": _user_message(user_id, **extra)}
+
+
+def document_update(user_id, file_id, file_name, file_size=None, caption=None, mime_type=None):
+    document = {"file_id": file_id, "file_unique_id": file_id[:16], "file_name": file_name}
+    if file_size is not None:
+        document["file_size"] = file_size
+    if mime_type is not None:
+        document["mime_type"] = mime_type
+    extra = {"document": document}
+    if caption is not None:
+        extra["caption"] = caption
+    return {"message": _user_message(user_id, **extra)}
+
+
+def callback_update(user_id, data, message_id=1):
+    """Tekan tombol inline `data` pada pesan bot `message_id`."""
+    return {"callback_query": {
+        "id": f"{user_id}-{next(_user_message_ids)}",
+        "chat_instance": str(user_id),
+        "from": {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"},
+        "data": data,
+        "message": {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": BOT_USER,
+            "text": "",
+        },
+    }}
+
+
+def find_callback_data(reply_markup, predicate):
+    """Callback_data pertama di inline keyboard yang memenuhi `predicate(data)`, atau None."""
+    if not isinstance(reply_markup, dict):
+        return None
+    for row in reply_markup.get("inline_keyboard", []):
+        for button in row:
+            data = button.get("callback_data")
+            if data and predicate(data):
+                return data
+    return None
@@ -0,0 +1,235 @@
+"""Intake gambar dari dokumen dan URL, dengan cache hash isi → file_id Telegram (SQLite).
+
+Gambar yang dikirim sebagai dokumen (kualitas asli) atau sebagai URL diunduh, di-hash, lalu
+dicari di cache. Kalau belum pernah di-upload, gambar diperkecil / di-encode ulang bila melebihi
+batas (di thread pool, bukan di event loop) dan di-upload sekali ke chat editor; file_id hasilnya
+disimpan, jadi gambar yang sama tidak pernah di-upload dua kali. Normalisasi memakai Pillow.
+"""
+import asyncio
+import hashlib
+import io
+import ipaddress
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from PIL import Image, ImageOps
+from telegram import InputMediaPhoto
+
+from publisher import MAX_ALBUM_SIZE
+from storage import open_database
+
+# Batas Telegram: foto maks. 10 MB, dan bot hanya bisa mengunduh file ≤ 20 MB
+PHOTO_MAX_BYTES = 10 << 20
+DOWNLOAD_MAX_BYTES = 20 << 20
+# Telegram menampilkan foto paling besar 2560 px; lebih dari itu hanya membuang bandwidth
+DEFAULT_MAX_SIDE = 2560
+JPEG_QUALITY = 90
+MAX_REDIRECTS = 5
+
+
+class ImageError(Exception):
+    """Gambar tidak bisa dipakai; pesannya ditampilkan ke editor."""
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def normalize_image(data, max_side=DEFAULT_MAX_SIDE, max_bytes=PHOTO_MAX_BYTES):
+    """Kembalikan `data` apa adanya jika sudah sesuai batas, atau JPEG yang diperkecil. Berjalan di thread."""
+    try:
+        image = Image.open(io.BytesIO(data))
+        if image.format in ("JPEG", "PNG") and max(image.size) <= max_side and len(data) <= max_bytes:
+            return data
+        # Pillow membaca piksel secara malas, jadi gambar terpotong baru ketahuan saat di-encode ulang
+        return _encode_jpeg(image, max_side, max_bytes)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        raise ImageError(f"File bukan gambar yang valid: {e}") from e
+
+
+def _encode_jpeg(image, max_side, max_bytes):
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((max_side, max_side), Image.LANCZOS)
+    if image.mode != "RGB":
+        # JPEG tanpa alpha: tempel di atas latar putih
+        background = Image.new("RGB", image.size, "white")
+        background.paste(image, mask=image.convert("RGBA").getchannel("A"))
+        image = background
+    quality = JPEG_QUALITY
+    while True:
+        output = io.BytesIO()
+        image.save(output, "JPEG", quality=quality, optimize=True)
+        if output.tell() <= max_bytes or quality <= 50:
+            return output.getvalue()
+        quality -= 10
+
+
+async def public_address(url):
+    """Alamat IP publik host `url`; ImageError untuk skema selain http(s) dan alamat internal.
+
+    URL datang dari editor, jadi tanpa cek ini bot bisa disuruh mengunduh dari localhost (worker
+    cluster, /metrics) atau jaringan internal. Semua alamat hasil resolve harus publik.
+    """
+    if url.scheme not in ("http", "https") or not url.host:
+        raise ImageError("URL gambar harus diawali http:// atau https://")
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(url.host, url.port or 0, type=socket.SOCK_STREAM)
+    except socket.gaierror as e:
+        raise ImageError(f"Host URL gambar tidak ditemukan: {url.host}") from e
+    addresses = []
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].partition("%")[0])
+        mapped = getattr(address, "ipv4_mapped", None)
+        if not (mapped or address).is_global:
+            raise ImageError("URL gambar mengarah ke alamat internal")
+        addresses.append(str(address))
+    return addresses[0]
+
+
+class PreparedImage:
+    __slots__ = ("digest", "file_id", "data")
+
+    def __init__(self, digest, file_id, data=None):
+        self.digest = digest
+        self.file_id = file_id  # None sampai di-upload
+        self.data = data  # bytes hasil normalisasi, hanya jika belum ada di cache
+
+
+class FileIdStore:
+    """Tabel image_file_ids; semua method dipanggil dari satu thread penulis."""
+
+    def __init__(self, path):
+        self._conn = open_database(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS image_file_ids ("
+            " digest TEXT PRIMARY KEY,"
+            " file_id TEXT NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+
+    def get(self, digest):
+        row = self._conn.execute("SELECT file_id FROM image_file_ids WHERE digest = ?", (digest,)).fetchone()
+        return row[0] if row else None
+
+    def put(self, digest, file_id):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO image_file_ids (digest, file_id, created_at) VALUES (?, ?, ?)",
+            (digest, file_id, time.time())
+        )
+
+    def close(self):
+        self._conn.close()
+
+
+class ImageIntake:
+    """Unduh, normalisasi dan upload gambar; `workers` thread untuk hash dan resize."""
+
+    def __init__(self, path, max_side=DEFAULT_MAX_SIDE, workers=2, download_timeout=30):
+        self.path = path
+        self.max_side = max_side
+        self.workers = workers
+        self.download_timeout = download_timeout
+        self._store = None
+        self._executor = None
+        self._pool = None
+        self._client = None
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def start(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="image-cache")
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="image-intake")
+        # Redirect diikuti manual di fetch(), supaya setiap tujuan ikut dicek public_address()
+        self._client = httpx.AsyncClient(timeout=self.download_timeout)
+        self._store = await self._run(FileIdStore, self.path)
+
+    async def stop(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        if self._store is not None:
+            await self._run(self._store.close)
+            self._store = None
+        for executor in (self._executor, self._pool):
+            if executor is not None:
+                executor.shutdown()
+        self._executor = self._pool = None
+
+    async def download(self, document):
+        """Isi dokumen gambar dari Telegram."""
+        if document.file_size and document.file_size > DOWNLOAD_MAX_BYTES:
+            raise ImageError(f"File terlalu besar (maks. {DOWNLOAD_MAX_BYTES >> 20} MB)")
+        telegram_file = await document.get_file()
+        return bytes(await telegram_file.download_as_bytearray())
+
+    async def fetch(self, url):
+        """Isi gambar dari URL http(s) publik, dibatasi DOWNLOAD_MAX_BYTES."""
+        try:
+            url = httpx.URL(url)
+            for _ in range(MAX_REDIRECTS + 1):
+                # Sambung ke alamat yang sudah dicek (bukan resolve ulang), dengan Host dan SNI asli
+                address = await public_address(url)
+                async with self._client.stream(
+                    "GET",
+                    url.copy_with(host=address),
+                    headers={"Host": url.netloc.decode("ascii")},
+                    extensions={"sni_hostname": url.host} if url.scheme == "https" else None,
+                ) as response:
+                    if response.is_redirect:
+                        url = url.join(response.headers["location"])
+                        continue
+                    return await self._read_image(response)
+        except (httpx.HTTPError, httpx.InvalidURL) as e:
+            raise ImageError(f"URL gambar tidak bisa diunduh: {e}") from e
+        raise ImageError("URL gambar terlalu banyak redirect")
+
+    async def _read_image(self, response):
+        if response.status_code != 200:
+            raise ImageError(f"URL gambar tidak bisa diunduh (HTTP {response.status_code})")
+        if not response.headers.get("content-type", "").startswith("image/"):
+            raise ImageError("URL tersebut bukan gambar")
+        chunks = []
+        size = 0
+        async for chunk in response.aiter_bytes():
+            size += len(chunk)
+            if size > DOWNLOAD_MAX_BYTES:
+                raise ImageError(f"Gambar terlalu besar (maks. {DOWNLOAD_MAX_BYTES >> 20} MB)")
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    async def prepare(self, data):
+        """Cari gambar di cache; kalau belum ada, normalisasi (di thread pool) dan siapkan untuk di-upload."""
+        loop = asyncio.get_running_loop()
+        # Hash 10 MB juga butuh beberapa milidetik, jadi ikut dikerjakan di thread
+        digest = await loop.run_in_executor(self._pool, content_hash, data)
+        file_id = await self._run(self._store.get, digest)
+        if file_id is not None:
+            return PreparedImage(digest, file_id)
+        normalized = await loop.run_in_executor(self._pool, normalize_image, data, self.max_side)
+        return PreparedImage(digest, None, normalized)
+
+    async def upload(self, bot, chat_id, images, caption=None):
+        """Upload gambar yang belum punya file_id ke `chat_id` (sekali kirim) lalu simpan file_id-nya di cache."""
+        # Gambar yang sama dua kali dalam satu kiriman cukup di-upload sekali
+        pending = {}
+        for image in images:
+            if image.file_id is None:
+                pending.setdefault(image.digest, []).append(image)
+        groups = list(pending.values())
+        for start in range(0, len(groups), MAX_ALBUM_SIZE):
+            batch = groups[start:start + MAX_ALBUM_SIZE]
+            if len(batch) == 1:
+                messages = [await bot.send_photo(chat_id=chat_id, photo=batch[0][0].data, caption=caption)]
+            else:
+                messages = await bot.send_media_group(
+                    chat_id=chat_id, media=[InputMediaPhoto(group[0].data) for group in batch], caption=caption
+                )
+            for group, message in zip(batch, messages):
+                file_id = message.photo[-1].file_id
+                for image in group:
+                    image.file_id = file_id
+                    image.data = None
+                await self._run(self._store.put, group[0].digest, file_id)
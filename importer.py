@@ -0,0 +1,111 @@
+"""Import banyak postingan sekaligus dari file JSON Lines atau CSV.
+
+Setiap baris: `photo` (file_id Telegram atau URL http), `caption`, dan `buttons` berisi
+baris-baris "Nama Button - URL" (di JSON Lines boleh juga berupa list string).
+File dibaca baris per baris, jadi ukuran file tidak menentukan pemakaian memori.
+"""
+import codecs
+import csv
+import io
+import json
+
+from buttons import parse_button_lines
+from sessions import Post
+
+# Batas caption foto di Telegram
+MAX_CAPTION_LENGTH = 1024
+
+
+class ImportResult:
+    __slots__ = ("posts", "errors", "rows", "truncated")
+
+    def __init__(self):
+        self.posts = []
+        self.errors = []  # list of (nomor baris, pesan error)
+        self.rows = 0
+        self.truncated = False  # True jika berhenti karena mencapai max_rows
+
+
+def detect_format(file_name, head):
+    """"csv" atau "jsonl", dari ekstensi file atau (jika tidak jelas) byte pertama isinya."""
+    name = (file_name or "").lower()
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith((".jsonl", ".ndjson", ".json")):
+        return "jsonl"
+    return "jsonl" if head.lstrip(codecs.BOM_UTF8 + b" \t\r\n")[:1] == b"{" else "csv"
+
+
+def _jsonl_rows(text_file):
+    for number, line in enumerate(text_file, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield number, None, f"JSON tidak valid ({e.msg})"
+            continue
+        if not isinstance(row, dict):
+            yield number, None, "Baris harus berupa objek JSON"
+            continue
+        yield number, row, None
+
+
+def _csv_rows(text_file):
+    reader = csv.DictReader(text_file)
+    if reader.fieldnames is None:
+        return
+    reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+    for row in reader:
+        # Nomor baris di file (header = baris 1); sel multi-baris tetap dihitung dengan benar
+        yield reader.line_num, row, None
+
+
+def validate_row(row):
+    """Ubah satu baris jadi Post; kembalikan (Post, None) atau (None, pesan error)."""
+    photo = str(row.get("photo") or "").strip()
+    caption = str(row.get("caption") or "").strip()
+    raw_buttons = row.get("buttons") or ""
+    if isinstance(raw_buttons, list):
+        raw_buttons = "\n".join(str(line) for line in raw_buttons)
+
+    if not photo:
+        return None, "Kolom photo kosong"
+    if "://" in photo and not photo.startswith("http"):
+        return None, f"URL gambar harus dimulai dengan http: {photo}"
+    if not caption:
+        return None, "Caption tidak boleh kosong"
+    if len(caption) > MAX_CAPTION_LENGTH:
+        return None, f"Caption lebih dari {MAX_CAPTION_LENGTH} karakter"
+
+    buttons, errors = parse_button_lines(str(raw_buttons))
+    if errors:
+        # Baris dengan button rusak dilewati utuh supaya tidak ter-publish setengah jadi
+        return None, "; ".join(errors)
+    return Post(photo, caption, buttons), None
+
+
+def import_posts(binary_file, file_name=None, max_rows=1000):
+    """Baca file (mode biner) secara streaming dan kembalikan ImportResult."""
+    result = ImportResult()
+    reader = io.BufferedReader(binary_file) if not hasattr(binary_file, "peek") else binary_file
+    fmt = detect_format(file_name, reader.peek(64)[:64])
+    text_file = io.TextIOWrapper(reader, encoding="utf-8-sig", errors="replace", newline="" if fmt == "csv" else None)
+    rows = _csv_rows(text_file) if fmt == "csv" else _jsonl_rows(text_file)
+    try:
+        for number, row, error in rows:
+            if result.rows >= max_rows:
+                result.truncated = True
+                break
+            result.rows += 1
+            if error is None:
+                post, error = validate_row(row)
+                if post is not None:
+                    result.posts.append(post)
+                    continue
+            result.errors.append((number, error))
+    except csv.Error as e:
+        result.errors.append((0, f"CSV tidak valid: {e}"))
+    finally:
+        text_file.detach()
+    return result
@@ -0,0 +1,159 @@
+"""Logging terstruktur (JSON Lines) yang ditulis thread background, bukan event loop.
+
+Handler logging di event loop hanya menaruh record ke antrian (QueueHandler); QueueListener di
+thread lain yang memformat dan menulis ke stdout / file. Kalau penulisan lambat dan antrian penuh,
+record dibuang dan dihitung, bukan membuat handler bot ikut menunggu.
+
+Setiap record membawa konteks update yang sedang diproses (update_id, user_id, handler) lewat
+contextvars; metrics.instrument_handler mengisinya dan mencatat durasi setiap handler (DEBUG).
+Sampling per level (opsional per logger) menyaring path yang berisik sebelum masuk antrian.
+"""
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+from contextvars import ContextVar
+
+# (update_id, user_id, handler) untuk update yang sedang diproses task ini
+_update_context = ContextVar("update_context", default=None)
+
+CONTEXT_FIELDS = ("update_id", "user_id", "handler")
+# Atribut LogRecord bawaan; sisanya (dari `extra=`) ikut ditulis ke JSON
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+_handlers = []
+
+
+def bind_update(update, handler):
+    """Tandai task ini sedang menjalankan `handler` untuk `update`; kembalikan token untuk reset_update."""
+    user = getattr(update, "effective_user", None)
+    return _update_context.set((getattr(update, "update_id", None), user.id if user else None, handler))
+
+
+def reset_update(token):
+    _update_context.reset(token)
+
+
+def parse_sample_rates(text):
+    """"DEBUG=0.1,main.preview:WARNING=0.2" → {(logger, levelno): rate}; logger kosong = semua logger."""
+    rates = {}
+    for item in filter(None, (part.strip() for part in (text or "").split(","))):
+        key, _, rate = item.partition("=")
+        name, _, level = key.rpartition(":")
+        levelno = logging.getLevelName(level.strip().upper())
+        if not isinstance(levelno, int):
+            raise ValueError(f"Level log tidak dikenal: {level}")
+        rates[(name.strip(), levelno)] = float(rate)
+    return rates
+
+
+class ContextFilter(logging.Filter):
+    """Isi update_id, user_id dan handler dari contextvars (dijalankan di thread pemanggil)."""
+
+    def filter(self, record):
+        context = _update_context.get()
+        if context is not None:
+            for field, value in zip(CONTEXT_FIELDS, context):
+                if value is not None and not hasattr(record, field):
+                    setattr(record, field, value)
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Loloskan sebagian record per (logger, level); aturan dengan nama logger terpanjang yang cocok menang."""
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+        self._cache = {}
+
+    def _rate(self, name, levelno):
+        key = (name, levelno)
+        rate = self._cache.get(key)
+        if rate is None:
+            rate = 1.0
+            matched = -1
+            for (prefix, level), value in self.rates.items():
+                if level != levelno or len(prefix) <= matched:
+                    continue
+                if not prefix or name == prefix or name.startswith(prefix + "."):
+                    rate, matched = value, len(prefix)
+            self._cache[key] = rate
+        return rate
+
+    def filter(self, record):
+        rate = self._rate(record.name, record.levelno)
+        return rate >= 1.0 or random.random() < rate
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        data = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                data[key] = value
+        if record.exc_text:
+            data["exc"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler yang membuang record saat antrian penuh (tidak pernah menunggu)."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._exception_formatter = logging.Formatter()
+
+    def prepare(self, record):
+        # Salinan yang aman dipindah thread: pesan sudah jadi string, traceback sudah diformat
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = self._exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def dropped_records():
+    return sum(handler.dropped for handler in _handlers)
+
+
+def setup_logging(level="INFO", sample_rates=None, path=None, queue_size=10000):
+    """Pasang logging JSON di root logger; kembalikan QueueListener (panggil .stop() saat keluar)."""
+    log_queue = queue.Queue(queue_size)
+    handler = DroppingQueueHandler(log_queue)
+    if sample_rates:
+        # Sampling dulu: record yang dibuang tidak perlu diberi konteks
+        handler.addFilter(SamplingFilter(sample_rates))
+    handler.addFilter(ContextFilter())
+    output = logging.FileHandler(path, encoding="utf-8") if path else logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter())
+
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+    # httpx mencatat setiap request di INFO (httpcore di DEBUG); terlalu berisik untuk bot yang ramai
+    for name in ("httpx", "httpcore"):
+        logging.getLogger(name).setLevel(max(logging.WARNING, root.level))
+    _handlers.append(handler)
+
+    listener = logging.handlers.QueueListener(log_queue, output)
+    listener.start()
+    return listener
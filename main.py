@@ -1,9 +1,36 @@
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, filters, CallbackContext
-import time
+from telegram import Bot, Update, InlineKeyboardButton, InlineKeyboardMarkup, InputMediaPhoto
+from telegram.error import BadRequest, TelegramError
+from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, TypeHandler, filters, CallbackContext
 import os
 import asyncio
+import logging
+import itertools
+import tempfile
+import time
+from functools import partial
 from dotenv import load_dotenv
+import callbacks
+from button_sets import MAX_SETS_PER_USER, ButtonSets, normalize_name, parse_post_range
+from buttons import parse_button_lines
+from callbacks import decode_callback, encode_callback
+from cluster import serve_cluster, worker_command
+from concurrency import PerUserUpdateProcessor
+from images import ImageError, ImageIntake, PreparedImage
+from importer import import_posts
+from logs import dropped_records, parse_sample_rates, setup_logging
+import metrics
+from media_groups import MediaGroupCollector
+from metrics import Gauge, InstrumentedRequest, add_metrics_route, instrument_handler
+from outbox import Outbox
+from profiler import MAX_DURATION, Profiler, profile_filename
+from post_index import DELETE, REPLACE_TEXT, REPLACE_URL, BulkOperation, PostIndex, run_bulk
+from publisher import MAX_REPORTED_ERRORS, PROGRESS_INTERVAL, PublishJob, PublishQueue
+from ratelimit import RateLimiter
+from recorder import UpdateRecorder
+from scheduler import PostScheduler, format_local, parse_schedule_time, utc_offset, validate_schedule_time
+from sessions import POST_STATES, Post, PostData, PreviewSession, SessionStore
+from storage import DraftPersistence, MemoryDraftBackend, SQLiteDraftBackend, dump_post_data, load_post_data
+from webhook import HTTPServer, serve_webhook
 
 # Load environment variables
 load_dotenv()
@@ -11,31 +38,182 @@ load_dotenv()
 # Token bot dan ID channel
 TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 CHANNEL_ID = os.getenv("CHANNEL_ID")
+# Beberapa channel tujuan (dipisah koma); tanpa CHANNEL_IDS hanya CHANNEL_ID
+CHANNEL_IDS = [c.strip() for c in os.getenv("CHANNEL_IDS", CHANNEL_ID or "").split(",") if c.strip()]
 
 # Batas akses pengguna
-AUTHORIZED_USERS = set(map(int, os.getenv("AUTHORIZED_USERS", "").split(",")))
+AUTHORIZED_USERS = {int(u) for u in os.getenv("AUTHORIZED_USERS", "").split(",") if u.strip()}
 
-# Anti-spam (batas 50 post per menit)
+# Anti-spam (batas 50 post per menit) dan batas kirim Telegram
 POST_LIMIT = int(os.getenv("POST_LIMIT", "50"))
-user_post_count = {}
-last_reset_time = time.time()
-
-# Dictionary menyimpan data postingan sementara
-posts = {}
-POST_STATES = {
-    'WAITING_FOR_MEDIA': 'waiting_for_media',
-    'WAITING_FOR_LINK': 'waiting_for_link',
-    'EDITING': 'editing'
-}
-
-class PostData:
-    def __init__(self, is_multiple=False):
-        self.photos = []
-        self.texts = []
-        self.buttons_per_post = []  # List of button lists for each post
-        self.state = POST_STATES['WAITING_FOR_MEDIA']
-        self.is_multiple = is_multiple
-        self.current_index = 0
+CHANNEL_RATE_PER_MINUTE = int(os.getenv("CHANNEL_RATE_PER_MINUTE", "20"))
+CHANNEL_BURST = int(os.getenv("CHANNEL_BURST", "3"))
+GLOBAL_RATE_PER_SECOND = int(os.getenv("GLOBAL_RATE_PER_SECOND", "30"))
+
+# Mode cluster: diisi oleh proses front untuk setiap worker (lihat cluster.py)
+WORKER_INDEX = int(os.getenv("WORKER_INDEX", "0"))
+WORKER_COUNT = int(os.getenv("WORKER_COUNT", "1"))
+WORKER_PORT = int(os.getenv("WORKER_PORT", "0"))
+CLUSTER_SECRET = os.getenv("CLUSTER_SECRET", "")
+# Jumlah worker yang dijalankan front (BOT_MODE=cluster) dan port internal pertamanya
+WORKERS = int(os.getenv("WORKERS", str(os.cpu_count() or 2)))
+WORKER_BASE_PORT = int(os.getenv("WORKER_BASE_PORT", "9200"))
+
+# Batas Telegram berlaku untuk bot, bukan per proses: bagi rata ke semua worker
+rate_limiter = RateLimiter(
+    user_limit=POST_LIMIT,
+    chat_per_minute=CHANNEL_RATE_PER_MINUTE / WORKER_COUNT,
+    chat_burst=max(1, CHANNEL_BURST // WORKER_COUNT),
+    global_per_second=GLOBAL_RATE_PER_SECOND / WORKER_COUNT
+)
+
+# Mode bot: "webhook" untuk produksi (di belakang load balancer), "cluster" untuk webhook dengan
+# beberapa proses worker, "polling" untuk development
+BOT_MODE = os.getenv("BOT_MODE", "polling").lower()
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+
+# Transport HTTP ke Bot API: pool terpisah untuk getUpdates, balasan interaktif (preview, tombol) dan
+# publish ke channel, supaya burst publish tidak membuat klik editor antre di belakangnya.
+# HTTP_VERSION=2 butuh paket h2 (pip install "python-telegram-bot[http2]").
+HTTP_VERSION = os.getenv("HTTP_VERSION", "1.1")
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "32"))
+PUBLISH_POOL_SIZE = int(os.getenv("PUBLISH_POOL_SIZE", "16"))
+HTTP_KEEPALIVE = float(os.getenv("HTTP_KEEPALIVE", "30"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "5"))
+HTTP_WRITE_TIMEOUT = float(os.getenv("HTTP_WRITE_TIMEOUT", "5"))
+HTTP_POOL_TIMEOUT = float(os.getenv("HTTP_POOL_TIMEOUT", "1"))
+# Worker publish boleh menunggu koneksi lebih lama; upload media butuh write timeout lebih besar
+PUBLISH_POOL_TIMEOUT = float(os.getenv("PUBLISH_POOL_TIMEOUT", "10"))
+PUBLISH_WRITE_TIMEOUT = float(os.getenv("PUBLISH_WRITE_TIMEOUT", "20"))
+
+# Log JSON Lines ke stdout (atau LOG_FILE), ditulis thread terpisah lewat antrian. LOG_SAMPLE menyaring
+# sebagian record per level / logger, misalnya "DEBUG=0.1,main.preview:WARNING=0.2"; kalau antrian
+# penuh (LOG_QUEUE_SIZE), record dibuang dan dihitung di bot_log_records_dropped.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_SAMPLE = parse_sample_rates(os.getenv("LOG_SAMPLE", ""))
+LOG_FILE = os.getenv("LOG_FILE", "")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+logger = logging.getLogger("main")
+# Gagal kirim / edit preview bisa sangat sering saat ramai; logger sendiri supaya bisa di-sampling
+preview_log = logging.getLogger("main.preview")
+
+# Endpoint Prometheus /metrics, hanya di listener sendiri (METRICS_LISTEN:METRICS_PORT); 0 = nonaktif.
+# Tidak pernah ikut di listener webhook yang terbuka ke publik.
+METRICS_LISTEN = os.getenv("METRICS_LISTEN", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+metrics_server = HTTPServer()
+add_metrics_route(metrics_server)
+metrics.registry.register(Gauge("bot_active_sessions", "Jumlah draft di memori", lambda: len(posts)))
+metrics.registry.register(Gauge("bot_publish_queue_depth", "Job publish yang menunggu worker", lambda: publish_queue.depth))
+metrics.registry.register(Gauge("bot_scheduled_posts", "Draft terjadwal yang belum jatuh tempo", lambda: scheduler.pending))
+metrics.registry.register(Gauge("bot_log_records_dropped", "Record log yang dibuang karena antrian log penuh", dropped_records))
+
+# Update dari user berbeda diproses paralel; update satu user tetap berurutan
+MAX_CONCURRENT_UPDATES = int(os.getenv("MAX_CONCURRENT_UPDATES", "64"))
+# Intake: update_id yang diingat untuk dedup, jendela tap tombol berulang dan umur maksimum callback (detik)
+UPDATE_DEDUP_SIZE = int(os.getenv("UPDATE_DEDUP_SIZE", "4096"))
+CALLBACK_TAP_WINDOW = float(os.getenv("CALLBACK_TAP_WINDOW", "1.0"))
+CALLBACK_MAX_AGE = float(os.getenv("CALLBACK_MAX_AGE", "10"))
+# Batas update yang menunggu / diproses (total dan per user); di atasnya update dibuang (load shedding)
+MAX_PENDING_UPDATES = int(os.getenv("MAX_PENDING_UPDATES", "1000"))
+MAX_PENDING_PER_USER = int(os.getenv("MAX_PENDING_PER_USER", "50"))
+# Diisi build_application: setiap Application punya processor (dan riwayat update_id) sendiri
+update_processor = None
+
+metrics.registry.register(Gauge(
+    "bot_updates_pending", "Update yang menunggu atau sedang diproses handler",
+    lambda: update_processor.pending if update_processor else 0))
+
+# Profiling on-demand lewat /profile (khusus admin); tidak ada biaya saat tidak dipakai
+profiler = Profiler(lambda: update_processor.received)
+profile_tasks = set()
+
+# Rekam semua update masuk (gzip, dirotasi) untuk di-replay dengan replay.py; kosong = nonaktif
+RECORD_UPDATES_DIR = os.getenv("RECORD_UPDATES_DIR", "")
+RECORD_MAX_BYTES = int(os.getenv("RECORD_MAX_BYTES", str(64 << 20)))
+RECORD_KEEP = int(os.getenv("RECORD_KEEP", "10"))
+recorder = UpdateRecorder(RECORD_UPDATES_DIR, max_bytes=RECORD_MAX_BYTES, keep=RECORD_KEEP) if RECORD_UPDATES_DIR else None
+
+# Worker background yang mengirim postingan ke channel
+PUBLISH_WORKERS = int(os.getenv("PUBLISH_WORKERS", "2"))
+# "album": post tanpa button dikirim sebagai media group (maks. 10 per album)
+PUBLISH_MODE = os.getenv("PUBLISH_MODE", "single").lower()
+
+# Draft postingan per user; draft yang ditinggal dibuang setelah SESSION_TTL detik
+SESSION_TTL = int(os.getenv("SESSION_TTL", str(6 * 3600)))
+SESSION_MAX = int(os.getenv("SESSION_MAX", "500"))
+posts = SessionStore(ttl=SESSION_TTL, max_entries=SESSION_MAX)
+
+# Draft juga disimpan ke disk (write-behind) supaya tidak hilang saat restart
+DRAFT_STORE = os.getenv("DRAFT_STORE", "sqlite").lower()
+DRAFT_DB_PATH = os.getenv("DRAFT_DB_PATH", "drafts.sqlite3")
+DRAFT_FLUSH_INTERVAL = float(os.getenv("DRAFT_FLUSH_INTERVAL", "0.5"))
+
+# Publish terjadwal: antrian di SQLite (default satu file dengan draft), jam input editor dalam UTC+N
+SCHEDULE_DB_PATH = os.getenv("SCHEDULE_DB_PATH", DRAFT_DB_PATH)
+SCHEDULE_UTC_OFFSET = float(os.getenv("SCHEDULE_UTC_OFFSET", "7"))
+SCHEDULE_TZ = utc_offset(SCHEDULE_UTC_OFFSET)
+scheduler = PostScheduler(SCHEDULE_DB_PATH, shard=(WORKER_INDEX, WORKER_COUNT))
+
+# Outbox publish: status setiap post per channel, untuk resume setelah restart dan kirim ulang yang gagal
+OUTBOX_DB_PATH = os.getenv("OUTBOX_DB_PATH", DRAFT_DB_PATH)
+OUTBOX_RETENTION_DAYS = float(os.getenv("OUTBOX_RETENTION_DAYS", "7"))
+
+# Indeks post yang sudah terbit, untuk edit / hapus massal (/replaceurl, /replacetext, /deleteposts)
+POST_INDEX_DB_PATH = os.getenv("POST_INDEX_DB_PATH", DRAFT_DB_PATH)
+BULK_MAX_POSTS = int(os.getenv("BULK_MAX_POSTS", "500"))
+BULK_CONCURRENCY = int(os.getenv("BULK_CONCURRENCY", "8"))
+post_index = PostIndex(POST_INDEX_DB_PATH)
+pending_bulk = {}  # user_id -> BulkOperation yang menunggu konfirmasi
+bulk_ids = itertools.count(1)
+bulk_tasks = set()
+
+# Set button bernama per user (/buttonset, /usebuttons); default satu file dengan draft
+BUTTON_SETS_DB_PATH = os.getenv("BUTTON_SETS_DB_PATH", DRAFT_DB_PATH)
+button_sets = ButtonSets(BUTTON_SETS_DB_PATH)
+
+# Gambar yang dikirim sebagai dokumen atau URL: diperkecil bila sisi terpanjang > IMAGE_MAX_SIDE px
+# (butuh Pillow), dan file_id hasil upload di-cache per hash isi supaya gambar yang sama tidak di-upload lagi
+IMAGE_CACHE_DB_PATH = os.getenv("IMAGE_CACHE_DB_PATH", DRAFT_DB_PATH)
+IMAGE_MAX_SIDE = int(os.getenv("IMAGE_MAX_SIDE", "2560"))
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+image_intake = ImageIntake(IMAGE_CACHE_DB_PATH, max_side=IMAGE_MAX_SIDE, workers=IMAGE_WORKERS)
+
+# Bagian album ditunggu sampai MEDIA_GROUP_DELAY detik tanpa bagian baru, lalu diproses sekaligus
+MEDIA_GROUP_DELAY = float(os.getenv("MEDIA_GROUP_DELAY", "1.0"))
+
+# Import postingan dari file JSON Lines / CSV (/import); Bot API hanya bisa mengunduh file ≤ 20 MB
+IMPORT_MAX_ROWS = int(os.getenv("IMPORT_MAX_ROWS", "1000"))
+IMPORT_MAX_BYTES = 20 << 20
+
+def create_draft_backend():
+    if DRAFT_STORE == "memory":
+        return MemoryDraftBackend()
+    return SQLiteDraftBackend(DRAFT_DB_PATH)
+
+drafts = DraftPersistence(create_draft_backend, flush_interval=DRAFT_FLUSH_INTERVAL)
+
+def republish_markup(job: PublishJob) -> InlineKeyboardMarkup:
+    """Tombol di pesan ringkasan publish untuk mengirim ulang post yang gagal saja."""
+    return InlineKeyboardMarkup([[
+        InlineKeyboardButton("🔁 Kirim Ulang yang Gagal", callback_data=encode_callback(callbacks.REPUBLISH, job.id))
+    ]])
+
+# Diisi build_application; dipakai antrian publish, penjadwal dan operasi massal
+publish_bot = None
+
+publish_queue = PublishQueue(
+    rate_limiter,
+    Outbox(OUTBOX_DB_PATH, retention=OUTBOX_RETENTION_DAYS * 86400, shard=(WORKER_INDEX, WORKER_COUNT)),
+    workers=PUBLISH_WORKERS,
+    failed_markup=republish_markup,
+    on_published=post_index.record
+)
 
 async def start(update: Update, context: CallbackContext) -> None:
     """Menampilkan menu utama dengan tombol."""
@@ -44,8 +222,8 @@ async def start(update: Update, context: CallbackContext) -> None:
         return
 
     keyboard = [
-        [InlineKeyboardButton("📩 Single Post", callback_data="create_post_single")],
-        [InlineKeyboardButton("📤 Multiple Post", callback_data="create_post_multiple")]
+        [InlineKeyboardButton("📩 Single Post", callback_data=encode_callback(callbacks.CREATE_SINGLE))],
+        [InlineKeyboardButton("📤 Multiple Post", callback_data=encode_callback(callbacks.CREATE_MULTIPLE))]
     ]
     reply_markup = InlineKeyboardMarkup(keyboard)
 
@@ -54,13 +232,12 @@ async def start(update: Update, context: CallbackContext) -> None:
         reply_markup=reply_markup
     )
 
-async def create_post(update: Update, context: CallbackContext) -> None:
+async def create_post(update: Update, context: CallbackContext, is_multiple=False) -> None:
     """Memulai pembuatan postingan baru."""
     query = update.callback_query
     await query.answer()
 
     user_id = query.from_user.id
-    is_multiple = query.data == "create_post_multiple"
     posts[user_id] = PostData(is_multiple=is_multiple)
 
     message = "📸 Kirim gambar album dan teks deskripsi untuk postingan.\n\n"
@@ -69,13 +246,29 @@ async def create_post(update: Update, context: CallbackContext) -> None:
                    "1. Kirim gambar satu per satu dengan caption\n"
                    "2. Setiap gambar bisa ditambahkan button\n"
                    "3. Gunakan tombol navigasi untuk edit post sebelumnya\n"
-                   "4. Semua post akan dikirim dengan button yang sama\n\n")
+                   "4. Pakai set button yang sama untuk banyak post sekaligus dengan /usebuttons\n\n")
     message += "Ketik /cancel untuk membatalkan atau /done untuk menyelesaikan."
 
     await query.message.reply_text(message)
 
+async def intake_images(bot, message, messages):
+    """file_id gambar setiap pesan: foto dipakai langsung, dokumen gambar lewat image_intake (cache atau upload sekali)."""
+    images = []
+    for item in messages:
+        if item.photo:
+            images.append(PreparedImage(None, item.photo[-1].file_id))
+        else:
+            images.append(await image_intake.prepare(await image_intake.download(item.document)))
+    await image_intake.upload(bot, message.chat_id, images, caption="🖼️ Gambar diunggah")
+    return [image.file_id for image in images]
+
 async def receive_media(update: Update, context: CallbackContext) -> None:
-    """Menerima gambar + teks dari pengguna."""
+    """Menerima gambar (foto atau dokumen gambar) + teks dari pengguna."""
+    if update.message.media_group_id:
+        # Bagian album dikumpulkan dulu, lalu diproses sekaligus oleh receive_media_group
+        media_groups.add(update, context)
+        return
+
     user_id = update.message.from_user.id
     if user_id not in posts:
         await update.message.reply_text("⚠️ Silakan mulai dengan /start")
@@ -87,16 +280,56 @@ async def receive_media(update: Update, context: CallbackContext) -> None:
         await update.message.reply_text("⚠️ Mohon sertakan caption untuk gambar!")
         return
 
-    post_data.photos.append(update.message.photo[-1].file_id)
-    post_data.texts.append(update.message.caption)
-    post_data.buttons_per_post.append([])  # Initialize empty button list for new post
+    try:
+        file_id, = await intake_images(context.bot, update.message, [update.message])
+    except (ImageError, TelegramError) as e:
+        await update.message.reply_text(f"❌ Gagal memproses gambar: {e}")
+        return
 
-    await update.message.reply_text(
-        f"✅ Gambar ke-{len(post_data.photos)} diterima!"
-    )
-    await send_preview(update, context, user_id)
+    post_data.entries.append(Post(file_id, update.message.caption))
+    post_data.revision += 1
+
+    await acknowledge_media(update, context, user_id, f"✅ Gambar ke-{len(post_data.entries)} diterima!")
+
+async def receive_media_group(update: Update, context: CallbackContext, messages) -> None:
+    """Menambahkan semua gambar satu album sekaligus: satu balasan dan satu preview per album."""
+    user_id = update.message.from_user.id
+    # Berjalan di luar handler, jadi ambil lock user yang sama supaya tidak balapan dengan update lain
+    async with update_processor.user_lock(user_id):
+        if user_id not in posts:
+            await update.message.reply_text("⚠️ Silakan mulai dengan /start")
+            return
+
+        post_data = posts[user_id]
+        # Telegram biasanya hanya menaruh caption di salah satu gambar album
+        album_caption = next((message.caption for message in messages if message.caption), None)
+        if not album_caption:
+            await update.message.reply_text("⚠️ Mohon sertakan caption untuk album!")
+            return
+
+        try:
+            file_ids = await intake_images(context.bot, update.message, messages)
+        except (ImageError, TelegramError) as e:
+            await update.message.reply_text(f"❌ Gagal memproses album: {e}")
+            return
+
+        first = len(post_data.entries) + 1
+        for message, file_id in zip(messages, file_ids):
+            post_data.entries.append(Post(file_id, message.caption or album_caption))
+        post_data.revision += 1
+
+        text = f"✅ {len(messages)} gambar diterima! (Gambar ke-{first} sampai ke-{len(post_data.entries)})"
+        await acknowledge_media(update, context, user_id, text)
+        drafts.mark_dirty(user_id, posts.get(user_id))
+
+media_groups = MediaGroupCollector(instrument_handler(receive_media_group), delay=MEDIA_GROUP_DELAY)
+
+async def acknowledge_media(update: Update, context: CallbackContext, user_id: int, text: str) -> None:
+    """Konfirmasi gambar yang diterima lalu tampilkan preview baru."""
+    await update.message.reply_text(text)
+    await send_preview(update, context, user_id, force_new=True)
     
-    if post_data.is_multiple:
+    if posts[user_id].is_multiple:
         await update.message.reply_text(
             "Multiple Post Mode:\n"
             "1. Edit post ini (tambah button jika diperlukan)\n"
@@ -120,10 +353,12 @@ async def add_link(update: Update, context: CallbackContext) -> None:
     post_data.state = POST_STATES['WAITING_FOR_LINK']
 
     # Tampilkan status current buttons
-    current_buttons = post_data.buttons_per_post[current_index]
+    current_buttons = post_data.current.all_buttons
     status_text = f"📝 Menambah button untuk Post {current_index + 1}"
     if post_data.is_multiple:
-        status_text += f"/{len(post_data.photos)}"
+        status_text += f"/{len(post_data.entries)}"
+    if post_data.current.button_set:
+        status_text += f"\n🔗 Memakai set button '{post_data.current.button_set.name}'"
     
     if current_buttons:
         status_text += "\n\nButton yang sudah ada:"
@@ -139,18 +374,25 @@ async def add_link(update: Update, context: CallbackContext) -> None:
         "• Bisa kirim beberapa sekaligus (satu baris satu button)\n"
         "• Ketik /done untuk selesai dan melihat preview"
     )
-    
-    await send_message(update, status_text + instructions, context=context)
 
-async def send_preview(update: Update, context: CallbackContext, user_id: int):
-    """Mengirim preview postingan dengan semua tombol yang sudah dibuat."""
+    # Ubah panel edit jadi instruksi, tanpa mengirim pesan baru
+    markup = InlineKeyboardMarkup([[InlineKeyboardButton("🔍 Preview Post", callback_data=post_callback(post_data, callbacks.BACK_TO_PREVIEW))]])
+    if not await edit_control_message(context, post_data, status_text + instructions, markup):
+        await send_message(update, status_text + instructions, context=context)
+
+async def send_preview(update: Update, context: CallbackContext, user_id: int, notice=None, force_new=False):
+    """Menampilkan preview postingan dengan semua tombol yang sudah dibuat.
+
+    Kalau preview sebelumnya masih ada, pesan preview dan panel edit diedit di tempat;
+    `force_new` memaksa kirim pesan baru (misalnya setelah user mengirim gambar).
+    """
     if user_id not in posts:
         return
 
     post_data = posts[user_id]
     current_index = post_data.current_index
 
-    if not post_data.photos:
+    if not post_data.entries:
         return
 
     # Get chat_id from either callback_query or message
@@ -160,42 +402,40 @@ async def send_preview(update: Update, context: CallbackContext, user_id: int):
     elif hasattr(update, 'message') and update.message:
         chat_id = update.message.chat_id
     else:
-        print("Warning: No valid chat_id found in send_preview")
+        preview_log.warning("Tidak ada chat_id yang valid di send_preview")
         return
 
     # Tampilkan button untuk post yang sedang aktif
-    reply_markup = None
-    current_buttons = post_data.buttons_per_post[current_index]
-    if current_buttons:
-        reply_markup = InlineKeyboardMarkup([[button] for button in current_buttons])
+    reply_markup = post_data.current.markup
 
     # Navigation buttons for multiple posts
     preview_keyboard = []
     if post_data.is_multiple:
         nav_buttons = []
         if current_index > 0:
-            nav_buttons.append(InlineKeyboardButton("⬅️ Prev", callback_data="prev_preview"))
-        if current_index < len(post_data.photos) - 1:
-            nav_buttons.append(InlineKeyboardButton("Next ➡️", callback_data="next_preview"))
+            nav_buttons.append(InlineKeyboardButton("⬅️ Prev", callback_data=post_callback(post_data, callbacks.PREV_PREVIEW)))
+        if current_index < len(post_data.entries) - 1:
+            nav_buttons.append(InlineKeyboardButton("Next ➡️", callback_data=post_callback(post_data, callbacks.NEXT_PREVIEW)))
         if nav_buttons:
             preview_keyboard.append(nav_buttons)
 
     # Edit buttons
     preview_keyboard.extend([
-        [InlineKeyboardButton("➕ Add Linkbutton", callback_data="add_link")],
-        [InlineKeyboardButton("🗑 Delete Linkbutton", callback_data="delete_link")],
-        [InlineKeyboardButton("✅ Done", callback_data="done")],
-        [InlineKeyboardButton("❌ Cancel", callback_data="cancel")]
+        [InlineKeyboardButton("➕ Add Linkbutton", callback_data=post_callback(post_data, callbacks.ADD_LINK))],
+        [InlineKeyboardButton("🗑 Delete Linkbutton", callback_data=post_callback(post_data, callbacks.DELETE_LINK))],
+        [InlineKeyboardButton("✅ Done", callback_data=post_callback(post_data, callbacks.DONE))],
+        [InlineKeyboardButton("🕒 Schedule", callback_data=post_callback(post_data, callbacks.SCHEDULE))],
+        [InlineKeyboardButton("❌ Cancel", callback_data=post_callback(post_data, callbacks.CANCEL))]
     ])
 
     interface_markup = InlineKeyboardMarkup(preview_keyboard)
 
     # Send preview with current index and button info
-    current_buttons = post_data.buttons_per_post[current_index]
-    preview_text = f"{post_data.texts[current_index]}"
+    current_buttons = post_data.current.all_buttons
+    preview_text = post_data.current.text
     
     if post_data.is_multiple:
-        next_text = f"\n\n📑 Post {current_index + 1}/{len(post_data.photos)}"
+        next_text = f"\n\n📑 Post {current_index + 1}/{len(post_data.entries)}"
         
         # Tampilkan info button
         if current_buttons:
@@ -204,56 +444,137 @@ async def send_preview(update: Update, context: CallbackContext, user_id: int):
                 next_text += f"\n{i}. {btn.text}"
         
         # Tampilkan instruksi navigasi
-        if current_index < len(post_data.photos) - 1:
+        if current_index < len(post_data.entries) - 1:
             next_text += "\n\n➡️ Klik 'Next' untuk melanjutkan ke post berikutnya"
         else:
             next_text += "\n\n✅ Ini post terakhir, klik 'Done' untuk mengirim semua"
         
         preview_text += next_text
-    
+
+    # Customize edit message based on multiple post state
+    edit_message = "🔧 Edit postingan:"
+    if post_data.is_multiple:
+        edit_message = f"🔧 Edit Post {current_index + 1}/{len(post_data.entries)}:"
+        if current_index < len(post_data.entries) - 1:
+            edit_message += "\nSetelah selesai edit, klik 'Next ➡️' untuk lanjut ke post berikutnya" 
+        else:
+            edit_message += "\nIni post terakhir, klik '✅ Done' untuk mengirim semua post"
+    if notice:
+        edit_message = f"{notice}\n\n{edit_message}"
+
+    session = post_data.preview
+    if not force_new and session and session.chat_id == chat_id:
+        if await edit_preview(context, post_data, preview_text, reply_markup, edit_message, interface_markup):
+            post_data.state = POST_STATES['EDITING']
+            return
+
     # Send photo preview using context.bot
+    preview_message = None
+    is_photo = True
     try:
-        await context.bot.send_photo(
+        preview_message = await context.bot.send_photo(
             chat_id=chat_id,
-            photo=post_data.photos[current_index],
+            photo=post_data.current.photo,
             caption=preview_text,
             reply_markup=reply_markup
         )
     except Exception as e:
-        print(f"Error sending photo preview: {e}")
+        preview_log.warning("Gagal mengirim preview foto: %s", e)
         # Fallback jika gagal mengirim preview dengan photo
+        is_photo = False
         try:
-            await context.bot.send_message(
+            preview_message = await context.bot.send_message(
                 chat_id=chat_id,
                 text=f"📸 [Preview Post {current_index + 1}]\n\n{preview_text}",
                 reply_markup=reply_markup
             )
         except Exception as fallback_error:
-            print(f"Fallback error: {fallback_error}")
+            preview_log.error("Gagal mengirim preview teks: %s", fallback_error)
             return
-    
-    # Customize edit message based on multiple post state
-    edit_message = "🔧 Edit postingan:"
-    if post_data.is_multiple:
-        edit_message = f"🔧 Edit Post {current_index + 1}/{len(post_data.photos)}:"
-        if current_index < len(post_data.photos) - 1:
-            edit_message += "\nSetelah selesai edit, klik 'Next ➡️' untuk lanjut ke post berikutnya" 
-        else:
-            edit_message += "\nIni post terakhir, klik '✅ Done' untuk mengirim semua post"
-    
+
     # Send edit interface using context.bot
+    control_message = None
     try:
-        await context.bot.send_message(
+        control_message = await context.bot.send_message(
             chat_id=chat_id,
             text=edit_message,
             reply_markup=interface_markup
         )
     except Exception as e:
-        print(f"Error sending edit interface: {e}")
-    
+        preview_log.warning("Gagal mengirim panel edit: %s", e)
+
+    post_data.preview = PreviewSession(
+        chat_id,
+        preview_message.message_id,
+        control_message.message_id if control_message else None,
+        is_photo,
+        current_index
+    )
     post_data.state = POST_STATES['EDITING']
 
-async def navigate_preview(update: Update, context: CallbackContext) -> None:
+async def edit_preview(context: CallbackContext, post_data: PostData, preview_text, reply_markup, edit_message, interface_markup) -> bool:
+    """Edit preview dan panel edit yang sudah tampil. False jika harus kirim ulang."""
+    session = post_data.preview
+    try:
+        if session.is_photo and session.index == post_data.current_index:
+            # Gambar sama, cukup ganti caption dan button
+            await context.bot.edit_message_caption(
+                chat_id=session.chat_id,
+                message_id=session.preview_message_id,
+                caption=preview_text,
+                reply_markup=reply_markup
+            )
+        elif session.is_photo:
+            await context.bot.edit_message_media(
+                chat_id=session.chat_id,
+                message_id=session.preview_message_id,
+                media=InputMediaPhoto(post_data.current.photo, caption=preview_text),
+                reply_markup=reply_markup
+            )
+            session.index = post_data.current_index
+        else:
+            await context.bot.edit_message_text(
+                chat_id=session.chat_id,
+                message_id=session.preview_message_id,
+                text=f"📸 [Preview Post {post_data.current_index + 1}]\n\n{preview_text}",
+                reply_markup=reply_markup
+            )
+    except BadRequest as e:
+        if not is_not_modified(e):
+            preview_log.warning("Gagal mengedit preview: %s", e)
+            return False
+    except TelegramError as e:
+        preview_log.warning("Gagal mengedit preview: %s", e)
+        return False
+
+    return await edit_control_message(context, post_data, edit_message, interface_markup)
+
+async def edit_control_message(context: CallbackContext, post_data: PostData, text, reply_markup) -> bool:
+    """Ganti isi panel edit. False jika tidak ada panel atau gagal diedit."""
+    session = post_data.preview
+    if not session or not session.control_message_id:
+        return False
+    try:
+        await context.bot.edit_message_text(
+            chat_id=session.chat_id,
+            message_id=session.control_message_id,
+            text=text,
+            reply_markup=reply_markup
+        )
+    except BadRequest as e:
+        if not is_not_modified(e):
+            preview_log.warning("Gagal mengedit panel edit: %s", e)
+            return False
+    except TelegramError as e:
+        preview_log.warning("Gagal mengedit panel edit: %s", e)
+        return False
+    return True
+
+def is_not_modified(error: BadRequest) -> bool:
+    # Telegram menolak edit yang isinya sama persis; bagi kita itu tetap berhasil
+    return "message is not modified" in str(error).lower()
+
+async def navigate_preview(update: Update, context: CallbackContext, step=1) -> None:
     """Handle navigation between multiple posts in preview."""
     query = update.callback_query
     await query.answer()
@@ -266,52 +587,11 @@ async def navigate_preview(update: Update, context: CallbackContext) -> None:
     post_data = posts[user_id]
     
     # Handle navigation (next or prev)
-    if query.data == "next_preview" and post_data.current_index < len(post_data.photos) - 1:
-        post_data.current_index += 1
-    elif query.data == "prev_preview" and post_data.current_index > 0:
-        post_data.current_index -= 1
-    
-    # Reset state ke EDITING untuk tampilan baru
-    post_data.state = POST_STATES['EDITING']
-    
-    # Tampilkan status post berikutnya
-    status = f"📝 Post {post_data.current_index + 1}/{len(post_data.photos)}"
-    current_buttons = post_data.buttons_per_post[post_data.current_index]
-    
-    if current_buttons:
-        status += "\n\n🔘 Button yang ada di post ini:"
-        for i, btn in enumerate(current_buttons, 1):
-            status += f"\n{i}. {btn.text}"
-    
-    # Tampilkan opsi untuk navigasi
-    keyboard = []
-    nav_buttons = []
-    
-    if post_data.current_index > 0:
-        nav_buttons.append(InlineKeyboardButton("⬅️ Post Sebelumnya", callback_data="prev_preview"))
-    if post_data.current_index < len(post_data.photos) - 1:
-        nav_buttons.append(InlineKeyboardButton("Post Berikutnya ➡️", callback_data="next_preview"))
-    
-    if nav_buttons:
-        keyboard.append(nav_buttons)
-        
-    keyboard.extend([
-        [InlineKeyboardButton("➕ Add Button", callback_data="add_link")],
-        [InlineKeyboardButton("🔍 Preview Post", callback_data="back_to_preview")],
-        [InlineKeyboardButton("✅ Done", callback_data="done")],
-        [InlineKeyboardButton("❌ Cancel", callback_data="cancel")]
-    ])
-    markup = InlineKeyboardMarkup(keyboard)
-    
-    # Tambahkan informasi navigasi
-    if post_data.current_index == 0:
-        status += "\n\n🔸 Ini adalah post pertama"
-    elif post_data.current_index == len(post_data.photos) - 1:
-        status += "\n\n🔸 Ini adalah post terakhir"
-    else:
-        status += f"\n\n🔸 Post {post_data.current_index + 1} dari {len(post_data.photos)}"
-    
-    await send_message(update, status, reply_markup=markup, context=context)
+    new_index = post_data.current_index + step
+    if 0 <= new_index < len(post_data.entries):
+        post_data.current_index = new_index
+        post_data.revision += 1
+
     await send_preview(update, context, user_id)
 
 async def cancel_command(update: Update, context: CallbackContext) -> None:
@@ -331,48 +611,437 @@ async def done_command(update: Update, context: CallbackContext) -> None:
         await update.message.reply_text("⚠️ Tidak ada postingan aktif. Silakan mulai dengan /start")
         return
 
+    await enqueue_publish(update, context, user_id)
+
+async def check_publishable(update: Update, context: CallbackContext, user_id: int) -> bool:
+    """Draft harus berisi post dan user belum melewati batas anti-spam."""
     post_data = posts[user_id]
 
+    if not post_data.entries:
+        await send_message(update, "⚠️ Tidak ada postingan yang bisa dikirim!", context=context)
+        return False
+
     # Cek batasan postingan untuk anti-spam
-    global last_reset_time
-    if time.time() - last_reset_time >= 60:
-        user_post_count.clear()
-        last_reset_time = time.time()
+    if not rate_limiter.allow_posts(user_id, len(post_data.entries)):
+        wait = int(rate_limiter.user_wait_time(user_id)) + 1
+        await send_message(
+            update,
+            f"⚠️ Anda mencapai batas {POST_LIMIT} postingan per menit. Coba lagi dalam {wait} detik.",
+            context=context
+        )
+        return False
+    return True
+
+def publish_items(post_data: PostData) -> list:
+    """Snapshot semua post beserta button masing-masing untuk PublishJob."""
+    # Post yang memakai set yang sama berbagi satu objek markup
+    return [(post.photo, post.text, post.markup) for post in post_data.entries]
+
+async def enqueue_publish(update: Update, context: CallbackContext, user_id: int) -> None:
+    """Validasi draft lalu serahkan ke antrian publish; handler langsung kembali."""
+    if not await check_publishable(update, context, user_id):
+        return
+
+    items = publish_items(posts[user_id])
+    status = await send_message(update, f"⏳ {len(items)} postingan masuk antrian kirim...", context=context)
+    await publish_queue.submit(PublishJob(
+        user_id=user_id,
+        chat_id=update.effective_chat.id,
+        channel_ids=CHANNEL_IDS,
+        items=items,
+        album=PUBLISH_MODE == "album",
+        status_message_id=status.message_id if status else None
+    ))
+    del posts[user_id]
+
+async def schedule(update: Update, context: CallbackContext) -> None:
+    """Alternatif dari Done: minta waktu publish untuk draft."""
+    query = update.callback_query
+    await query.answer()
+    user_id = query.from_user.id
+    if user_id not in posts:
+        await send_message(update, "⚠️ Sesi telah berakhir. Silakan mulai dengan /start", context=context)
+        return
+
+    await ask_schedule_time(update, context, posts[user_id])
 
-    if user_id not in user_post_count:
-        user_post_count[user_id] = 0
+async def schedule_command(update: Update, context: CallbackContext) -> None:
+    """Handle /schedule [waktu]"""
+    user_id = update.message.from_user.id
+    if user_id not in posts:
+        await update.message.reply_text("⚠️ Tidak ada postingan aktif. Silakan mulai dengan /start")
+        return
 
-    if user_post_count[user_id] >= POST_LIMIT:
-        await update.message.reply_text("⚠️ Anda mencapai batas 50 postingan per menit.")
+    if context.args:
+        await receive_schedule_time(update, context, user_id, " ".join(context.args))
+    else:
+        await ask_schedule_time(update, context, posts[user_id])
+
+async def ask_schedule_time(update: Update, context: CallbackContext, post_data: PostData) -> None:
+    post_data.state = POST_STATES['WAITING_FOR_SCHEDULE']
+    text = (
+        "🕒 Kapan postingan ini dikirim ke channel?\n\n"
+        "Kirim waktu dengan salah satu format:\n"
+        "• +30m / +2h / +1d (dari sekarang)\n"
+        "• 18:30 (hari ini, atau besok jika sudah lewat)\n"
+        "• 2025-12-31 18:30\n"
+        "• 31/12/2025 18:30\n\n"
+        f"Zona waktu: UTC{SCHEDULE_UTC_OFFSET:+g}"
+    )
+    markup = InlineKeyboardMarkup([[InlineKeyboardButton("🔍 Preview Post", callback_data=post_callback(post_data, callbacks.BACK_TO_PREVIEW))]])
+    if not await edit_control_message(context, post_data, text, markup):
+        await send_message(update, text, reply_markup=markup, context=context)
+
+async def receive_schedule_time(update: Update, context: CallbackContext, user_id: int, text: str) -> None:
+    """Simpan draft ke antrian terjadwal pada waktu yang dikirim editor."""
+    now = time.time()
+    due_at = parse_schedule_time(text, now, SCHEDULE_TZ)
+    error = "Format waktu tidak dikenali" if due_at is None else validate_schedule_time(due_at, now)
+    if error:
+        await update.message.reply_text(f"⚠️ {error}. Kirim waktu lain, misalnya +2h atau 18:30.")
         return
 
-    if not post_data.photos or not post_data.texts:
-        await update.message.reply_text("⚠️ Tidak ada postingan yang bisa dikirim!")
+    if not await check_publishable(update, context, user_id):
         return
 
-    # Send all posts with their respective buttons
+    post_data = posts[user_id]
+    job_id = await scheduler.schedule(due_at, user_id, update.effective_chat.id, dump_post_data(post_data))
+    del posts[user_id]
+    await update.message.reply_text(
+        f"🕒 {len(post_data.entries)} postingan dijadwalkan (#{job_id}) pada {format_local(due_at, SCHEDULE_TZ)}.\n\n"
+        f"Lihat jadwal dengan /scheduled, batalkan dengan /unschedule {job_id}"
+    )
+
+async def publish_scheduled(bot, job) -> None:
+    """Dipanggil penjadwal saat draft terjadwal jatuh tempo: serahkan ke antrian publish."""
+    items = publish_items(load_post_data(job.data))
+    status = None
     try:
-        success_count = 0
-        for i, (photo, text, buttons) in enumerate(zip(post_data.photos, post_data.texts, post_data.buttons_per_post), 1):
-            # Setup reply markup for this specific post
-            reply_markup = None
-            if buttons:
-                reply_markup = InlineKeyboardMarkup([[button] for button in buttons])
-                
-            await context.bot.send_photo(
-                chat_id=CHANNEL_ID,
-                photo=photo,
-                caption=text,
-                reply_markup=reply_markup
-            )
-            user_post_count[user_id] += 1
+        status = await bot.send_message(
+            chat_id=job.chat_id,
+            text=f"⏳ Postingan terjadwal #{job.id} ({len(items)} post) mulai dikirim..."
+        )
+    except TelegramError as e:
+        logger.warning("Gagal memberi tahu publish terjadwal #%s: %s", job.id, e)
+    await publish_queue.submit(PublishJob(
+        user_id=job.user_id,
+        chat_id=job.chat_id,
+        channel_ids=CHANNEL_IDS,
+        items=items,
+        album=PUBLISH_MODE == "album",
+        status_message_id=status.message_id if status else None
+    ))
+
+async def republish(update: Update, context: CallbackContext) -> None:
+    """Kirim ulang post yang gagal dari satu job publish (tombol di pesan ringkasan)."""
+    query = update.callback_query
+    _, job_id, _ = decode_callback(query.data)
+    if query.from_user.id not in AUTHORIZED_USERS:
+        await query.answer("⚠️ Anda tidak memiliki akses untuk menggunakan bot ini.", show_alert=True)
+        return
+
+    job = await publish_queue.republish(job_id, query.from_user.id)
+    if job is None:
+        await query.answer("⚠️ Tidak ada postingan gagal untuk dikirim ulang (atau masih dikirim).", show_alert=True)
+        return
+    failed = len(job.items) * len(job.channel_ids) - job.sent
+    await query.answer(f"🔁 {failed} postingan yang gagal masuk antrian kirim ulang")
+
+async def scheduled_command(update: Update, context: CallbackContext) -> None:
+    """Menampilkan postingan terjadwal milik user."""
+    jobs = await scheduler.list_for_user(update.message.from_user.id)
+    if not jobs:
+        await update.message.reply_text("📭 Tidak ada postingan terjadwal.")
+        return
 
+    text = "🕒 Postingan terjadwal:"
+    for job_id, due_at, post_count in jobs:
+        text += f"\n#{job_id} - {format_local(due_at, SCHEDULE_TZ)} ({post_count} post)"
+    text += "\n\nBatalkan dengan /unschedule <nomor>"
+    await update.message.reply_text(text)
+
+async def unschedule_command(update: Update, context: CallbackContext) -> None:
+    """Handle /unschedule <nomor>"""
+    try:
+        job_id = int(context.args[0].lstrip("#"))
+    except (IndexError, ValueError):
+        await update.message.reply_text("⚠️ Format: /unschedule <nomor>. Lihat nomor dengan /scheduled")
+        return
+
+    if await scheduler.cancel(job_id, update.message.from_user.id):
+        await update.message.reply_text(f"❌ Postingan terjadwal #{job_id} dibatalkan.")
+    else:
+        await update.message.reply_text(f"⚠️ Postingan terjadwal #{job_id} tidak ditemukan.")
+
+async def buttonset_command(update: Update, context: CallbackContext) -> None:
+    """Handle /buttonset <nama> + baris-baris "Nama Button - URL": simpan (atau ganti) set button."""
+    user_id = update.message.from_user.id
+    if user_id not in AUTHORIZED_USERS:
+        await update.message.reply_text("⚠️ Anda tidak memiliki akses untuk menggunakan bot ini.")
+        return
+
+    first_line, _, body = update.message.text.partition("\n")
+    args = first_line.split()[1:]
+    name = normalize_name(args[0]) if args else None
+    if name is None:
         await update.message.reply_text(
-            f"✅ Berhasil mengirim {len(post_data.photos)} postingan ke channel!"
+            "⚠️ Format:\n/buttonset <nama>\nNama Button - URL\nNama Button - URL\n\n"
+            "Nama set: huruf, angka, _ atau - (maks. 32 karakter)"
         )
-        del posts[user_id]
-    except Exception as e:
-        await update.message.reply_text(f"⚠️ Terjadi kesalahan saat mengirim postingan: {str(e)}")
+        return
+
+    if not body.strip():
+        button_set = await button_sets.get(user_id, name)
+        if button_set is None:
+            await update.message.reply_text(f"⚠️ Set button '{name}' tidak ditemukan. Lihat semua set dengan /buttonsets")
+            return
+        text = f"🔗 Set button '{name}':"
+        for i, btn in enumerate(button_set.buttons, 1):
+            text += f"\n{i}. {btn.text} - {btn.url}"
+        await update.message.reply_text(text)
+        return
+
+    buttons, errors = parse_button_lines(body)
+    if errors or not buttons:
+        # Set dipakai di banyak post sekaligus, jadi jangan simpan setengah jadi
+        await update.message.reply_text("⚠️ Set tidak disimpan:\n" + ("\n".join(errors) or "Tidak ada button"))
+        return
+
+    button_set = await button_sets.save(user_id, name, buttons)
+    if button_set is None:
+        await update.message.reply_text(f"⚠️ Maksimal {MAX_SETS_PER_USER} set button. Hapus set lama dengan /delbuttonset <nama>")
+        return
+
+    text = f"✅ Set button '{name}' disimpan ({len(buttons)} button)."
+    post_data = posts.get(user_id)
+    if post_data is not None:
+        # Post di draft aktif yang memakai set lama ikut memakai versi baru
+        updated = 0
+        for post in post_data.entries:
+            if post.button_set and post.button_set.name == name:
+                post.button_set = button_set
+                updated += 1
+        if updated:
+            # Revisi naik membuat tombol preview lama tidak berlaku, jadi preview harus ditampilkan ulang
+            post_data.revision += 1
+            text += f"\n🔄 {updated} post di draft ikut diperbarui."
+            await send_preview(update, context, user_id, notice=text, force_new=True)
+            return
+    text += f"\n\nPasang ke post dengan /usebuttons {name} [all | 3 | 2-5]"
+    await update.message.reply_text(text)
+
+async def buttonsets_command(update: Update, context: CallbackContext) -> None:
+    """Menampilkan set button milik user."""
+    user_id = update.message.from_user.id
+    if user_id not in AUTHORIZED_USERS:
+        await update.message.reply_text("⚠️ Anda tidak memiliki akses untuk menggunakan bot ini.")
+        return
+
+    sets = await button_sets.for_user(user_id)
+    if not sets:
+        await update.message.reply_text(
+            "📭 Belum ada set button.\n\nBuat dengan:\n/buttonset <nama>\nNama Button - URL"
+        )
+        return
+
+    text = "🔗 Set button Anda:"
+    for name, button_set in sorted(sets.items()):
+        text += f"\n• {name} ({len(button_set.buttons)} button): " + ", ".join(btn.text for btn in button_set.buttons)
+    text += "\n\nPasang ke post dengan /usebuttons <nama> [all | 3 | 2-5]"
+    await update.message.reply_text(text)
+
+async def usebuttons_command(update: Update, context: CallbackContext) -> None:
+    """Handle /usebuttons <nama|-> [all | N | N-M]: pasang (atau lepas) set button di post draft."""
+    user_id = update.message.from_user.id
+    if user_id not in posts or not posts[user_id].entries:
+        await update.message.reply_text("⚠️ Tidak ada postingan aktif. Silakan mulai dengan /start")
+        return
+
+    post_data = posts[user_id]
+    if not context.args:
+        await update.message.reply_text(
+            "⚠️ Format: /usebuttons <nama> [all | 3 | 2-5]\n"
+            "Tanpa nomor post: hanya post yang sedang tampil. Nama '-' melepas set."
+        )
+        return
+
+    button_set = None
+    if context.args[0] != "-":
+        name = normalize_name(context.args[0])
+        button_set = await button_sets.get(user_id, name) if name else None
+        if button_set is None:
+            await update.message.reply_text(f"⚠️ Set button '{context.args[0]}' tidak ditemukan. Lihat semua set dengan /buttonsets")
+            return
+
+    targets = parse_post_range(" ".join(context.args[1:]), len(post_data.entries), post_data.current_index)
+    if targets is None:
+        await update.message.reply_text(f"⚠️ Nomor post harus all, N atau N-M (1 sampai {len(post_data.entries)}).")
+        return
+
+    for index in targets:
+        # Semua post memegang referensi ke objek set yang sama, tanpa menyalin button-nya
+        post_data.entries[index].button_set = button_set
+    post_data.revision += 1
+
+    where = f"post {targets[0] + 1}" if len(targets) == 1 else f"post {targets[0] + 1}-{targets[-1] + 1}"
+    if button_set is None:
+        notice = f"✅ Set button dilepas dari {where}."
+    else:
+        notice = f"✅ Set button '{button_set.name}' dipasang di {where}."
+    await send_preview(update, context, user_id, notice=notice, force_new=True)
+
+async def delbuttonset_command(update: Update, context: CallbackContext) -> None:
+    """Handle /delbuttonset <nama>"""
+    user_id = update.message.from_user.id
+    if user_id not in AUTHORIZED_USERS:
+        await update.message.reply_text("⚠️ Anda tidak memiliki akses untuk menggunakan bot ini.")
+        return
+
+    name = normalize_name(context.args[0]) if context.args else None
+    if name is None:
+        await update.message.reply_text("⚠️ Format: /delbuttonset <nama>. Lihat semua set dengan /buttonsets")
+        return
+
+    if await button_sets.delete(user_id, name):
+        # Post yang sudah memakai set ini tetap membawa button-nya sampai dilepas
+        await update.message.reply_text(f"🗑 Set button '{name}' dihapus.")
+    else:
+        await update.message.reply_text(f"⚠️ Set button '{name}' tidak ditemukan.")
+
+def caption_summary(caption: str) -> str:
+    return caption.split("\n", 1)[0][:40]
+
+async def published_command(update: Update, context: CallbackContext) -> None:
+    """Handle /published [kata kunci]: post terbaru di channel yang caption atau button-nya cocok."""
+    if update.message.from_user.id not in AUTHORIZED_USERS:
+        await update.message.reply_text("⚠️ Anda tidak memiliki akses untuk menggunakan bot ini.")
+        return
+
+    search = " ".join(context.args)
+    matches = await post_index.search(search, limit=20)
+    if not matches:
+        await update.message.reply_text("📭 Tidak ada post terbit yang cocok.")
+        return
+
+    text = "📰 Post terbit terbaru" + (f" yang cocok dengan '{search}':" if search else ":")
+    for post in matches:
+        text += f"\n• {format_local(post.published_at, SCHEDULE_TZ)} {post.channel_id}/{post.message_id}: {caption_summary(post.caption)}"
+    await update.message.reply_text(text)
+
+async def replaceurl_command(update: Update, context: CallbackContext) -> None:
+    """Handle /replaceurl <url lama> <url baru>: ganti URL di button dan caption semua post yang memakainya."""
+    if len(context.args) != 2 or not context.args[1].startswith("http"):
+        await update.message.reply_text("⚠️ Format: /replaceurl <url lama> <url baru>\nURL baru harus dimulai dengan http")
+        return
+    old, new = context.args
+    await prepare_bulk(update, REPLACE_URL, old, new, search=old)
+
+async def replacetext_command(update: Update, context: CallbackContext) -> None:
+    """Handle /replacetext <teks lama> => <teks baru>: ganti teks di caption semua post yang cocok."""
+    old, separator, new = update.message.text.partition(" ")[2].partition("=>")
+    old, new = old.strip(), new.strip()
+    if not separator or not old:
+        await update.message.reply_text("⚠️ Format: /replacetext <teks lama> => <teks baru>")
+        return
+    await prepare_bulk(update, REPLACE_TEXT, old, new, search=old)
+
+async def deleteposts_command(update: Update, context: CallbackContext) -> None:
+    """Handle /deleteposts <kata kunci>: hapus dari channel semua post yang caption atau button-nya cocok."""
+    search = update.message.text.partition(" ")[2].strip()
+    if not search:
+        await update.message.reply_text("⚠️ Format: /deleteposts <kata kunci di caption atau URL>")
+        return
+    await prepare_bulk(update, DELETE, search, None, search=search)
+
+async def prepare_bulk(update: Update, kind: str, old: str, new, search: str) -> None:
+    """Cari post yang cocok lalu minta konfirmasi sebelum operasi massal dijalankan."""
+    user_id = update.message.from_user.id
+    if user_id not in AUTHORIZED_USERS:
+        await update.message.reply_text("⚠️ Anda tidak memiliki akses untuk menggunakan bot ini.")
+        return
+
+    matches = await post_index.search(search, limit=BULK_MAX_POSTS + 1)
+    if not matches:
+        await update.message.reply_text(f"📭 Tidak ada post terbit yang mengandung '{search}'.")
+        return
+
+    operation = BulkOperation(next(bulk_ids), kind, old, new, matches[:BULK_MAX_POSTS])
+    pending_bulk[user_id] = operation
+    count = len(operation.posts)
+    if kind == DELETE:
+        text = f"🗑 Hapus {count} post dari channel?"
+    elif kind == REPLACE_URL:
+        text = f"🔗 Ganti URL di {count} post?\n{old}\n→ {new}"
+    else:
+        text = f"✏️ Ganti teks caption di {count} post?\n'{old}' → '{new}'"
+    if len(matches) > BULK_MAX_POSTS:
+        text += f"\n\n⚠️ Hanya {BULK_MAX_POSTS} post terbaru yang diproses; jalankan lagi untuk sisanya."
+    for post in operation.posts[:5]:
+        text += f"\n• {format_local(post.published_at, SCHEDULE_TZ)}: {caption_summary(post.caption)}"
+    if count > 5:
+        text += f"\n• ... dan {count - 5} post lainnya"
+
+    markup = InlineKeyboardMarkup([[
+        InlineKeyboardButton("✅ Lanjutkan", callback_data=encode_callback(callbacks.BULK_CONFIRM, operation.id)),
+        InlineKeyboardButton("❌ Batal", callback_data=encode_callback(callbacks.BULK_CANCEL, operation.id)),
+    ]])
+    await update.message.reply_text(text, reply_markup=markup)
+
+async def bulk_confirm(update: Update, context: CallbackContext) -> None:
+    """Jalankan operasi massal yang sudah dikonfirmasi di background."""
+    query = update.callback_query
+    _, operation_id, _ = decode_callback(query.data)
+    operation = pending_bulk.get(query.from_user.id)
+    if operation is None or operation.id != operation_id:
+        await query.answer("⚠️ Operasi ini sudah kedaluwarsa. Jalankan perintahnya lagi.", show_alert=True)
+        return
+
+    del pending_bulk[query.from_user.id]
+    await query.answer()
+    await query.edit_message_text(f"⏳ Memproses {len(operation.posts)} post...")
+    task = asyncio.create_task(run_bulk_operation(publish_bot, query.message.chat_id, query.message.message_id, operation))
+    bulk_tasks.add(task)
+    task.add_done_callback(bulk_tasks.discard)
+
+async def bulk_cancel(update: Update, context: CallbackContext) -> None:
+    query = update.callback_query
+    _, operation_id, _ = decode_callback(query.data)
+    operation = pending_bulk.get(query.from_user.id)
+    if operation is not None and operation.id == operation_id:
+        del pending_bulk[query.from_user.id]
+    await query.answer()
+    await query.edit_message_text("❌ Operasi massal dibatalkan.")
+
+async def run_bulk_operation(bot, chat_id: int, message_id: int, operation: BulkOperation) -> None:
+    total = len(operation.posts)
+    last_update = time.monotonic()
+
+    async def report_progress(result):
+        nonlocal last_update
+        now = time.monotonic()
+        if now - last_update < PROGRESS_INTERVAL or result.processed >= total:
+            return
+        last_update = now
+        try:
+            await bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=f"⏳ Memproses post... {result.processed}/{total}")
+        except TelegramError as e:
+            logger.warning("Gagal memperbarui progres bulk: %s", e)
+
+    result = await run_bulk(bot, rate_limiter, operation, post_index, concurrency=BULK_CONCURRENCY, on_progress=report_progress)
+    verb = "dihapus" if operation.kind == DELETE else "diperbarui"
+    text = f"✅ {result.done} dari {total} post {verb}."
+    if result.skipped:
+        text += f"\nℹ️ {result.skipped} post tidak berubah."
+    if result.failed:
+        text += f"\n\n❌ {len(result.failed)} post gagal:"
+        for post, error in result.failed[:MAX_REPORTED_ERRORS]:
+            text += f"\n• {post.channel_id}/{post.message_id}: {error}"
+        if len(result.failed) > MAX_REPORTED_ERRORS:
+            text += f"\n• ... dan {len(result.failed) - MAX_REPORTED_ERRORS} post lainnya"
+    try:
+        await bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text)
+    except TelegramError as e:
+        logger.warning("Gagal melaporkan hasil bulk: %s", e)
 
 async def cancel(update: Update, context: CallbackContext) -> None:
     """Membatalkan postingan."""
@@ -396,80 +1065,59 @@ async def done(update: Update, context: CallbackContext) -> None:
             await send_message(update, "⚠️ Sesi telah berakhir. Silakan mulai dengan /start", context=context)
             return
 
-        post_data = posts[user_id]
-
-        # Cek batasan postingan untuk anti-spam
-        global last_reset_time
-        if time.time() - last_reset_time >= 60:
-            user_post_count.clear()
-            last_reset_time = time.time()
-
-        if user_id not in user_post_count:
-            user_post_count[user_id] = 0
-
-        if user_post_count[user_id] >= POST_LIMIT:
-            await send_message(update, "⚠️ Anda mencapai batas 50 postingan per menit.", context=context)
-            return
-
-        if not post_data.photos or not post_data.texts:
-            await send_message(update, "⚠️ Tidak ada postingan yang bisa dikirim!", context=context)
-            return
-
-        # Send all posts with their respective buttons
-        success_count = 0
-        for i, (photo, text, buttons) in enumerate(zip(post_data.photos, post_data.texts, post_data.buttons_per_post), 1):
-            # Setup reply markup for this specific post
-            reply_markup = None
-            if buttons:
-                reply_markup = InlineKeyboardMarkup([[button] for button in buttons])
-            try:
-                await context.bot.send_photo(
-                    chat_id=CHANNEL_ID,
-                    photo=photo,
-                    caption=text,
-                    reply_markup=reply_markup
-                )
-                success_count += 1
-                user_post_count[user_id] += 1
-                if i < len(post_data.photos):  # Don't sleep after last post
-                    await asyncio.sleep(0.5)  # Delay kecil antar pengiriman
-            except Exception as send_error:
-                await send_message(update, f"⚠️ Gagal mengirim post ke-{i}: {str(send_error)}", context=context)
-                continue
-
-        if success_count > 0:
-            total_posts = len(post_data.photos)
-            if success_count == total_posts:
-                await send_message(update, "✅ Semua postingan berhasil dikirim ke channel!", context=context)
-            else:
-                await send_message(update, 
-                    f"⚠️ Berhasil mengirim {success_count} dari {total_posts} postingan ke channel.",
-                    context=context
-                )
-            del posts[user_id]
-        else:
-            await send_message(update, "❌ Gagal mengirim semua postingan!", context=context)
+        await enqueue_publish(update, context, user_id)
     else:
         await done_command(update, context)
 
 async def delete_link(update: Update, context: CallbackContext) -> None:
     """Menghapus tombol terakhir yang ditambahkan."""
     query = update.callback_query
-    await query.answer()
-    
+
     user_id = query.from_user.id
     if user_id not in posts:
+        await query.answer()
         await send_message(update, "⚠️ Sesi telah berakhir. Silakan mulai dengan /start", context=context)
         return
 
     post_data = posts[user_id]
-    current_buttons = post_data.buttons_per_post[post_data.current_index]
+    current_buttons = post_data.current.buttons
     if current_buttons:
+        await query.answer()
         removed_button = current_buttons.pop()
-        await send_message(update, f"✅ Tombol '{removed_button.text}' dihapus dari post {post_data.current_index + 1}!", context=context)
-        await send_preview(update, context, user_id)
+        post_data.revision += 1
+        await send_preview(
+            update, context, user_id,
+            notice=f"✅ Tombol '{removed_button.text}' dihapus dari post {post_data.current_index + 1}!"
+        )
+    elif post_data.current.button_set:
+        # Tombol milik set tidak dihapus satu per satu; set dilepas dari post ini saja
+        await query.answer()
+        removed_set = post_data.current.button_set
+        post_data.current.button_set = None
+        post_data.revision += 1
+        await send_preview(
+            update, context, user_id,
+            notice=f"✅ Set button '{removed_set.name}' dilepas dari post {post_data.current_index + 1}!"
+        )
     else:
-        await send_message(update, "⚠️ Tidak ada tombol yang bisa dihapus untuk post ini!", context=context)
+        await query.answer("⚠️ Tidak ada tombol yang bisa dihapus untuk post ini!", show_alert=True)
+
+async def receive_image_url(update: Update, context: CallbackContext, user_id: int, url: str, caption: str) -> None:
+    """Menambahkan post dari URL gambar: gambar diunduh lalu di-upload sekali (atau diambil dari cache)."""
+    if not caption:
+        await update.message.reply_text("⚠️ Mohon sertakan caption di baris setelah URL gambar!")
+        return
+    try:
+        image = await image_intake.prepare(await image_intake.fetch(url))
+        await image_intake.upload(context.bot, update.message.chat_id, [image], caption="🖼️ Gambar diunggah")
+    except (ImageError, TelegramError) as e:
+        await update.message.reply_text(f"❌ Gagal memproses gambar: {e}")
+        return
+
+    post_data = posts[user_id]
+    post_data.entries.append(Post(image.file_id, caption))
+    post_data.revision += 1
+    await acknowledge_media(update, context, user_id, f"✅ Gambar ke-{len(post_data.entries)} diterima!")
 
 async def receive_link(update: Update, context: CallbackContext) -> None:
     """Menerima link dari pengguna dan menambahkannya ke postingan."""
@@ -479,15 +1127,22 @@ async def receive_link(update: Update, context: CallbackContext) -> None:
         return
 
     post_data = posts[user_id]
+    if post_data.state == POST_STATES['WAITING_FOR_SCHEDULE']:
+        await receive_schedule_time(update, context, user_id, update.message.text)
+        return
     if post_data.state != POST_STATES['WAITING_FOR_LINK']:
+        # Di luar mode tambah button, URL di baris pertama berarti gambar (caption di baris berikutnya)
+        url, _, caption = update.message.text.strip().partition("\n")
+        if url.startswith(("http://", "https://")) and " " not in url:
+            await receive_image_url(update, context, user_id, url, caption.strip())
         return
 
     text = update.message.text
     if text.lower() == '/done':
         post_data.state = POST_STATES['EDITING']
         await update.message.reply_text("✅ Selesai menambahkan button!")
-        await send_preview(update, context, user_id)
-        if post_data.is_multiple and post_data.current_index < len(post_data.photos) - 1:
+        await send_preview(update, context, user_id, force_new=True)
+        if post_data.is_multiple and not post_data.is_last:
             await update.message.reply_text(
                 "📝 Klik 'Next ➡️' untuk melanjutkan ke post berikutnya, atau tambahkan button lagi jika diperlukan."
             )
@@ -505,66 +1160,45 @@ async def receive_link(update: Update, context: CallbackContext) -> None:
         )
         return
 
-    lines = text.split("\n")
-    added_buttons = 0
-    invalid_buttons = []
-
-    for line in lines:
-        if not line.strip():  # Skip empty lines
-            continue
-            
-        button_data = line.split("-", 1)
-        if len(button_data) == 2:
-            button_name = button_data[0].strip()
-            button_url = button_data[1].strip()
-
-            if not button_name:
-                invalid_buttons.append(f"❌ Nama button tidak boleh kosong: {line}")
-                continue
-
-            if not button_url.startswith("http"):
-                invalid_buttons.append(f"❌ URL harus dimulai dengan http: {button_url}")
-                continue
-
-            # Add button to current post
-            post_data.buttons_per_post[post_data.current_index].append(
-                InlineKeyboardButton(button_name, url=button_url)
-            )
-            added_buttons += 1
+    buttons, invalid_buttons = parse_button_lines(text)
+    # Add buttons to current post
+    post_data.current.buttons.extend(buttons)
+    added_buttons = len(buttons)
 
     # Beri feedback
     if added_buttons > 0:
+        post_data.revision += 1
         # Tampilkan info button yang berhasil ditambahkan
         success_msg = f"✅ Berhasil menambahkan {added_buttons} button ke Post {post_data.current_index + 1}"
         if post_data.is_multiple:
-            success_msg += f"/{len(post_data.photos)}"
+            success_msg += f"/{len(post_data.entries)}"
         
         # Tampilkan semua button yang ada di post ini
-        current_buttons = post_data.buttons_per_post[post_data.current_index]
+        current_buttons = post_data.current.all_buttons
         success_msg += "\n\n🔘 Button pada post ini:"
         for i, btn in enumerate(current_buttons, 1):
             success_msg += f"\n{i}. {btn.text} - {btn.url}"
             
         # Buat keyboard untuk navigasi
         keyboard = [
-            [InlineKeyboardButton("🔍 Preview Post", callback_data="back_to_preview")]
+            [InlineKeyboardButton("🔍 Preview Post", callback_data=post_callback(post_data, callbacks.BACK_TO_PREVIEW))]
         ]
         
         # Tambahkan opsi Next jika multiple post dan bukan post terakhir
-        if post_data.is_multiple and post_data.current_index < len(post_data.photos) - 1:
-            keyboard.append([InlineKeyboardButton("➡️ Next Post", callback_data="next_preview")])
+        if post_data.is_multiple and not post_data.is_last:
+            keyboard.append([InlineKeyboardButton("➡️ Next Post", callback_data=post_callback(post_data, callbacks.NEXT_PREVIEW))])
             
         # Selalu tampilkan opsi Add Button
-        keyboard.append([InlineKeyboardButton("➕ Add Button", callback_data="add_link")])
+        keyboard.append([InlineKeyboardButton("➕ Add Button", callback_data=post_callback(post_data, callbacks.ADD_LINK))])
         
         markup = InlineKeyboardMarkup(keyboard)
         
         # Pesan navigasi yang lebih jelas
         success_msg += "\n\n📝 Langkah selanjutnya:"
         success_msg += "\n1. Preview Post - Lihat hasil dengan button"
-        if post_data.is_multiple and post_data.current_index < len(post_data.photos) - 1:
+        if post_data.is_multiple and not post_data.is_last:
             success_msg += "\n2. Next Post - Lanjut ke post berikutnya"
-        success_msg += f"\n{'3' if post_data.is_multiple and post_data.current_index < len(post_data.photos) - 1 else '2'}. Add Button - Tambah button lagi untuk post ini"
+        success_msg += f"\n{'3' if post_data.is_multiple and not post_data.is_last else '2'}. Add Button - Tambah button lagi untuk post ini"
         
         await update.message.reply_text(success_msg, reply_markup=markup)
 
@@ -582,25 +1216,63 @@ async def back_to_preview(update: Update, context: CallbackContext) -> None:
     if user_id not in posts:
         await send_message(update, "⚠️ Sesi telah berakhir. Silakan mulai dengan /start", context=context)
         return
-        
-    post_data = posts[user_id]
-    # Reset state ke EDITING untuk menampilkan preview
-    post_data.state = POST_STATES['EDITING']
-    
-    # Tampilkan ringkasan button yang sudah ditambahkan
-    current_buttons = post_data.buttons_per_post[post_data.current_index]
-    if current_buttons:
-        summary = f"🔘 Button yang sudah ditambahkan untuk Post {post_data.current_index + 1}:"
-        for i, btn in enumerate(current_buttons, 1):
-            summary += f"\n{i}. {btn.text}"
-        await send_message(update, summary, context=context)
-    
+
     await send_preview(update, context, user_id)
 
+def post_callback(post_data: PostData, action: str) -> str:
+    """callback_data untuk tombol yang bekerja pada draft (membawa index dan revisi saat ini)."""
+    return encode_callback(action, post_data.current_index, post_data.revision)
+
+# Satu tabel aksi → handler; aksi yang tidak butuh draft ditandai False
+CALLBACK_ACTIONS = {
+    action: (instrument_handler(handler), needs_draft)
+    for action, (handler, needs_draft) in {
+        callbacks.CREATE_SINGLE: (partial(create_post, is_multiple=False), False),
+        callbacks.CREATE_MULTIPLE: (partial(create_post, is_multiple=True), False),
+        callbacks.BACK_TO_PREVIEW: (back_to_preview, True),
+        callbacks.NEXT_PREVIEW: (partial(navigate_preview, step=1), True),
+        callbacks.PREV_PREVIEW: (partial(navigate_preview, step=-1), True),
+        callbacks.ADD_LINK: (add_link, True),
+        callbacks.DELETE_LINK: (delete_link, True),
+        callbacks.DONE: (done, True),
+        callbacks.SCHEDULE: (schedule, True),
+        callbacks.REPUBLISH: (republish, False),
+        callbacks.BULK_CONFIRM: (bulk_confirm, False),
+        callbacks.BULK_CANCEL: (bulk_cancel, False),
+        callbacks.CANCEL: (cancel, True),
+    }.items()
+}
+
+async def dispatch_callback(update: Update, context: CallbackContext) -> None:
+    """Satu pintu untuk semua callback query: decode, cek revisi draft, lalu panggil handler."""
+    query = update.callback_query
+    parsed = decode_callback(query.data)
+    entry = CALLBACK_ACTIONS.get(parsed[0]) if parsed else None
+    if entry is None:
+        await query.answer("⚠️ Tombol ini sudah tidak berlaku. Silakan mulai dengan /start", show_alert=True)
+        return
+
+    action, index, revision = parsed
+    handler, needs_draft = entry
+    if needs_draft:
+        post_data = posts.get(query.from_user.id)
+        if post_data is not None:
+            if revision != post_data.revision or (post_data.entries and index >= len(post_data.entries)):
+                await query.answer("⚠️ Tombol ini dari preview lama. Gunakan preview terbaru.", show_alert=True)
+                return
+            post_data.current_index = index
+
+    await handler(update, context)
+
 # Handler error agar bot tidak crash
 async def error_handler(update: object, context: CallbackContext) -> None:
     """Menangani error agar bot tidak crash."""
-    print(f"Error terjadi: {context.error}")
+    extra = {}
+    if isinstance(update, Update):
+        extra["update_id"] = update.update_id
+        if update.effective_user:
+            extra["user_id"] = update.effective_user.id
+    logger.error("Error terjadi: %s", context.error, exc_info=context.error, extra=extra)
     if update and isinstance(update, Update) and update.message:
         await update.message.reply_text("⚠️ Terjadi kesalahan, coba lagi nanti.")
 
@@ -615,46 +1287,386 @@ async def send_message(update: Update, text: str, reply_markup=None, context=Non
             chat_id = update.message.chat_id
         
         if not chat_id:
-            print("Warning: No valid chat_id found in send_message")
+            logger.warning("Tidak ada chat_id yang valid di send_message")
             return
             
         # If we have context, use context.bot.send_message (most reliable)
         if context:
-            await context.bot.send_message(
+            return await context.bot.send_message(
                 chat_id=chat_id,
                 text=text,
                 reply_markup=reply_markup
             )
         # For messages without context, use reply_text (safe)
         elif hasattr(update, 'message') and update.message and not hasattr(update, 'callback_query'):
-            await update.message.reply_text(text, reply_markup=reply_markup)
+            return await update.message.reply_text(text, reply_markup=reply_markup)
         # For callback queries without context, use callback_query.message.reply_text
         elif hasattr(update, 'callback_query') and update.callback_query and update.callback_query.message:
-            await update.callback_query.message.reply_text(text, reply_markup=reply_markup)
+            return await update.callback_query.message.reply_text(text, reply_markup=reply_markup)
         else:
-            print("Error: Cannot send message - no valid method found")
+            logger.error("Tidak bisa mengirim pesan: tidak ada cara kirim yang cocok")
                 
     except Exception as e:
-        print(f"Error sending message: {e}")
-
-# Setup bot
-app = Application.builder().token(TOKEN).build()
-app.add_handler(CommandHandler("start", start))
-app.add_handler(CallbackQueryHandler(create_post, pattern="^create_post_"))
-# Urutkan handler berdasarkan prioritas
-app.add_handler(CallbackQueryHandler(back_to_preview, pattern="^back_to_preview$"))
-app.add_handler(CallbackQueryHandler(navigate_preview, pattern="^next_preview$"))
-app.add_handler(CallbackQueryHandler(navigate_preview, pattern="^prev_preview$"))
-app.add_handler(CallbackQueryHandler(add_link, pattern="^add_link$"))
-app.add_handler(CallbackQueryHandler(delete_link, pattern="^delete_link$"))
-app.add_handler(CallbackQueryHandler(done, pattern="^done$"))
-app.add_handler(CallbackQueryHandler(cancel, pattern="^cancel$"))
-app.add_handler(CommandHandler("cancel", cancel_command))
-app.add_handler(CommandHandler("done", done_command))
-app.add_handler(MessageHandler(filters.PHOTO & filters.CAPTION, receive_media))
-app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, receive_link))
-app.add_error_handler(error_handler)
-
-# Run bot
-print("🤖 Bot AUPA berjalan...")
-app.run_polling()
+        logger.exception("Gagal mengirim pesan: %s", e)
+
+async def load_draft(update: Update, context: CallbackContext) -> None:
+    """Muat draft tersimpan saat update pertama user setelah restart (atau setelah digusur LRU)."""
+    user = update.effective_user
+    if user and user.id not in posts:
+        post_data = await drafts.load(user.id)
+        if post_data is not None:
+            posts[user.id] = post_data
+
+async def persist_draft(update: Update, context: CallbackContext) -> None:
+    """Tandai draft user untuk ditulis ke disk setelah semua handler selesai."""
+    user = update.effective_user
+    if user:
+        drafts.mark_dirty(user.id, posts.get(user.id))
+
+def evicted_draft_kept(reason: str) -> bool:
+    # Draft yang digusur karena kapasitas masih ada di disk dan akan dimuat lagi saat user kembali
+    return reason == SessionStore.EVICT_CAPACITY and drafts.durable
+
+def discard_evicted_draft(user_id: int, post_data: PostData, reason: str) -> None:
+    """Hapus juga draft tersimpan, saat itu juga: load_draft di update yang sama tidak boleh memuatnya lagi."""
+    if not evicted_draft_kept(reason):
+        drafts.mark_dirty(user_id, None)
+
+async def notify_session_evicted(bot, user_id: int, post_data: PostData, reason: str) -> None:
+    """Beri tahu user bahwa draft-nya dibuang dari memori."""
+    if evicted_draft_kept(reason):
+        return
+    chat_id = post_data.preview.chat_id if post_data.preview else user_id
+    if reason == SessionStore.EVICT_IDLE:
+        text = f"⌛ Draft postingan Anda ({len(post_data.entries)} post) dihapus karena tidak aktif terlalu lama."
+    else:
+        text = f"⚠️ Draft postingan Anda ({len(post_data.entries)} post) dihapus karena kapasitas bot penuh."
+    try:
+        await bot.send_message(chat_id=chat_id, text=text + "\nSilakan mulai lagi dengan /start")
+    except TelegramError as e:
+        logger.warning("Gagal memberi tahu draft yang digusur: %s", e, extra={"user_id": user_id})
+
+async def stats_command(update: Update, context: CallbackContext) -> None:
+    """Menampilkan pemakaian memori draft dan antrian publish (khusus admin)."""
+    if update.message.from_user.id not in AUTHORIZED_USERS:
+        await update.message.reply_text("⚠️ Anda tidak memiliki akses untuk menggunakan bot ini.")
+        return
+
+    stats = posts.stats()
+    await update.message.reply_text(
+        "📊 Statistik bot\n\n"
+        f"Draft aktif: {stats['sessions']}/{stats['max_sessions']}\n"
+        f"Total post di draft: {stats['posts']}\n"
+        f"Perkiraan memori draft: {stats['approx_bytes'] / 1024:.1f} KiB\n"
+        f"Draft paling lama idle: {stats['oldest_idle_seconds']} detik\n"
+        f"Draft dibuang (TTL/LRU): {stats['evicted']}\n"
+        f"Antrian publish: {publish_queue.depth} job\n"
+        f"Postingan terjadwal: {scheduler.pending}"
+    )
+
+async def profile_command(update: Update, context: CallbackContext) -> None:
+    """/profile [detik] atau /profile <jumlah> update: profiling sampling, hasilnya dikirim sebagai dokumen (khusus admin)."""
+    if update.message.from_user.id not in AUTHORIZED_USERS:
+        await update.message.reply_text("⚠️ Anda tidak memiliki akses untuk menggunakan bot ini.")
+        return
+
+    args = context.args or []
+    try:
+        amount = int(args[0]) if args else 30
+    except ValueError:
+        amount = 0
+    by_updates = len(args) > 1 and args[1].lower().startswith("update")
+    if amount <= 0 or (not by_updates and amount > MAX_DURATION):
+        await update.message.reply_text(
+            f"⚠️ Format: /profile [detik] (maks. {MAX_DURATION}) atau /profile <jumlah> update"
+        )
+        return
+    if profiler.running:
+        await update.message.reply_text("⚠️ Profiling sedang berjalan, tunggu sampai selesai.")
+        return
+
+    target = f"{amount} update (maks. {MAX_DURATION} detik)" if by_updates else f"{amount} detik"
+    await update.message.reply_text(f"🔬 Profiling selama {target}...")
+    task = asyncio.create_task(run_profile(
+        context.bot, update.effective_chat.id, seconds=None if by_updates else amount, updates=amount if by_updates else None
+    ))
+    profile_tasks.add(task)
+    task.add_done_callback(profile_tasks.discard)
+
+async def run_profile(bot, chat_id: int, seconds=None, updates=None) -> None:
+    # Di task terpisah supaya handler tidak memegang lock user selama profiling
+    result = await profiler.run(seconds=seconds, updates=updates)
+    try:
+        await bot.send_document(
+            chat_id=chat_id,
+            document=result.render().encode(),
+            filename=profile_filename(),
+            caption=f"🔬 Profil {result.duration:.0f} detik, {result.updates} update"
+        )
+    except TelegramError as e:
+        logger.warning("Gagal mengirim hasil profil: %s", e)
+
+async def import_command(update: Update, context: CallbackContext) -> None:
+    """Meminta file import; postingan hasil import ditambahkan ke draft aktif (atau draft baru)."""
+    user_id = update.message.from_user.id
+    if user_id not in AUTHORIZED_USERS:
+        await update.message.reply_text("⚠️ Anda tidak memiliki akses untuk menggunakan bot ini.")
+        return
+
+    if user_id not in posts:
+        posts[user_id] = PostData(is_multiple=True)
+    posts[user_id].state = POST_STATES['WAITING_FOR_IMPORT']
+    await update.message.reply_text(
+        "📥 Kirim file JSON Lines (.jsonl) atau CSV (.csv) sebagai dokumen.\n\n"
+        "Kolom setiap baris:\n"
+        "• photo - file_id Telegram atau URL gambar\n"
+        "• caption - teks postingan\n"
+        "• buttons - satu button per baris: Nama Button - URL\n\n"
+        "Contoh JSON Lines:\n"
+        '{"photo": "https://example.com/a.jpg", "caption": "Judul", "buttons": "🎵 Spotify - https://spotify.com/..."}\n\n'
+        f"Maksimal {IMPORT_MAX_ROWS} baris. Ketik /cancel untuk membatalkan."
+    )
+
+async def receive_import(update: Update, context: CallbackContext) -> None:
+    """Menerima file import lalu menambahkan semua baris yang valid ke draft sekaligus."""
+    message = update.message
+    user_id = message.from_user.id
+    post_data = posts.get(user_id)
+    # Dokumen juga bisa langsung dikirim dengan caption /import
+    with_command = (message.caption or "").split()[:1] == ["/import"]
+    if not with_command and (post_data is None or post_data.state != POST_STATES['WAITING_FOR_IMPORT']):
+        return
+    if user_id not in AUTHORIZED_USERS:
+        await message.reply_text("⚠️ Anda tidak memiliki akses untuk menggunakan bot ini.")
+        return
+
+    document = message.document
+    if document.file_size and document.file_size > IMPORT_MAX_BYTES:
+        await message.reply_text(f"⚠️ File terlalu besar (maks. {IMPORT_MAX_BYTES >> 20} MB).")
+        return
+
+    await message.reply_text("⏳ Mengimpor postingan...")
+    try:
+        with tempfile.TemporaryFile() as buffer:
+            telegram_file = await document.get_file()
+            await telegram_file.download_to_memory(out=buffer)
+            buffer.seek(0)
+            # Parsing dan validasi baris di thread, supaya file besar tidak menahan event loop
+            result = await asyncio.get_running_loop().run_in_executor(
+                None, partial(import_posts, buffer, document.file_name, max_rows=IMPORT_MAX_ROWS)
+            )
+    except TelegramError as e:
+        await message.reply_text(f"❌ Gagal mengunduh file: {e}")
+        return
+
+    if user_id not in posts:
+        posts[user_id] = PostData(is_multiple=True)
+    post_data = posts[user_id]
+    post_data.state = POST_STATES['EDITING']
+    if result.posts:
+        post_data.entries.extend(result.posts)
+        post_data.is_multiple = post_data.is_multiple or len(post_data.entries) > 1
+        post_data.revision += 1
+
+    text = f"✅ {len(result.posts)} dari {result.rows} baris berhasil diimpor."
+    if result.truncated:
+        text += f"\n⚠️ Baris setelah ke-{IMPORT_MAX_ROWS} diabaikan."
+    if result.errors:
+        text += f"\n\n❌ {len(result.errors)} baris dilewati:"
+        for number, error in result.errors[:MAX_REPORTED_ERRORS]:
+            text += f"\n• Baris {number}: {error}"
+        if len(result.errors) > MAX_REPORTED_ERRORS:
+            text += f"\n• ... dan {len(result.errors) - MAX_REPORTED_ERRORS} baris lainnya"
+    await message.reply_text(text)
+
+    if post_data.entries:
+        await send_preview(update, context, user_id, force_new=True)
+
+async def post_init(app: Application) -> None:
+    if METRICS_PORT:
+        await metrics_server.start(METRICS_LISTEN, METRICS_PORT)
+    await publish_bot.initialize()
+    await publish_queue.start(publish_bot)
+    await drafts.start()
+    await button_sets.start()
+    await image_intake.start()
+    await post_index.start()
+    posts.start(on_evict=partial(notify_session_evicted, app.bot), on_discard=discard_evicted_draft)
+    await scheduler.start(on_due=partial(publish_scheduled, publish_bot))
+    if recorder:
+        recorder.start()
+        update_processor.on_receive = recorder.record
+
+async def post_stop(app: Application) -> None:
+    # Bot masih aktif di sini, jadi album dan job yang tersisa sempat dikirim
+    await media_groups.stop()
+    await scheduler.stop()
+    await publish_queue.stop()
+    for task in list(bulk_tasks):
+        # Indeks sudah diperbarui per post, jadi operasi yang terputus cukup dijalankan ulang
+        task.cancel()
+    await asyncio.gather(*bulk_tasks, return_exceptions=True)
+    for task in list(profile_tasks):
+        task.cancel()
+    await asyncio.gather(*profile_tasks, return_exceptions=True)
+    await post_index.stop()
+    await publish_bot.shutdown()
+    await posts.stop()
+    await drafts.stop()
+    await button_sets.stop()
+    await image_intake.stop()
+    if recorder:
+        update_processor.on_receive = None
+        await recorder.stop()
+    await metrics_server.stop()
+
+def http_request(pool, size, **timeouts):
+    """InstrumentedRequest untuk satu pool, dengan konfigurasi HTTP_* sebagai default."""
+    options = dict(
+        connect_timeout=HTTP_CONNECT_TIMEOUT,
+        read_timeout=HTTP_READ_TIMEOUT,
+        write_timeout=HTTP_WRITE_TIMEOUT,
+        pool_timeout=HTTP_POOL_TIMEOUT,
+    )
+    options.update(timeouts)
+    return InstrumentedRequest(
+        pool, connection_pool_size=size, keepalive_expiry=HTTP_KEEPALIVE, http_version=HTTP_VERSION, **options
+    )
+
+def build_application(token=TOKEN, base_url=None, base_file_url=None):
+    """Membuat Application dan mendaftarkan semua handler."""
+    global publish_bot, update_processor
+    update_processor = PerUserUpdateProcessor(
+        MAX_CONCURRENT_UPDATES,
+        dedup_size=UPDATE_DEDUP_SIZE,
+        tap_window=CALLBACK_TAP_WINDOW,
+        callback_max_age=CALLBACK_MAX_AGE,
+        max_pending=MAX_PENDING_UPDATES,
+        max_user_pending=MAX_PENDING_PER_USER
+    )
+    builder = (
+        Application.builder()
+        .token(token)
+        .request(http_request("interactive", HTTP_POOL_SIZE))
+        .get_updates_request(http_request("updates", 1))
+        .concurrent_updates(update_processor)
+        .post_init(post_init)
+        .post_stop(post_stop)
+    )
+    urls = {}
+    if base_url:
+        builder = builder.base_url(base_url)
+        urls["base_url"] = base_url
+    if base_file_url:
+        builder = builder.base_file_url(base_file_url)
+        urls["base_file_url"] = base_file_url
+    app = builder.build()
+    # Bot terpisah (pool koneksi sendiri) untuk publish terjadwal / antrian dan operasi massal ke channel
+    publish_bot = Bot(
+        token,
+        request=http_request(
+            "publish", PUBLISH_POOL_SIZE, write_timeout=PUBLISH_WRITE_TIMEOUT, pool_timeout=PUBLISH_POOL_TIMEOUT
+        ),
+        **urls
+    )
+
+    # Group -1 dan 1 membungkus handler utama: muat draft sebelum, simpan sesudah
+    app.add_handler(TypeHandler(Update, load_draft), group=-1)
+    app.add_handler(TypeHandler(Update, persist_draft), group=1)
+    app.add_handler(CommandHandler("start", start))
+    app.add_handler(CallbackQueryHandler(dispatch_callback))
+    app.add_handler(CommandHandler("cancel", cancel_command))
+    app.add_handler(CommandHandler("done", done_command))
+    app.add_handler(CommandHandler("stats", stats_command))
+    app.add_handler(CommandHandler("profile", profile_command))
+    app.add_handler(CommandHandler("import", import_command))
+    app.add_handler(CommandHandler("schedule", schedule_command))
+    app.add_handler(CommandHandler("scheduled", scheduled_command))
+    app.add_handler(CommandHandler("unschedule", unschedule_command))
+    app.add_handler(CommandHandler("buttonset", buttonset_command))
+    app.add_handler(CommandHandler("buttonsets", buttonsets_command))
+    app.add_handler(CommandHandler("usebuttons", usebuttons_command))
+    app.add_handler(CommandHandler("delbuttonset", delbuttonset_command))
+    app.add_handler(CommandHandler("published", published_command))
+    app.add_handler(CommandHandler("replaceurl", replaceurl_command))
+    app.add_handler(CommandHandler("replacetext", replacetext_command))
+    app.add_handler(CommandHandler("deleteposts", deleteposts_command))
+    # Tanpa filter CAPTION: bagian album biasanya tidak punya caption sendiri
+    app.add_handler(MessageHandler(filters.PHOTO | filters.Document.IMAGE, receive_media))
+    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, receive_link))
+    app.add_handler(MessageHandler(filters.Document.ALL, receive_import))
+    app.add_error_handler(error_handler)
+
+    # Catat jumlah panggilan dan latency setiap handler. dispatch_callback tidak ikut dibungkus: aksi di
+    # CALLBACK_ACTIONS sudah dicatat sendiri, jadi satu tap tidak terhitung dua kali
+    for handlers in app.handlers.values():
+        for handler in handlers:
+            if handler.callback is not dispatch_callback:
+                handler.callback = instrument_handler(handler.callback)
+    return app
+
+def main():
+    listener = setup_logging(LOG_LEVEL, LOG_SAMPLE, LOG_FILE or None, LOG_QUEUE_SIZE)
+    try:
+        run()
+    finally:
+        # Tulis sisa record di antrian sebelum proses keluar
+        listener.stop()
+
+def run():
+    # Publish selalu butuh channel tujuan (channel pertama yang meng-upload); gagal di awal, bukan saat /done
+    if not CHANNEL_IDS:
+        raise SystemExit("CHANNEL_ID atau CHANNEL_IDS wajib diisi")
+    if BOT_MODE == "cluster":
+        if not WEBHOOK_URL:
+            raise SystemExit("WEBHOOK_URL wajib diisi untuk BOT_MODE=cluster")
+        # Front tidak menjalankan handler; Application hanya dibangun di worker
+        asyncio.run(serve_cluster(
+            TOKEN,
+            worker_command(__file__),
+            workers=WORKERS,
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            url_path=WEBHOOK_PATH,
+            webhook_url=WEBHOOK_URL,
+            secret_token=WEBHOOK_SECRET,
+            worker_base_port=WORKER_BASE_PORT,
+            metrics_server=(metrics_server, METRICS_LISTEN, METRICS_PORT) if METRICS_PORT else None,
+        ))
+        return
+
+    app = build_application()
+    if BOT_MODE == "worker":
+        logger.info("🤖 Worker %d/%d berjalan...", WORKER_INDEX + 1, WORKER_COUNT)
+        # Hanya menerima update dari front (127.0.0.1); /metrics worker ada di listener yang sama
+        server = HTTPServer()
+        add_metrics_route(server)
+        asyncio.run(serve_webhook(
+            app,
+            listen="127.0.0.1",
+            port=WORKER_PORT,
+            url_path=WEBHOOK_PATH,
+            webhook_url=None,
+            secret_token=CLUSTER_SECRET,
+            server=server,
+        ))
+        return
+
+    logger.info("🤖 Bot AUPA berjalan...")
+    if BOT_MODE == "webhook":
+        if not WEBHOOK_URL:
+            raise SystemExit("WEBHOOK_URL wajib diisi untuk BOT_MODE=webhook")
+        asyncio.run(serve_webhook(
+            app,
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            url_path=WEBHOOK_PATH,
+            webhook_url=WEBHOOK_URL,
+            secret_token=WEBHOOK_SECRET,
+        ))
+    else:
+        # Fallback polling untuk development lokal
+        app.run_polling()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Kumpulkan bagian album (media_group_id yang sama) lalu proses sekaligus setelah jeda singkat."""
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Batas Telegram untuk satu album
+MAX_GROUP_SIZE = 10
+
+
+class _PendingGroup:
+    __slots__ = ("messages", "update", "context", "deadline", "ready", "task")
+
+    def __init__(self, update, context, deadline):
+        self.messages = []
+        self.update = update  # update terakhir, dipakai untuk membalas
+        self.context = context
+        self.deadline = deadline
+        self.ready = asyncio.Event()  # di-set jika album harus diproses sekarang juga
+        self.task = None
+
+
+class MediaGroupCollector:
+    """Debounce per album: setiap bagian baru memperpanjang tunggu `delay` detik.
+
+    Setelah tidak ada bagian baru (atau album sudah MAX_GROUP_SIZE), `on_complete(update, context,
+    messages)` dipanggil satu kali dengan semua pesan album, urut sesuai message_id.
+    """
+
+    def __init__(self, on_complete, delay=1.0):
+        self.on_complete = on_complete
+        self.delay = delay
+        self._groups = {}  # (chat_id, media_group_id) -> _PendingGroup
+
+    @property
+    def pending(self):
+        return len(self._groups)
+
+    def add(self, update, context):
+        message = update.effective_message
+        key = (message.chat_id, message.media_group_id)
+        group = self._groups.get(key)
+        deadline = time.monotonic() + self.delay
+        if group is None:
+            group = self._groups[key] = _PendingGroup(update, context, deadline)
+            group.task = asyncio.create_task(self._wait(key, group))
+        group.messages.append(message)
+        group.update = update
+        group.deadline = deadline
+        if len(group.messages) >= MAX_GROUP_SIZE:
+            # Album sudah lengkap, tidak perlu menunggu bagian lain
+            group.ready.set()
+
+    async def stop(self):
+        """Proses semua album yang masih menunggu, tanpa menunggu jedanya habis."""
+        groups = list(self._groups.values())
+        for group in groups:
+            group.ready.set()
+        await asyncio.gather(*(group.task for group in groups), return_exceptions=True)
+
+    async def _wait(self, key, group):
+        while not group.ready.is_set():
+            remaining = group.deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                await asyncio.wait_for(group.ready.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+        del self._groups[key]
+        messages = sorted(group.messages, key=lambda message: message.message_id)
+        try:
+            await self.on_complete(group.update, group.context, messages)
+        except Exception as e:
+            logger.exception("Error processing media group %s: %s", key[1], e)
@@ -0,0 +1,240 @@
+"""Metrik ringan dalam format Prometheus (counter, histogram, gauge) tanpa dependency tambahan."""
+import logging
+import time
+import weakref
+from bisect import bisect_left
+from functools import wraps
+
+import httpx
+from telegram.error import TimedOut
+from telegram.request import HTTPXRequest
+
+import logs
+
+# Bucket latency dalam detik: dari 1ms (handler lokal) sampai 10s (upload / RetryAfter)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names, values, extra=""):
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name, doc, labelnames=()):
+        self.name = name
+        self.doc = doc
+        self.labelnames = labelnames
+        self._values = {}
+
+    def inc(self, *labels, amount=1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.doc}"
+        yield f"# TYPE {self.name} counter"
+        for labels, value in self._values.items():
+            yield f"{self.name}{_labels(self.labelnames, labels)} {value}"
+
+
+class Histogram:
+    def __init__(self, name, doc, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.doc = doc
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [count per bucket..., +Inf count, sum]
+
+    def observe(self, value, *labels):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 2)
+        # Simpan per bucket (bukan kumulatif) supaya observe cukup satu increment
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def series(self):
+        """(labels, jumlah observasi, total nilai) untuk setiap kombinasi label."""
+        return [(labels, sum(series[:-1]), series[-1]) for labels, series in self._series.items()]
+
+    def quantile(self, q, *labels):
+        """Perkiraan kuantil: batas atas bucket tempat kuantil ke-q jatuh."""
+        series = self._series.get(labels)
+        if not series:
+            return 0.0
+        target = q * sum(series[:-1])
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), series):
+            cumulative += count
+            if cumulative >= target:
+                return bound
+        return float("inf")
+
+    def render(self):
+        yield f"# HELP {self.name} {self.doc}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, series in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                cumulative += count
+                le = 'le="%s"' % bound
+                yield f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {series[-1]}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}"
+
+
+class Gauge:
+    """Gauge yang nilainya dibaca lewat callback saat scrape (tanpa biaya di hot path).
+
+    Dengan `labelnames`, `read()` mengembalikan dict tuple label → nilai.
+    """
+
+    def __init__(self, name, doc, read, labelnames=()):
+        self.name = name
+        self.doc = doc
+        self.read = read
+        self.labelnames = labelnames
+
+    def render(self):
+        yield f"# HELP {self.name} {self.doc}"
+        yield f"# TYPE {self.name} gauge"
+        if not self.labelnames:
+            yield f"{self.name} {self.read()}"
+            return
+        for labels, value in self.read().items():
+            yield f"{self.name}{_labels(self.labelnames, labels)} {value}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+handler_requests = registry.register(Counter(
+    "bot_handler_calls_total", "Jumlah pemanggilan handler", ("handler", "outcome")))
+handler_latency = registry.register(Histogram(
+    "bot_handler_duration_seconds", "Durasi handler", ("handler",)))
+api_requests = registry.register(Counter(
+    "bot_api_requests_total", "Jumlah request Bot API per method dan status HTTP", ("method", "status")))
+api_latency = registry.register(Histogram(
+    "bot_api_request_duration_seconds", "Durasi request Bot API", ("method",)))
+pool_timeouts = registry.register(Counter(
+    "bot_http_pool_timeouts_total", "Request yang gagal karena semua koneksi di pool terpakai", ("pool",)))
+
+# Semua InstrumentedRequest yang masih hidup, dibaca gauge pool saat scrape
+_pools = weakref.WeakSet()
+
+
+def _pool_stats(attribute):
+    stats = {}
+    for request in list(_pools):
+        stats[(request.pool,)] = stats.get((request.pool,), 0) + getattr(request, attribute)
+    return stats
+
+
+registry.register(Gauge(
+    "bot_http_pool_size", "Maksimum koneksi per pool HTTP Bot API",
+    lambda: _pool_stats("pool_size"), ("pool",)))
+registry.register(Gauge(
+    "bot_http_pool_in_flight", "Request Bot API yang sedang berjalan atau menunggu koneksi; di atas size = antre",
+    lambda: _pool_stats("in_flight"), ("pool",)))
+
+
+def handler_name(callback):
+    while hasattr(callback, "func"):  # functools.partial
+        callback = callback.func
+    return getattr(callback, "__name__", repr(callback))
+
+
+handler_log = logging.getLogger("handlers")
+
+
+def instrument_handler(callback, name=None):
+    """Bungkus handler async dengan pencatatan jumlah panggilan, latency dan konteks log (lihat logs.py)."""
+    name = name or handler_name(callback)
+
+    @wraps(callback)
+    async def wrapper(*args, **kwargs):
+        token = logs.bind_update(args[0] if args else None, name)
+        start = time.perf_counter()
+        outcome = "ok"
+        try:
+            return await callback(*args, **kwargs)
+        except Exception:
+            outcome = "error"
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            handler_latency.observe(duration, name)
+            handler_requests.inc(name, outcome)
+            if handler_log.isEnabledFor(logging.DEBUG):
+                handler_log.debug("handler selesai", extra={"duration": round(duration, 6), "outcome": outcome})
+            logs.reset_update(token)
+
+    return wrapper
+
+
+class InstrumentedRequest(HTTPXRequest):
+    """HTTPXRequest yang mencatat jumlah, status dan latency setiap panggilan Bot API.
+
+    Setiap instance adalah satu connection pool bernama `pool`; request yang sedang berjalan
+    dibandingkan dengan ukuran pool terlihat di /metrics sebagai saturasi.
+    """
+
+    def __init__(self, pool="default", connection_pool_size=1, keepalive_expiry=5.0, **kwargs):
+        super().__init__(connection_pool_size=connection_pool_size, **kwargs)
+        self.pool = pool
+        self.pool_size = connection_pool_size
+        self.in_flight = 0
+        # HTTPXRequest tidak mengekspos keep-alive; client belum membuka koneksi, jadi cukup dibangun ulang
+        self._client_kwargs["limits"] = httpx.Limits(
+            max_connections=connection_pool_size,
+            max_keepalive_connections=connection_pool_size,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self._client = self._build_client()
+        _pools.add(self)
+
+    async def do_request(self, url, method, request_data=None, **kwargs):
+        api_method = url.rsplit("/", 1)[-1]
+        start = time.perf_counter()
+        status = "error"
+        self.in_flight += 1
+        try:
+            code, payload = await super().do_request(url, method, request_data, **kwargs)
+            status = str(code)
+            return code, payload
+        except TimedOut as e:
+            if isinstance(e.__cause__, httpx.PoolTimeout):
+                status = "pool_timeout"
+                pool_timeouts.inc(self.pool)
+            raise
+        finally:
+            self.in_flight -= 1
+            api_latency.observe(time.perf_counter() - start, api_method)
+            api_requests.inc(api_method, status)
+
+
+def add_metrics_route(server, path="/metrics"):
+    async def metrics(request):
+        return 200, registry.render().encode(), "text/plain; version=0.0.4; charset=utf-8"
+
+    server.route("GET", path, metrics)
@@ -0,0 +1,216 @@
+"""Outbox publish: setiap post per channel dicatat di SQLite beserta status dan message_id-nya.
+
+Status item: pending → sending → sent / failed. Item ditandai "sending" sebelum request dikirim,
+jadi setelah crash kita tahu persis mana yang sudah terkirim (sent), mana yang belum pernah
+dicoba (pending, dilanjutkan otomatis), dan mana yang statusnya tidak pasti (sending). Yang terakhir
+tidak dikirim ulang otomatis supaya channel tidak dapat duplikat; item itu ditandai gagal dan editor
+bisa memutuskan sendiri untuk mengirim ulang.
+"""
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from telegram import InlineKeyboardMarkup
+
+from storage import open_database
+
+PENDING = "pending"
+SENDING = "sending"
+SENT = "sent"
+FAILED = "failed"
+
+# Pesan untuk item yang sedang dikirim saat bot mati
+UNKNOWN_STATE_ERROR = "Bot berhenti saat mengirim; cek channel sebelum kirim ulang"
+
+
+def _dump_items(items):
+    return json.dumps([
+        [photo, caption, reply_markup.to_dict() if reply_markup else None]
+        for photo, caption, reply_markup in items
+    ])
+
+
+def _load_items(data):
+    return [
+        (photo, caption, InlineKeyboardMarkup.de_json(markup, None) if markup else None)
+        for photo, caption, markup in json.loads(data)
+    ]
+
+
+class OutboxJob:
+    """Baris publish_jobs beserta status item-itemnya, dibaca ulang saat resume / kirim ulang."""
+
+    __slots__ = ("id", "user_id", "chat_id", "channel_ids", "items", "album", "status_message_id", "states")
+
+    def __init__(self, id, user_id, chat_id, channel_ids, items, album, status_message_id, states):
+        self.id = id
+        self.user_id = user_id
+        self.chat_id = chat_id
+        self.channel_ids = channel_ids
+        self.items = items
+        self.album = album
+        self.status_message_id = status_message_id
+        self.states = states  # list of (channel_id, nomor post, status, file_id, error)
+
+
+class OutboxStore:
+    """Tabel publish_jobs dan publish_items; semua method dipanggil dari satu thread penulis."""
+
+    def __init__(self, path, shard=(0, 1)):
+        self._conn = open_database(path)
+        # Di mode cluster setiap worker hanya melanjutkan job milik user-nya sendiri (user_id % jumlah worker)
+        self._shard = shard
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS publish_jobs ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " user_id INTEGER NOT NULL,"
+            " chat_id INTEGER NOT NULL,"
+            " channel_ids TEXT NOT NULL,"
+            " items TEXT NOT NULL,"
+            " album INTEGER NOT NULL,"
+            " status_message_id INTEGER,"
+            " finished INTEGER NOT NULL DEFAULT 0,"
+            " created_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS publish_items ("
+            " job_id INTEGER NOT NULL,"
+            " channel_id TEXT NOT NULL,"
+            " number INTEGER NOT NULL,"
+            " state TEXT NOT NULL,"
+            " message_id INTEGER,"
+            " file_id TEXT,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " error TEXT,"
+            " updated_at REAL NOT NULL,"
+            " PRIMARY KEY (job_id, channel_id, number))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS publish_jobs_unfinished ON publish_jobs (finished)")
+
+    def add(self, user_id, chat_id, channel_ids, items, album, status_message_id):
+        now = time.time()
+        with self._conn:
+            self._conn.execute("BEGIN")
+            cursor = self._conn.execute(
+                "INSERT INTO publish_jobs (user_id, chat_id, channel_ids, items, album, status_message_id, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (user_id, chat_id, json.dumps(channel_ids), _dump_items(items), int(album), status_message_id, now)
+            )
+            job_id = cursor.lastrowid
+            self._conn.executemany(
+                "INSERT INTO publish_items (job_id, channel_id, number, state, updated_at) VALUES (?, ?, ?, ?, ?)",
+                [(job_id, channel_id, number, PENDING, now)
+                 for channel_id in channel_ids for number in range(1, len(items) + 1)]
+            )
+        return job_id
+
+    def mark(self, job_id, channel_id, rows, state):
+        """`rows`: list of (nomor post, message_id, file_id, error)."""
+        attempt = 1 if state == SENDING else 0
+        self._conn.executemany(
+            "UPDATE publish_items SET state = ?, message_id = COALESCE(?, message_id), file_id = COALESCE(?, file_id),"
+            " error = ?, attempts = attempts + ?, updated_at = ? WHERE job_id = ? AND channel_id = ? AND number = ?",
+            [(state, message_id, file_id, error, attempt, time.time(), job_id, channel_id, number)
+             for number, message_id, file_id, error in rows]
+        )
+
+    def finish(self, job_id):
+        self._conn.execute("UPDATE publish_jobs SET finished = 1 WHERE id = ?", (job_id,))
+
+    def _load(self, job_id):
+        row = self._conn.execute(
+            "SELECT id, user_id, chat_id, channel_ids, items, album, status_message_id FROM publish_jobs WHERE id = ?",
+            (job_id,)
+        ).fetchone()
+        states = self._conn.execute(
+            "SELECT channel_id, number, state, file_id, error FROM publish_items"
+            " WHERE job_id = ? ORDER BY channel_id, number",
+            (job_id,)
+        ).fetchall()
+        id, user_id, chat_id, channel_ids, items, album, status_message_id = row
+        return OutboxJob(id, user_id, chat_id, json.loads(channel_ids), _load_items(items), bool(album),
+                         status_message_id, states)
+
+    def take_unfinished(self):
+        """Job yang belum selesai saat bot mati; item yang sedang dikirim dianggap gagal (status tidak pasti)."""
+        with self._conn:
+            self._conn.execute("BEGIN")
+            job_ids = [row[0] for row in self._conn.execute(
+                "SELECT id FROM publish_jobs WHERE finished = 0 AND user_id % ? = ? ORDER BY id",
+                (self._shard[1], self._shard[0])
+            )]
+            self._conn.executemany(
+                "UPDATE publish_items SET state = ?, error = ?, updated_at = ? WHERE state = ? AND job_id = ?",
+                [(FAILED, UNKNOWN_STATE_ERROR, time.time(), SENDING, job_id) for job_id in job_ids]
+            )
+        return [self._load(job_id) for job_id in job_ids]
+
+    def reset_failed(self, job_id, user_id):
+        """Kembalikan item gagal ke pending supaya dikirim ulang; None jika tidak ada yang bisa dikirim ulang."""
+        with self._conn:
+            self._conn.execute("BEGIN")
+            cursor = self._conn.execute(
+                "UPDATE publish_items SET state = ?, error = NULL, updated_at = ? WHERE state = ? AND job_id ="
+                " (SELECT id FROM publish_jobs WHERE id = ? AND user_id = ? AND finished = 1)",
+                (PENDING, time.time(), FAILED, job_id, user_id)
+            )
+            if cursor.rowcount == 0:
+                return None
+            self._conn.execute("UPDATE publish_jobs SET finished = 0 WHERE id = ?", (job_id,))
+        return self._load(job_id)
+
+    def prune(self, before):
+        """Hapus job yang sudah selesai dan lebih tua dari `before` (epoch)."""
+        with self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.execute(
+                "DELETE FROM publish_items WHERE job_id IN"
+                " (SELECT id FROM publish_jobs WHERE finished = 1 AND created_at < ?)", (before,)
+            )
+            cursor = self._conn.execute("DELETE FROM publish_jobs WHERE finished = 1 AND created_at < ?", (before,))
+        return cursor.rowcount
+
+    def close(self):
+        self._conn.close()
+
+
+class Outbox:
+    """Pembungkus async OutboxStore: semua query jalan di satu thread, event loop tidak ikut menunggu disk."""
+
+    def __init__(self, path, retention=7 * 86400, shard=(0, 1)):
+        self.path = path
+        self.retention = retention
+        self.shard = shard
+        self._store = None
+        self._executor = None
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def start(self):
+        """Buka database, buang job lama, dan kembalikan job yang harus dilanjutkan."""
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="outbox")
+        self._store = await self._run(OutboxStore, self.path, self.shard)
+        await self._run(self._store.prune, time.time() - self.retention)
+        return await self._run(self._store.take_unfinished)
+
+    async def stop(self):
+        if self._store is not None:
+            await self._run(self._store.close)
+            self._store = None
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    async def add(self, user_id, chat_id, channel_ids, items, album, status_message_id):
+        return await self._run(self._store.add, user_id, chat_id, channel_ids, items, album, status_message_id)
+
+    async def mark(self, job_id, channel_id, rows, state):
+        await self._run(self._store.mark, job_id, channel_id, rows, state)
+
+    async def finish(self, job_id):
+        await self._run(self._store.finish, job_id)
+
+    async def reset_failed(self, job_id, user_id):
+        return await self._run(self._store.reset_failed, job_id, user_id)
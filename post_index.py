@@ -0,0 +1,240 @@
+"""Indeks post yang sudah terbit di channel (SQLite) dan operasi massal di atasnya.
+
+Setiap post yang berhasil dikirim dicatat (channel, message_id, caption, button, waktu), jadi
+link yang rusak di banyak post bisa diganti sekaligus, atau post-nya dihapus, tanpa edit manual
+di channel. Operasi massal berjalan paralel dan tetap lewat rate limiter per channel.
+"""
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest, TelegramError
+
+from publisher import send_with_retry
+from storage import open_database
+
+REPLACE_URL = "url"
+REPLACE_TEXT = "text"
+DELETE = "delete"
+
+# Error Telegram yang berarti pesan sudah tidak ada di channel: hapus juga dari indeks
+_GONE_ERRORS = ("message to edit not found", "message to delete not found", "message_id_invalid")
+
+
+def _like(text):
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def dump_markup(reply_markup):
+    """Baris keyboard sebagai [[[teks, url], ...], ...]; hanya button URL yang dipakai bot ini."""
+    if reply_markup is None:
+        return []
+    return [[[button.text, button.url] for button in row] for row in reply_markup.inline_keyboard]
+
+
+class PublishedPost:
+    __slots__ = ("id", "channel_id", "message_id", "caption", "buttons", "published_at")
+
+    def __init__(self, id, channel_id, message_id, caption, buttons, published_at):
+        self.id = id
+        self.channel_id = channel_id
+        self.message_id = message_id
+        self.caption = caption
+        self.buttons = buttons  # hasil dump_markup
+        self.published_at = published_at
+
+    @property
+    def markup(self):
+        if not self.buttons:
+            return None
+        return InlineKeyboardMarkup([[InlineKeyboardButton(text, url=url) for text, url in row] for row in self.buttons])
+
+
+class PostIndexStore:
+    """Tabel published_posts; semua method dipanggil dari satu thread penulis."""
+
+    def __init__(self, path):
+        self._conn = open_database(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS published_posts ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " channel_id TEXT NOT NULL,"
+            " message_id INTEGER NOT NULL,"
+            " user_id INTEGER,"
+            " job_id INTEGER,"
+            " caption TEXT NOT NULL,"
+            " buttons TEXT NOT NULL,"
+            " published_at REAL NOT NULL,"
+            " UNIQUE (channel_id, message_id))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS published_posts_time ON published_posts (published_at)")
+
+    def add_many(self, rows):
+        """`rows`: list of (channel_id, message_id, user_id, job_id, caption, reply_markup)."""
+        now = time.time()
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO published_posts (channel_id, message_id, user_id, job_id, caption, buttons, published_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(str(channel_id), message_id, user_id, job_id, caption or "",
+              json.dumps(dump_markup(reply_markup), ensure_ascii=False), now)
+             for channel_id, message_id, user_id, job_id, caption, reply_markup in rows]
+        )
+
+    def search(self, text, limit):
+        """Post terbaru yang caption atau button-nya (teks / URL) mengandung `text`; kosong = semua."""
+        rows = self._conn.execute(
+            "SELECT id, channel_id, message_id, caption, buttons, published_at FROM published_posts"
+            " WHERE caption LIKE ? ESCAPE '\\' OR buttons LIKE ? ESCAPE '\\'"
+            " ORDER BY published_at DESC LIMIT ?",
+            (_like(text), _like(text), limit)
+        ).fetchall()
+        return [
+            PublishedPost(id, channel_id, message_id, caption, json.loads(buttons), published_at)
+            for id, channel_id, message_id, caption, buttons, published_at in rows
+        ]
+
+    def update_many(self, posts):
+        self._conn.executemany(
+            "UPDATE published_posts SET caption = ?, buttons = ? WHERE id = ?",
+            [(post.caption, json.dumps(post.buttons, ensure_ascii=False), post.id) for post in posts]
+        )
+
+    def delete_many(self, post_ids):
+        self._conn.executemany("DELETE FROM published_posts WHERE id = ?", [(post_id,) for post_id in post_ids])
+
+    def close(self):
+        self._conn.close()
+
+
+class PostIndex:
+    """Pembungkus async PostIndexStore (satu thread untuk semua query)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._store = None
+        self._executor = None
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def start(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="post-index")
+        self._store = await self._run(PostIndexStore, self.path)
+
+    async def stop(self):
+        if self._store is not None:
+            await self._run(self._store.close)
+            self._store = None
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    async def record(self, rows):
+        """Catat post yang baru terbit; dipanggil PublishQueue (on_published)."""
+        await self._run(self._store.add_many, rows)
+
+    async def search(self, text, limit=100):
+        return await self._run(self._store.search, text, limit)
+
+    async def update(self, posts):
+        await self._run(self._store.update_many, posts)
+
+    async def delete(self, post_ids):
+        await self._run(self._store.delete_many, post_ids)
+
+
+class BulkOperation:
+    """Operasi massal yang menunggu konfirmasi admin."""
+
+    __slots__ = ("id", "kind", "old", "new", "posts")
+
+    def __init__(self, id, kind, old, new, posts):
+        self.id = id
+        self.kind = kind
+        self.old = old
+        self.new = new
+        self.posts = posts  # list of PublishedPost yang cocok
+
+    def apply(self, post):
+        """(caption baru, button baru) untuk REPLACE_URL / REPLACE_TEXT, atau None jika post tidak berubah."""
+        caption = post.caption.replace(self.old, self.new)
+        buttons = post.buttons
+        if self.kind == REPLACE_URL:
+            buttons = [[[text, url.replace(self.old, self.new)] for text, url in row] for row in post.buttons]
+        if caption == post.caption and buttons == post.buttons:
+            return None
+        return caption, buttons
+
+
+class BulkResult:
+    __slots__ = ("done", "skipped", "failed")
+
+    def __init__(self):
+        self.done = 0
+        self.skipped = 0  # post cocok tapi isinya tidak berubah
+        self.failed = []  # list of (PublishedPost, pesan error)
+
+    @property
+    def processed(self):
+        return self.done + self.skipped + len(self.failed)
+
+
+async def run_bulk(bot, limiter, operation, index, concurrency=8, on_progress=None):
+    """Jalankan operasi ke semua post secara paralel (maks. `concurrency`).
+
+    Indeks diperbarui per post begitu Telegram menerima perubahannya, jadi operasi yang
+    terputus di tengah jalan tidak membuat indeks berbeda dari isi channel.
+    """
+    result = BulkResult()
+    posts = iter(operation.posts)
+
+    async def apply_one(post):
+        if operation.kind == DELETE:
+            await send_with_retry(limiter, bot.delete_message, post.channel_id, message_id=post.message_id)
+            await index.delete([post.id])
+            return True
+        change = operation.apply(post)
+        if change is None:
+            return False
+        caption, buttons = change
+        edited = PublishedPost(post.id, post.channel_id, post.message_id, caption, buttons, post.published_at)
+        if caption != post.caption:
+            # Kirim reply_markup juga, kalau tidak keyboard-nya ikut hilang
+            await send_with_retry(
+                limiter, bot.edit_message_caption, post.channel_id,
+                message_id=post.message_id, caption=caption, reply_markup=edited.markup
+            )
+        else:
+            await send_with_retry(
+                limiter, bot.edit_message_reply_markup, post.channel_id,
+                message_id=post.message_id, reply_markup=edited.markup
+            )
+        await index.update([edited])
+        return True
+
+    async def worker():
+        for post in posts:
+            try:
+                if await apply_one(post):
+                    result.done += 1
+                else:
+                    result.skipped += 1
+            except BadRequest as e:
+                message = str(e).lower()
+                if "message is not modified" in message:
+                    result.skipped += 1
+                elif any(gone in message for gone in _GONE_ERRORS):
+                    await index.delete([post.id])
+                    result.failed.append((post, "Pesan sudah tidak ada di channel"))
+                else:
+                    result.failed.append((post, str(e)))
+            except TelegramError as e:
+                result.failed.append((post, str(e)))
+            if on_progress:
+                await on_progress(result)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return result
@@ -0,0 +1,152 @@
+"""Profiling sampling on-demand untuk bot yang sedang berjalan (dipicu /profile).
+
+Thread sampler membaca stack thread event loop setiap `interval` detik lewat
+sys._current_frames(), jadi tidak ada hook di hot path: saat profiling mati tidak ada biaya
+sama sekali, saat hidup biayanya hanya thread sampler itu. Waktu per handler dan per method
+Bot API diambil dari selisih histogram metrics (lihat metrics.py) di awal dan akhir sesi.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+import metrics
+
+DEFAULT_INTERVAL = 0.005
+MAX_DURATION = 600
+TOP_FUNCTIONS = 40
+
+
+def _is_idle(code):
+    # Frame teratas di selector berarti event loop sedang menunggu I/O (tidak ada yang dikerjakan)
+    return code.co_name == "select" and code.co_filename.endswith("selectors.py")
+
+
+def _label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class _Sampler(threading.Thread):
+    def __init__(self, thread_id, interval):
+        super().__init__(name="profiler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = 0
+        self.idle = 0
+        self.own = Counter()  # fungsi di puncak stack
+        self.cumulative = Counter()  # fungsi di mana pun dalam stack
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            self.samples += 1
+            if _is_idle(frame.f_code):
+                self.idle += 1
+                continue
+            self.own[frame.f_code] += 1
+            seen = set()
+            while frame is not None:
+                if frame.f_code not in seen:
+                    seen.add(frame.f_code)
+                    self.cumulative[frame.f_code] += 1
+                frame = frame.f_back
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def _series_delta(histogram, before):
+    start = {labels: (count, total) for labels, count, total in before}
+    delta = []
+    for labels, count, total in histogram.series():
+        count0, total0 = start.get(labels, (0, 0.0))
+        if count > count0:
+            delta.append((labels[0], count - count0, total - total0))
+    return sorted(delta, key=lambda row: row[2], reverse=True)
+
+
+class ProfileResult:
+    __slots__ = ("duration", "updates", "sampler", "handlers", "api_calls")
+
+    def __init__(self, duration, updates, sampler, handlers, api_calls):
+        self.duration = duration
+        self.updates = updates
+        self.sampler = sampler
+        self.handlers = handlers  # list of (nama, jumlah, total detik)
+        self.api_calls = api_calls
+
+    def render(self, top=TOP_FUNCTIONS):
+        sampler = self.sampler
+        busy = sampler.samples - sampler.idle
+        lines = [
+            f"Profil {self.duration:.1f}s, {self.updates} update, {sampler.samples} sampel"
+            f" tiap {sampler.interval * 1000:g}ms (event loop idle {sampler.idle / max(sampler.samples, 1):.0%})",
+            "",
+        ]
+        for title, rows in (("Handler", self.handlers), ("Bot API", self.api_calls)):
+            lines.append(f"{title} (total waktu, jumlah, rata-rata):")
+            for name, count, total in rows:
+                lines.append(f"  {total:9.3f}s  {count:7d}  {total / count * 1000:9.2f}ms  {name}")
+            if not rows:
+                lines.append("  -")
+            lines.append("")
+        for title, counter in (("Fungsi teratas (kumulatif)", sampler.cumulative), ("Fungsi teratas (self)", sampler.own)):
+            lines.append(f"{title}, persen dari sampel saat event loop sibuk:")
+            for code, hits in counter.most_common(top):
+                lines.append(f"  {hits / max(busy, 1):6.1%}  {hits:7d}  {_label(code)}")
+            if not counter:
+                lines.append("  -")
+            lines.append("")
+        return "\n".join(lines)
+
+
+class Profiler:
+    """Satu sesi profiling dalam satu waktu; `count_updates` mengembalikan jumlah update yang sudah diterima."""
+
+    def __init__(self, count_updates, interval=DEFAULT_INTERVAL):
+        self.count_updates = count_updates
+        self.interval = interval
+        self._running = False
+
+    @property
+    def running(self):
+        return self._running
+
+    async def run(self, seconds=None, updates=None):
+        """Profil selama `seconds` detik atau sampai `updates` update diterima (maks. MAX_DURATION detik)."""
+        if self._running:
+            raise RuntimeError("profiling sedang berjalan")
+        self._running = True
+        sampler = _Sampler(threading.get_ident(), self.interval)
+        handlers_before = metrics.handler_latency.series()
+        api_before = metrics.api_latency.series()
+        updates_before = self.count_updates()
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = started + min(seconds or MAX_DURATION, MAX_DURATION)
+        sampler.start()
+        try:
+            while loop.time() < deadline:
+                if updates and self.count_updates() - updates_before >= updates:
+                    break
+                await asyncio.sleep(min(0.1, deadline - loop.time()))
+        finally:
+            sampler.stop()
+            self._running = False
+        return ProfileResult(
+            loop.time() - started,
+            self.count_updates() - updates_before,
+            sampler,
+            _series_delta(metrics.handler_latency, handlers_before),
+            _series_delta(metrics.api_latency, api_before),
+        )
+
+
+def profile_filename(now=None):
+    return time.strftime("profile-%Y%m%d-%H%M%S.txt", time.localtime(now))
@@ -0,0 +1,380 @@
+"""Antrian publish di background: handler `done` cukup enqueue, worker yang mengirim ke channel.
+
+Satu job bisa punya beberapa channel tujuan; pengiriman ke tiap channel berjalan paralel
+(masing-masing dibatasi rate limit per chat), dan gambar yang perlu di-upload (URL atau file)
+hanya di-upload sekali: channel lain memakai file_id hasil upload pertama.
+
+Setiap post per channel dicatat di outbox (lihat outbox.py), jadi job yang terputus dilanjutkan
+setelah restart tanpa mengirim ulang post yang sudah masuk channel, dan post yang gagal bisa
+dikirim ulang tanpa menyentuh yang sudah berhasil.
+"""
+import asyncio
+import logging
+import random
+import time
+
+import httpx
+from telegram import InputMediaPhoto
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TelegramError, TimedOut
+
+from outbox import FAILED, SENDING, SENT
+
+logger = logging.getLogger(__name__)
+
+# Jeda minimum antar edit pesan status supaya chat editor tidak kena flood limit
+PROGRESS_INTERVAL = 1.0
+MAX_REPORTED_ERRORS = 10
+# Batas Telegram untuk satu send_media_group
+MAX_ALBUM_SIZE = 10
+# Error jaringan dicoba ulang dengan backoff eksponensial (detik) sampai MAX_ATTEMPTS kali
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+# Timeout tidak dicoba ulang otomatis: request mungkin sudah sampai ke Telegram
+TIMEOUT_ERROR = "Timeout, mungkin sudah terkirim; cek channel sebelum kirim ulang"
+
+
+class TargetResult:
+    """Hasil kirim ke satu channel tujuan."""
+
+    __slots__ = ("sent", "failed")
+
+    def __init__(self):
+        self.sent = 0
+        self.failed = []  # list of (nomor post, pesan error)
+
+
+class PublishJob:
+    """Satu batch postingan milik satu user, di-snapshot saat `done` ditekan."""
+
+    __slots__ = ("id", "user_id", "chat_id", "channel_ids", "items", "album", "status_message_id", "results", "done")
+
+    def __init__(self, user_id, chat_id, channel_ids, items, album=False, status_message_id=None):
+        self.id = None  # id di outbox, diisi saat submit
+        self.user_id = user_id
+        self.chat_id = chat_id
+        self.channel_ids = list(channel_ids)
+        self.items = items  # list of (photo, caption, reply_markup)
+        self.album = album
+        self.status_message_id = status_message_id
+        self.results = {channel_id: TargetResult() for channel_id in self.channel_ids}
+        self.done = {}  # (channel_id, nomor post) -> file_id, untuk post yang sudah ada di channel
+
+    @classmethod
+    def from_outbox(cls, record):
+        """Bangun ulang job dari outbox: post yang sudah terkirim atau gagal tidak dikirim lagi."""
+        job = cls(record.user_id, record.chat_id, record.channel_ids, record.items, record.album, record.status_message_id)
+        job.id = record.id
+        for channel_id, number, state, file_id, error in record.states:
+            if state == SENT:
+                job.done[(channel_id, number)] = file_id
+                job.results[channel_id].sent += 1
+            elif state == FAILED:
+                job.results[channel_id].failed.append((number, error))
+        return job
+
+    @property
+    def sent(self):
+        return sum(result.sent for result in self.results.values())
+
+    def pending(self, channel_id):
+        """Nomor post yang masih harus dikirim ke `channel_id`."""
+        failed = {number for number, _ in self.results[channel_id].failed}
+        return [
+            number for number in range(1, len(self.items) + 1)
+            if (channel_id, number) not in self.done and number not in failed
+        ]
+
+
+def needs_upload(photo):
+    """True jika Telegram harus mengunduh/menerima file (URL atau bytes), bukan file_id yang sudah ada."""
+    return not isinstance(photo, str) or photo.startswith(("http://", "https://"))
+
+
+async def send_with_retry(limiter, send, chat_id, cost=1, **kwargs):
+    """Panggil `send(chat_id=..., **kwargs)` lewat rate limiter, dengan retry untuk RetryAfter dan error jaringan.
+
+    `cost`: jumlah pesan yang dihasilkan satu panggilan (jumlah item untuk send_media_group).
+    """
+    attempt = 0
+    while True:
+        await limiter.acquire(chat_id, cost)
+        try:
+            return await send(chat_id=chat_id, **kwargs)
+        except RetryAfter as e:
+            # Limiter kita terlalu optimis; tahan chat ini sesuai permintaan Telegram
+            limiter.penalize(chat_id, e.retry_after)
+            continue
+        except TimedOut as e:
+            # Request mungkin sudah sampai ke Telegram; kirim ulang bisa membuat duplikat.
+            # Kecuali pool penuh: request-nya belum pernah dikirim
+            if not isinstance(e.__cause__, httpx.PoolTimeout) or attempt + 1 >= MAX_ATTEMPTS:
+                raise
+        except (BadRequest, Forbidden):
+            # Error permanen (400/403); BadRequest turunan NetworkError di PTB, jadi harus ditangkap dulu
+            raise
+        except NetworkError:
+            # Koneksi gagal atau 5xx: Telegram belum memproses request, aman dicoba ulang
+            if attempt + 1 >= MAX_ATTEMPTS:
+                raise
+        attempt += 1
+        await asyncio.sleep(min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0))
+
+
+def plan_batches(items, album=False, numbers=None):
+    """Kelompokkan post menjadi panggilan API: list of [(nomor post, item), ...].
+
+    `numbers` membatasi ke nomor post tertentu (mulai dari 1), misalnya yang belum terkirim.
+
+    Dalam mode album, post berurutan tanpa button digabung jadi satu media group
+    (maks. MAX_ALBUM_SIZE); post dengan button tetap dikirim sendiri karena
+    Telegram tidak mengizinkan inline keyboard di media group.
+    """
+    batches = []
+    current = []
+    numbers = range(1, len(items) + 1) if numbers is None else numbers
+    for number in numbers:
+        item = items[number - 1]
+        if album and item[2] is None:
+            current.append((number, item))
+            if len(current) == MAX_ALBUM_SIZE:
+                batches.append(current)
+                current = []
+            continue
+        if current:
+            batches.append(current)
+            current = []
+        batches.append([(number, item)])
+    if current:
+        batches.append(current)
+    return batches
+
+
+class PublishQueue:
+    def __init__(self, limiter, outbox, workers=2, failed_markup=None, on_published=None):
+        self.limiter = limiter
+        self.outbox = outbox
+        self.workers = workers
+        # Dipanggil dengan job yang punya post gagal; hasilnya (mis. tombol kirim ulang) dipasang di pesan ringkasan
+        self.failed_markup = failed_markup
+        # Coroutine yang menerima post yang baru terbit: list of (channel_id, message_id, user_id, job_id, caption, reply_markup)
+        self.on_published = on_published
+        self._queue = asyncio.Queue()
+        self._tasks = []
+        self._bot = None
+
+    @property
+    def depth(self):
+        return self._queue.qsize()
+
+    async def start(self, bot):
+        self._bot = bot
+        resumed = await self.outbox.start()
+        for record in resumed:
+            self._queue.put_nowait(PublishJob.from_outbox(record))
+        if resumed:
+            logger.info("Melanjutkan %d publish job yang terputus", len(resumed))
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, timeout=30):
+        """Tunggu antrian habis (maks `timeout` detik), lalu hentikan worker."""
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("%d publish job belum terkirim saat shutdown (dilanjutkan saat start)", self.depth)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self.outbox.stop()
+
+    async def submit(self, job):
+        """Catat job di outbox dulu, baru masukkan ke antrian; kembali setelah job tersimpan."""
+        job.id = await self.outbox.add(job.user_id, job.chat_id, job.channel_ids, job.items, job.album, job.status_message_id)
+        self._queue.put_nowait(job)
+
+    async def republish(self, job_id, user_id):
+        """Kirim ulang hanya post yang gagal; None jika job tidak ada, bukan milik user, atau masih berjalan."""
+        record = await self.outbox.reset_failed(job_id, user_id)
+        if record is None:
+            return None
+        job = PublishJob.from_outbox(record)
+        self._queue.put_nowait(job)
+        return job
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run_job(job)
+            except Exception as e:
+                logger.exception("Error publishing job %s: %s", job.id, e, extra={"user_id": job.user_id})
+            finally:
+                self._queue.task_done()
+
+    async def _run_job(self, job):
+        plans = {channel_id: plan_batches(job.items, job.album, job.pending(channel_id)) for channel_id in job.channel_ids}
+        primary_pending = {number for batch in plans[job.channel_ids[0]] for number, _ in batch}
+        loop = asyncio.get_running_loop()
+        # Channel pertama meng-upload; channel lain menunggu file_id-nya (hanya untuk gambar yang perlu upload)
+        uploads = [
+            loop.create_future() if needs_upload(photo) and number in primary_pending else None
+            for number, (photo, _, _) in enumerate(job.items, 1)
+        ]
+        progress = _Progress(sum(len(batch) for batches in plans.values() for batch in batches))
+        outcomes = await asyncio.gather(*(
+            self._publish_to(job, channel_id, plans[channel_id], uploads, progress, primary=index == 0)
+            for index, channel_id in enumerate(job.channel_ids)
+        ), return_exceptions=True)
+        crashed = False
+        for channel_id, outcome in zip(job.channel_ids, outcomes):
+            if isinstance(outcome, Exception):
+                crashed = True
+                logger.error(
+                    "Error publishing job %s to %s: %s", job.id, channel_id, outcome,
+                    exc_info=outcome, extra={"user_id": job.user_id}
+                )
+        if not crashed:
+            # Job yang terhenti karena error tak terduga dibiarkan belum selesai supaya dilanjutkan saat restart
+            await self.outbox.finish(job.id)
+        has_failed = any(result.failed for result in job.results.values())
+        reply_markup = self.failed_markup(job) if has_failed and self.failed_markup and not crashed else None
+        await self._update_status(job, self._summary(job), reply_markup)
+
+    async def _publish_to(self, job, channel_id, batches, uploads, progress, primary):
+        result = job.results[channel_id]
+        primary_id = job.channel_ids[0]
+        try:
+            for batch in batches:
+                photos = []
+                for number, (photo, _, _) in batch:
+                    upload = uploads[number - 1]
+                    if not primary:
+                        photo = await upload if upload is not None else job.done.get((primary_id, number)) or photo
+                    photos.append(photo)
+                numbers = [number for number, _ in batch]
+                await self.outbox.mark(job.id, channel_id, [(number, None, None, None) for number in numbers], SENDING)
+                try:
+                    if len(batch) == 1:
+                        _, (_, caption, reply_markup) = batch[0]
+                        messages = [await self._send_with_retry(
+                            self._bot.send_photo,
+                            chat_id=channel_id,
+                            photo=photos[0],
+                            caption=caption,
+                            reply_markup=reply_markup
+                        )]
+                    else:
+                        messages = await self._send_with_retry(
+                            self._bot.send_media_group,
+                            chat_id=channel_id,
+                            cost=len(batch),
+                            media=[InputMediaPhoto(photo, caption=caption) for photo, (_, (_, caption, _)) in zip(photos, batch)]
+                        )
+                    file_ids = [message.photo[-1].file_id if message.photo else None for message in messages]
+                    result.sent += len(batch)
+                    for number, file_id in zip(numbers, file_ids):
+                        job.done[(channel_id, number)] = file_id
+                    await self.outbox.mark(job.id, channel_id, [
+                        (number, message.message_id, file_id, None)
+                        for number, message, file_id in zip(numbers, messages, file_ids)
+                    ], SENT)
+                    await self._published(job, channel_id, batch, messages)
+                except TelegramError as e:
+                    file_ids = None
+                    error = TIMEOUT_ERROR if isinstance(e, TimedOut) else str(e)
+                    result.failed.extend((number, error) for number in numbers)
+                    await self.outbox.mark(job.id, channel_id, [(number, None, None, error) for number in numbers], FAILED)
+
+                if primary:
+                    for index, (number, (photo, _, _)) in enumerate(batch):
+                        upload = uploads[number - 1]
+                        if upload is not None:
+                            # Kalau upload gagal, channel lain mencoba sendiri dengan sumber aslinya
+                            upload.set_result((file_ids[index] or photo) if file_ids else photo)
+
+                progress.done += len(batch)
+                if progress.due():
+                    await self._update_status(job, f"⏳ Mengirim postingan... {progress.done}/{progress.total}")
+        finally:
+            if primary:
+                # Jangan biarkan channel lain menunggu selamanya jika channel pertama berhenti di tengah jalan
+                for upload, (photo, _, _) in zip(uploads, job.items):
+                    if upload is not None and not upload.done():
+                        upload.set_result(photo)
+
+    async def _send_with_retry(self, send, chat_id, cost=1, **kwargs):
+        return await send_with_retry(self.limiter, send, chat_id, cost, **kwargs)
+
+    async def _published(self, job, channel_id, batch, messages):
+        if self.on_published is None:
+            return
+        try:
+            await self.on_published([
+                (channel_id, message.message_id, job.user_id, job.id, caption, reply_markup)
+                for (_, (_, caption, reply_markup)), message in zip(batch, messages)
+            ])
+        except Exception as e:
+            # Post sudah terbit; gagal mencatat indeks tidak boleh membuatnya dianggap gagal
+            logger.exception("Error indexing published posts: %s", e)
+
+    async def _update_status(self, job, text, reply_markup=None):
+        await self.limiter.acquire(job.chat_id)
+        try:
+            if job.status_message_id:
+                await self._bot.edit_message_text(
+                    chat_id=job.chat_id, message_id=job.status_message_id, text=text, reply_markup=reply_markup
+                )
+            else:
+                await self._bot.send_message(chat_id=job.chat_id, text=text, reply_markup=reply_markup)
+        except TelegramError as e:
+            logger.warning("Error updating publish status: %s", e)
+
+    @staticmethod
+    def _summary(job):
+        total = len(job.items)
+        if len(job.channel_ids) == 1:
+            result = job.results[job.channel_ids[0]]
+            if result.sent == total:
+                return f"✅ Semua postingan berhasil dikirim ke channel! ({total} post)"
+            if result.sent == 0:
+                text = "❌ Gagal mengirim semua postingan!"
+            else:
+                text = f"⚠️ Berhasil mengirim {result.sent} dari {total} postingan ke channel."
+            return text + _format_errors(result.failed)
+
+        channels = len(job.channel_ids)
+        if job.sent == total * channels:
+            return f"✅ Semua postingan berhasil dikirim ke {channels} channel! ({total} post)"
+        text = f"⚠️ Hasil kirim {total} postingan ke {channels} channel:"
+        for channel_id, result in job.results.items():
+            mark = "✅" if result.sent == total else "❌" if result.sent == 0 else "⚠️"
+            text += f"\n\n{mark} {channel_id}: {result.sent}/{total}"
+            text += _format_errors(result.failed)
+        return text
+
+
+class _Progress:
+    __slots__ = ("done", "total", "_last")
+
+    def __init__(self, total):
+        self.done = 0
+        self.total = total
+        self._last = time.monotonic()
+
+    def due(self):
+        """True jika sudah waktunya edit pesan status lagi (maks. sekali per PROGRESS_INTERVAL)."""
+        now = time.monotonic()
+        if self.done >= self.total or now - self._last < PROGRESS_INTERVAL:
+            return False
+        self._last = now
+        return True
+
+
+def _format_errors(failed):
+    text = ""
+    for number, error in failed[:MAX_REPORTED_ERRORS]:
+        text += f"\n• Post ke-{number}: {error}"
+    if len(failed) > MAX_REPORTED_ERRORS:
+        text += f"\n• ... dan {len(failed) - MAX_REPORTED_ERRORS} post lainnya"
+    return text
@@ -0,0 +1,117 @@
+"""Token bucket untuk anti-spam per user dan batas kirim Telegram (per chat dan global)."""
+import asyncio
+import time
+
+
+class TokenBucket:
+    """Bucket yang terisi `rate` token per detik sampai `capacity`.
+
+    Token boleh minus: `reserve()` langsung memesan token dan mengembalikan berapa lama
+    pemanggil harus menunggu, sehingga pengirim yang bersamaan otomatis antre secara adil.
+    """
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, n=1):
+        """Pesan `n` token; kembalikan jumlah detik sampai token itu benar-benar tersedia."""
+        self._refill(time.monotonic())
+        self.tokens -= n
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def try_consume(self, n=1, allow_debt=False):
+        """Ambil `n` token kalau tersedia. Dengan `allow_debt`, cukup ada 1 token dan sisanya jadi utang."""
+        self._refill(time.monotonic())
+        if self.tokens >= (1 if allow_debt else n):
+            self.tokens -= n
+            return True
+        return False
+
+    def wait_time(self, n=1):
+        """Detik sampai `n` token tersedia (tanpa memesan)."""
+        self._refill(time.monotonic())
+        return max(0.0, (n - self.tokens) / self.rate)
+
+    def penalize(self, seconds):
+        """Kosongkan bucket selama `seconds` detik (misalnya setelah RetryAfter dari Telegram)."""
+        self._refill(time.monotonic())
+        self.tokens = min(self.tokens, -seconds * self.rate)
+
+    @property
+    def full(self):
+        self._refill(time.monotonic())
+        return self.tokens >= self.capacity
+
+
+class RateLimiter:
+    """Satu tempat untuk semua batas kecepatan bot.
+
+    - per user: `user_limit` postingan per menit (anti-spam editor)
+    - per chat: `chat_per_minute` pesan per menit ke chat/channel yang sama
+    - global: `global_per_second` pesan per detik untuk seluruh bot
+    """
+
+    # Bersihkan bucket user yang sudah penuh lagi kalau jumlahnya melewati batas ini
+    PRUNE_THRESHOLD = 1024
+
+    def __init__(self, user_limit=50, chat_per_minute=20, chat_burst=3, global_per_second=30):
+        self.user_limit = user_limit
+        self.chat_per_minute = chat_per_minute
+        self.chat_burst = chat_burst
+        self._users = {}
+        self._chats = {}
+        self._global = TokenBucket(global_per_second, global_per_second)
+
+    def _user_bucket(self, user_id):
+        bucket = self._users.get(user_id)
+        if bucket is None:
+            if len(self._users) >= self.PRUNE_THRESHOLD:
+                self._prune(self._users)
+            bucket = self._users[user_id] = TokenBucket(self.user_limit / 60, self.user_limit)
+        return bucket
+
+    def _chat_bucket(self, chat_id):
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= self.PRUNE_THRESHOLD:
+                self._prune(self._chats)
+            bucket = self._chats[chat_id] = TokenBucket(self.chat_per_minute / 60, self.chat_burst)
+        return bucket
+
+    @staticmethod
+    def _prune(buckets):
+        for key in [key for key, bucket in buckets.items() if bucket.full]:
+            del buckets[key]
+
+    def allow_posts(self, user_id, count):
+        """Cek kuota anti-spam user untuk batch berisi `count` post.
+
+        Batch boleh jalan selama kuota user belum habis; kelebihannya dibayar dari isi ulang
+        berikutnya, jadi batas rata-rata tetap `user_limit` per menit tanpa reset serentak.
+        """
+        return self._user_bucket(user_id).try_consume(count, allow_debt=True)
+
+    def user_wait_time(self, user_id):
+        return self._user_bucket(user_id).wait_time(1)
+
+    async def acquire(self, chat_id, n=1):
+        """Tunggu giliran mengirim `n` pesan ke `chat_id` (media group dihitung per item oleh Telegram)."""
+        delay = self._chat_bucket(chat_id).reserve(n)
+        if delay:
+            await asyncio.sleep(delay)
+        delay = self._global.reserve(n)
+        if delay:
+            await asyncio.sleep(delay)
+
+    def penalize(self, chat_id, seconds):
+        """Telegram membalas RetryAfter: tahan semua pengiriman ke chat ini selama `seconds`."""
+        self._chat_bucket(chat_id).penalize(seconds)
@@ -0,0 +1,117 @@
+"""Rekam semua update masuk ke log JSON lines terkompresi (gzip) yang dirotasi, untuk di-replay nanti."""
+import asyncio
+import glob
+import gzip
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+FILE_PATTERN = "updates-*.jsonl.gz"
+
+
+def read_recording(paths):
+    """Baca satu atau beberapa file rekaman; hasilkan (timestamp, dict update) sesuai urutan file."""
+    for path in paths:
+        with gzip.open(path, "rt", encoding="utf-8") as file:
+            try:
+                for line in file:
+                    if line.strip():
+                        record = json.loads(line)
+                        yield record["ts"], record["update"]
+            except EOFError:
+                # File terakhir yang belum ditutup rapi (proses mati): pakai yang sudah terbaca
+                pass
+
+
+def recording_files(directory):
+    return sorted(glob.glob(os.path.join(directory, FILE_PATTERN)))
+
+
+class UpdateRecorder:
+    """Perekam update dengan write-behind seperti DraftPersistence.
+
+    `record` hanya menambah ke buffer (tanpa I/O); tiap `flush_interval` detik batch ditulis
+    dari thread terpisah. File baru dibuat setelah `max_bytes` (sebelum kompresi), dan hanya
+    `keep` file terbaru yang disimpan.
+    """
+
+    def __init__(self, directory, max_bytes=64 << 20, keep=10, flush_interval=1.0):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.keep = keep
+        self.flush_interval = flush_interval
+        self.recorded = 0
+        self._buffer = []
+        self._file = None
+        self._written = 0
+        self._executor = None
+        self._task = None
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="recorder")
+        self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+        if self._executor is not None:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self._close)
+            self._executor.shutdown()
+            self._executor = None
+
+    def record(self, update):
+        self._buffer.append((time.time(), update.to_dict()))
+        self.recorded += 1
+
+    async def flush(self):
+        if not self._buffer or self._executor is None:
+            return
+        batch, self._buffer = self._buffer, []
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._write, batch)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.exception("Error writing update recording: %s", e)
+
+    # -- Dipanggil di thread perekam --------------------------------------
+
+    def _write(self, batch):
+        data = "".join(
+            json.dumps({"ts": ts, "update": update}, ensure_ascii=False, separators=(",", ":")) + "\n"
+            for ts, update in batch
+        ).encode("utf-8")
+        if self._file is None or self._written >= self.max_bytes:
+            self._rotate()
+        self._file.write(data)
+        # Sync flush per batch: rekaman tetap terbaca walau proses mati sebelum file ditutup
+        self._file.flush()
+        self._written += len(data)
+
+    def _rotate(self):
+        self._close()
+        name = time.strftime("updates-%Y%m%d-%H%M%S", time.gmtime())
+        # Nomor urut supaya nama tetap unik dan urutan sort = urutan waktu
+        sequence = 0
+        while os.path.exists(path := os.path.join(self.directory, f"{name}-{sequence:03d}.jsonl.gz")):
+            sequence += 1
+        self._file = gzip.open(path, "wb")
+        self._written = 0
+        for old in recording_files(self.directory)[:-self.keep]:
+            os.remove(old)
+
+    def _close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
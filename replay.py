@@ -0,0 +1,178 @@
+"""Replay rekaman update (lihat RECORD_UPDATES_DIR) melalui handler asli terhadap Bot API tiruan.
+
+Contoh:
+    python replay.py recordings/                 # kecepatan asli (1×)
+    python replay.py recordings/ --speed 10      # 10× lebih cepat
+    python replay.py updates-*.jsonl.gz --speed max --latency 0.05
+
+Draft disimpan di memori dan perekaman dimatikan selama replay; batas kirim channel tetap
+mengikuti konfigurasi (.env), jadi publish ikut tertahan seperti di produksi. Revisi di callback_data rekaman
+dipetakan ke revisi draft hasil replay, sehingga tombol yang dulu valid tetap valid (dan tombol
+yang dulu basi tetap ditolak).
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from recorder import read_recording, recording_files
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+def _load(paths, limit):
+    files = []
+    for path in paths:
+        files.extend(recording_files(path) if os.path.isdir(path) else [path])
+    records = []
+    for record in read_recording(files):
+        records.append(record)
+        if limit and len(records) >= limit:
+            break
+    return records
+
+
+def _user_ids(records):
+    users = set()
+    for _, update in records:
+        for key in ("message", "edited_message", "callback_query"):
+            sender = (update.get(key) or {}).get("from")
+            if sender:
+                users.add(sender["id"])
+    return users
+
+
+def _configure_env(records):
+    # Harus sebelum import main: konfigurasi dibaca saat import
+    os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123:replay")
+    os.environ.setdefault("CHANNEL_ID", "-1001000000000")
+    os.environ["AUTHORIZED_USERS"] = ",".join(str(user_id) for user_id in _user_ids(records))
+    os.environ["DRAFT_STORE"] = "memory"
+    os.environ["SCHEDULE_DB_PATH"] = ":memory:"
+    os.environ["OUTBOX_DB_PATH"] = ":memory:"
+    os.environ["BUTTON_SETS_DB_PATH"] = ":memory:"
+    os.environ["POST_INDEX_DB_PATH"] = ":memory:"
+    os.environ["IMAGE_CACHE_DB_PATH"] = ":memory:"
+    os.environ["RECORD_UPDATES_DIR"] = ""
+    os.environ["METRICS_PORT"] = "0"
+
+
+async def replay(records, speed, latency):
+    from telegram import Update
+    from telegram.ext import TypeHandler
+
+    import main
+    from callbacks import decode_callback, encode_callback
+    from concurrency import DUPLICATE
+    from fake_bot_api import FakeBotAPI
+    from metrics import handler_latency
+
+    fake = FakeBotAPI(latency=latency)
+    await fake.start()
+    app = main.build_application(base_url=fake.base_url)
+
+    offsets = {}  # user_id -> (PostData, selisih revisi replay - revisi rekaman)
+    latencies = []
+    pending = {}
+    finished = asyncio.Event()
+    feeding_done = False
+
+    async def remap_revision(update, context):
+        query = update.callback_query
+        parsed = decode_callback(query.data) if query else None
+        post_data = main.posts.get(query.from_user.id) if parsed else None
+        if post_data is None:
+            return
+        action, index, revision = parsed
+        known = offsets.get(query.from_user.id)
+        if known is None or known[0] is not post_data:
+            # Tap pertama pada draft ini dianggap valid; selisihnya berlaku untuk tap berikutnya
+            known = offsets[query.from_user.id] = (post_data, post_data.revision - revision)
+        with query._unfrozen():
+            query.data = encode_callback(action, index, revision + known[1])
+
+    async def completed(update, context):
+        latencies.append(time.perf_counter() - pending.pop(update.update_id))
+        if not pending and feeding_done:
+            finished.set()
+
+    def dropped(update, reason):
+        # Dibuang di intake (lihat concurrency.py): tidak akan sampai ke `completed`. Kiriman ulang
+        # berbagi entri `pending` dengan update aslinya, yang tetap selesai lewat `completed`.
+        if reason == DUPLICATE:
+            return
+        pending.pop(update.update_id)
+        if not pending and feeding_done:
+            finished.set()
+
+    main.update_processor.on_drop = dropped
+    app.add_handler(TypeHandler(Update, remap_revision), group=-100)
+    app.add_handler(TypeHandler(Update, completed), group=100)
+
+    await app.initialize()
+    await main.post_init(app)
+    await app.start()
+
+    first_ts = records[0][0] if records else 0
+    start = time.perf_counter()
+    for ts, data in records:
+        if speed:
+            delay = (ts - first_ts) / speed - (time.perf_counter() - start)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        update = Update.de_json(data, app.bot)
+        pending[update.update_id] = time.perf_counter()
+        await app.update_queue.put(update)
+    feeding_done = True
+    if pending:
+        await finished.wait()
+    elapsed = time.perf_counter() - start
+
+    await app.stop()
+    await main.post_stop(app)
+    await app.shutdown()
+    await fake.stop()
+
+    recorded_span = records[-1][0] - first_ts if records else 0
+    print(f"{len(latencies)} update dalam {elapsed:.2f}s (rekaman asli {recorded_span:.1f}s) "
+          f"→ {len(latencies) / max(elapsed, 1e-9):.0f} updates/s")
+    print(f"latency per update: p50={_percentile(latencies, 0.5) * 1000:.1f}ms "
+          f"p99={_percentile(latencies, 0.99) * 1000:.1f}ms")
+    print(f"Bot API calls: {sum(fake.call_counts.values())}")
+    print(f"{'handler':<22} {'n':>7} {'mean':>9} {'p50≤':>8} {'p99≤':>8}")
+    for labels, count, total in sorted(handler_latency.series(), key=lambda s: -s[2]):
+        if not count:
+            continue
+        print(f"{labels[0]:<22} {count:>7} {total / count * 1000:>7.2f}ms "
+              f"{handler_latency.quantile(0.5, *labels) * 1000:>6.1f}ms "
+              f"{handler_latency.quantile(0.99, *labels) * 1000:>6.1f}ms")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="+", help="file rekaman atau direktori RECORD_UPDATES_DIR")
+    parser.add_argument("--speed", default="1", help="kelipatan kecepatan (1, 10, ...) atau 'max'")
+    parser.add_argument("--latency", type=float, default=0.0, help="latency Bot API tiruan (detik)")
+    parser.add_argument("--limit", type=int, default=0, help="hanya replay N update pertama")
+    args = parser.parse_args()
+    args.speed = 0.0 if args.speed == "max" else float(args.speed)
+    if args.speed < 0:
+        parser.error("--speed harus positif atau 'max'")
+    return args
+
+
+def main():
+    args = parse_args()
+    records = _load(args.paths, args.limit)
+    if not records:
+        sys.exit("Tidak ada update di rekaman")
+    _configure_env(records)
+    asyncio.run(replay(records, args.speed, args.latency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+"""Publish terjadwal: antrian persisten (SQLite) yang diindeks waktu publish, dengan satu task penjadwal.
+
+Job yang jatuh tempo tidak langsung dihapus: barisnya ditandai diklaim (claimed_at), diserahkan ke
+antrian publish (yang mencatatnya di outbox), dan baru dihapus setelah itu berhasil. Klaim yang
+tertinggal karena bot mati di tengah jalan dilepas lagi saat start, jadi job tersebut dikirim ulang,
+bukan hilang (kalau bot mati tepat setelah outbox ditulis, job bisa terkirim dua kali; itu lebih baik
+daripada hilang). Job yang gagal diserahkan dicoba lagi setelah RETRY_DELAY.
+"""
+import asyncio
+import json
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from storage import open_database
+
+logger = logging.getLogger(__name__)
+
+# Batas tidur satu kali; jaga-jaga kalau jam sistem bergeser (bukan polling, cukup jarang)
+MAX_SLEEP = 300
+# Jadwal terlalu jauh kemungkinan besar salah ketik
+MAX_AHEAD = timedelta(days=366)
+# Jeda sebelum job yang gagal diserahkan ke antrian publish dicoba lagi (detik)
+RETRY_DELAY = 60
+
+_RELATIVE = re.compile(r"^\+(\d+)\s*([mhd])$")
+_UNITS = {"m": "minutes", "h": "hours", "d": "days"}
+
+
+def parse_schedule_time(text, now, tz):
+    """Ubah input editor jadi epoch (detik), atau None jika formatnya tidak dikenali.
+
+    Format: "+30m" / "+2h" / "+1d", "HH:MM" (hari ini, atau besok jika sudah lewat),
+    "YYYY-MM-DD HH:MM" dan "DD/MM/YYYY HH:MM". Jam dibaca dalam zona `tz`.
+    """
+    text = " ".join(text.split())
+    local_now = datetime.fromtimestamp(now, tz)
+    match = _RELATIVE.match(text)
+    if match:
+        return (local_now + timedelta(**{_UNITS[match.group(2)]: int(match.group(1))})).timestamp()
+
+    for fmt in ("%Y-%m-%d %H:%M", "%d/%m/%Y %H:%M"):
+        try:
+            return datetime.strptime(text, fmt).replace(tzinfo=tz).timestamp()
+        except ValueError:
+            pass
+
+    try:
+        clock = datetime.strptime(text, "%H:%M")
+    except ValueError:
+        return None
+    due = local_now.replace(hour=clock.hour, minute=clock.minute, second=0, microsecond=0)
+    if due.timestamp() <= now:
+        due += timedelta(days=1)
+    return due.timestamp()
+
+
+def validate_schedule_time(due_at, now):
+    """Pesan error untuk waktu yang tidak masuk akal, atau None jika valid."""
+    if due_at <= now:
+        return "Waktu sudah lewat"
+    if due_at - now > MAX_AHEAD.total_seconds():
+        return "Maksimal satu tahun ke depan"
+    return None
+
+
+def format_local(timestamp, tz):
+    return datetime.fromtimestamp(timestamp, tz).strftime("%Y-%m-%d %H:%M")
+
+
+def utc_offset(hours):
+    return timezone(timedelta(hours=hours))
+
+
+class ScheduledPost:
+    __slots__ = ("id", "due_at", "user_id", "chat_id", "data")
+
+    def __init__(self, id, due_at, user_id, chat_id, data):
+        self.id = id
+        self.due_at = due_at
+        self.user_id = user_id
+        self.chat_id = chat_id
+        self.data = data  # hasil dump_post_data
+
+
+class ScheduleStore:
+    """Tabel scheduled_posts; semua method dipanggil dari satu thread penulis."""
+
+    def __init__(self, path, shard=(0, 1)):
+        self._conn = open_database(path)
+        # Di mode cluster setiap worker hanya mengirim job milik user-nya sendiri (user_id % jumlah worker),
+        # sehingga klaim yang tertinggal bisa dilepas tanpa menyerobot job yang sedang dikirim worker lain
+        self._shard = shard
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS scheduled_posts ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " due_at REAL NOT NULL,"
+            " user_id INTEGER NOT NULL,"
+            " chat_id INTEGER NOT NULL,"
+            " post_count INTEGER NOT NULL,"
+            " data TEXT NOT NULL,"
+            " claimed_at REAL)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(scheduled_posts)")}
+        if "claimed_at" not in columns:
+            # Database dari versi sebelum ada klaim
+            self._conn.execute("ALTER TABLE scheduled_posts ADD COLUMN claimed_at REAL")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS scheduled_posts_due ON scheduled_posts (due_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS scheduled_posts_user ON scheduled_posts (user_id, due_at)")
+
+    def add(self, due_at, user_id, chat_id, data):
+        cursor = self._conn.execute(
+            "INSERT INTO scheduled_posts (due_at, user_id, chat_id, post_count, data) VALUES (?, ?, ?, ?, ?)",
+            (due_at, user_id, chat_id, len(data["entries"]), json.dumps(data))
+        )
+        return cursor.lastrowid
+
+    def next_due(self):
+        return self._conn.execute(
+            "SELECT MIN(due_at) FROM scheduled_posts WHERE claimed_at IS NULL AND user_id % ? = ?",
+            (self._shard[1], self._shard[0])
+        ).fetchone()[0]
+
+    def count(self):
+        return self._conn.execute(
+            "SELECT COUNT(*) FROM scheduled_posts WHERE claimed_at IS NULL AND user_id % ? = ?",
+            (self._shard[1], self._shard[0])
+        ).fetchone()[0]
+
+    def take_due(self, now, limit):
+        """Klaim job yang sudah jatuh tempo (paling awal dulu); baris baru dihapus lewat finish()."""
+        with self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            rows = self._conn.execute(
+                "SELECT id, due_at, user_id, chat_id, data FROM scheduled_posts"
+                " WHERE due_at <= ? AND claimed_at IS NULL AND user_id % ? = ? ORDER BY due_at LIMIT ?",
+                (now, self._shard[1], self._shard[0], limit)
+            ).fetchall()
+            self._conn.executemany(
+                "UPDATE scheduled_posts SET claimed_at = ? WHERE id = ?", [(now, row[0]) for row in rows]
+            )
+        return [ScheduledPost(id, due_at, user_id, chat_id, json.loads(data)) for id, due_at, user_id, chat_id, data in rows]
+
+    def finish(self, job_id):
+        self._conn.execute("DELETE FROM scheduled_posts WHERE id = ?", (job_id,))
+
+    def retry(self, job_id, due_at):
+        self._conn.execute("UPDATE scheduled_posts SET claimed_at = NULL, due_at = ? WHERE id = ?", (due_at, job_id))
+
+    def release_claimed(self):
+        """Lepas klaim yang tertinggal saat bot mati, supaya job-nya dikirim lagi; kembalikan jumlahnya."""
+        cursor = self._conn.execute(
+            "UPDATE scheduled_posts SET claimed_at = NULL WHERE claimed_at IS NOT NULL AND user_id % ? = ?",
+            (self._shard[1], self._shard[0])
+        )
+        return cursor.rowcount
+
+    def list_for_user(self, user_id, limit):
+        return self._conn.execute(
+            "SELECT id, due_at, post_count FROM scheduled_posts WHERE user_id = ? AND claimed_at IS NULL"
+            " ORDER BY due_at LIMIT ?",
+            (user_id, limit)
+        ).fetchall()
+
+    def remove(self, job_id, user_id):
+        # Job yang sedang diserahkan ke antrian publish sudah tidak bisa dibatalkan
+        cursor = self._conn.execute(
+            "DELETE FROM scheduled_posts WHERE id = ? AND user_id = ? AND claimed_at IS NULL", (job_id, user_id)
+        )
+        return cursor.rowcount > 0
+
+    def close(self):
+        self._conn.close()
+
+
+class PostScheduler:
+    """Satu task yang tidur sampai job terdekat jatuh tempo; `schedule` membangunkannya jika perlu.
+
+    Job yang jatuh tempo diserahkan ke `on_due(ScheduledPost)` (coroutine) per batch `batch_size`.
+    Tidak ada timer per job, jadi ribuan job yang menunggu hanya berupa baris di SQLite.
+    """
+
+    def __init__(self, path, batch_size=100, shard=(0, 1)):
+        self.path = path
+        self.shard = shard
+        self.on_due = None
+        self.batch_size = batch_size
+        self.pending = 0
+        self._store = None
+        self._next_due = None
+        self._wake = asyncio.Event()
+        self._executor = None
+        self._task = None
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def start(self, on_due):
+        self.on_due = on_due
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scheduler")
+        self._store = await self._run(ScheduleStore, self.path, self.shard)
+        released = await self._run(self._store.release_claimed)
+        if released:
+            logger.warning("%d post terjadwal belum selesai diserahkan saat bot berhenti, dikirim ulang", released)
+        self.pending = await self._run(self._store.count)
+        self._next_due = await self._run(self._store.next_due)
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._store is not None:
+            await self._run(self._store.close)
+            self._store = None
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    async def schedule(self, due_at, user_id, chat_id, data):
+        job_id = await self._run(self._store.add, due_at, user_id, chat_id, data)
+        self.pending += 1
+        if self._next_due is None or due_at < self._next_due:
+            self._next_due = due_at
+            self._wake.set()
+        return job_id
+
+    async def list_for_user(self, user_id, limit=20):
+        return await self._run(self._store.list_for_user, user_id, limit)
+
+    async def cancel(self, job_id, user_id):
+        removed = await self._run(self._store.remove, job_id, user_id)
+        if removed:
+            self.pending -= 1
+        # _next_due boleh lebih awal dari kenyataan: paling-paling task bangun tanpa pekerjaan
+        return removed
+
+    async def _loop(self):
+        while True:
+            timeout = MAX_SLEEP if self._next_due is None else min(MAX_SLEEP, self._next_due - time.time())
+            if timeout > 0:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                if self._next_due is None or self._next_due > time.time():
+                    continue
+            try:
+                await self._dispatch_due()
+            except Exception as e:
+                logger.exception("Error dispatching scheduled posts: %s", e)
+                await asyncio.sleep(5)
+
+    async def _dispatch_due(self):
+        while True:
+            jobs = await self._run(self._store.take_due, time.time(), self.batch_size)
+            self.pending -= len(jobs)
+            for job in jobs:
+                try:
+                    await self.on_due(job)
+                except Exception as e:
+                    logger.exception("Error publishing scheduled post %s: %s", job.id, e, extra={"user_id": job.user_id})
+                    await self._run(self._store.retry, job.id, time.time() + RETRY_DELAY)
+                    self.pending += 1
+                    continue
+                await self._run(self._store.finish, job.id)
+            if len(jobs) < self.batch_size:
+                break
+        self._next_due = await self._run(self._store.next_due)
@@ -0,0 +1,216 @@
+"""Draft postingan per user dan penyimpanannya di memori (TTL idle + batas LRU)."""
+import asyncio
+import sys
+import time
+from collections import OrderedDict
+
+from telegram import InlineKeyboardMarkup
+
+POST_STATES = {
+    'WAITING_FOR_MEDIA': 'waiting_for_media',
+    'WAITING_FOR_LINK': 'waiting_for_link',
+    'WAITING_FOR_IMPORT': 'waiting_for_import',
+    'WAITING_FOR_SCHEDULE': 'waiting_for_schedule',
+    'EDITING': 'editing'
+}
+
+
+class Post:
+    """Satu postingan dalam draft: gambar, caption, set button bersama (opsional) dan button tambahannya."""
+
+    __slots__ = ("photo", "text", "buttons", "button_set")
+
+    def __init__(self, photo, text, buttons=None, button_set=None):
+        self.photo = photo
+        self.text = text
+        self.buttons = buttons if buttons is not None else []
+        self.button_set = button_set  # ButtonSet, dipakai bersama oleh banyak post
+
+    @property
+    def all_buttons(self):
+        if self.button_set is None:
+            return self.buttons
+        return list(self.button_set.buttons) + self.buttons
+
+    @property
+    def markup(self):
+        """Keyboard untuk preview dan publish; post yang hanya memakai set mendapat markup milik set."""
+        if not self.buttons:
+            return self.button_set.markup if self.button_set else None
+        return InlineKeyboardMarkup([[button] for button in self.all_buttons])
+
+
+class PreviewSession:
+    """Pesan preview dan panel edit yang sedang tampil, supaya bisa diedit di tempat."""
+
+    __slots__ = ("chat_id", "preview_message_id", "control_message_id", "is_photo", "index")
+
+    def __init__(self, chat_id, preview_message_id, control_message_id, is_photo=True, index=0):
+        self.chat_id = chat_id
+        self.preview_message_id = preview_message_id
+        self.control_message_id = control_message_id
+        self.is_photo = is_photo
+        self.index = index  # post yang gambarnya sedang tampil
+
+
+class PostData:
+    __slots__ = ("entries", "state", "is_multiple", "current_index", "preview", "revision")
+
+    def __init__(self, is_multiple=False):
+        self.entries = []  # list of Post
+        self.state = POST_STATES['WAITING_FOR_MEDIA']
+        self.is_multiple = is_multiple
+        self.current_index = 0
+        self.preview = None  # PreviewSession
+        # Naik setiap kali isi/posisi draft berubah; keyboard lama dengan revisi berbeda ditolak.
+        # Nilai awal dari jam supaya keyboard draft yang sudah dibatalkan tidak cocok dengan draft baru.
+        self.revision = int(time.time() * 1000) % 1_000_000_000
+
+    @property
+    def current(self):
+        return self.entries[self.current_index]
+
+    @property
+    def is_last(self):
+        return self.current_index >= len(self.entries) - 1
+
+
+def _sizeof(obj, seen):
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, int, float, bool)) or obj is None:
+        return size
+    if isinstance(obj, dict):
+        return size + sum(_sizeof(k, seen) + _sizeof(v, seen) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return size + sum(_sizeof(item, seen) for item in obj)
+    for cls in type(obj).__mro__:
+        for slot in getattr(cls, "__slots__", ()):
+            # Objek telegram menyimpan referensi ke Bot bersama; jangan ikut dihitung
+            if slot != "_bot":
+                size += _sizeof(getattr(obj, slot, None), seen)
+    if hasattr(obj, "__dict__"):
+        size += _sizeof(vars(obj), seen)
+    return size
+
+
+class SessionStore:
+    """Mapping user_id → PostData dengan TTL idle dan batas jumlah entri (LRU).
+
+    Entri yang kedaluwarsa atau tergusur diteruskan ke `on_discard(user_id, post_data, reason)`
+    (dipanggil langsung, sebelum operasi yang memicu penggusuran selesai) lalu ke callback
+    `on_evict(user_id, post_data, reason)` (coroutine) supaya user bisa diberi tahu bahwa draft-nya dibuang.
+    """
+
+    EVICT_IDLE = "idle"
+    EVICT_CAPACITY = "capacity"
+
+    def __init__(self, ttl=6 * 3600, max_entries=500, sweep_interval=60):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.sweep_interval = sweep_interval
+        self.evicted = 0
+        self._entries = OrderedDict()  # user_id -> (post_data, last_access); urutan = LRU
+        self._on_evict = None
+        self._on_discard = None
+        self._sweeper = None
+
+    def start(self, on_evict=None, on_discard=None):
+        self._on_evict = on_evict
+        self._on_discard = on_discard
+        self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    async def stop(self):
+        if self._sweeper:
+            self._sweeper.cancel()
+            await asyncio.gather(self._sweeper, return_exceptions=True)
+            self._sweeper = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, user_id):
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return False
+        if time.monotonic() - entry[1] > self.ttl:
+            self._evict(user_id, self.EVICT_IDLE)
+            return False
+        return True
+
+    def __getitem__(self, user_id):
+        if user_id not in self:
+            raise KeyError(user_id)
+        post_data, _ = self._entries[user_id]
+        self._entries[user_id] = (post_data, time.monotonic())
+        self._entries.move_to_end(user_id)
+        return post_data
+
+    def get(self, user_id, default=None):
+        try:
+            return self[user_id]
+        except KeyError:
+            return default
+
+    def __setitem__(self, user_id, post_data):
+        self._entries.pop(user_id, None)
+        self._entries[user_id] = (post_data, time.monotonic())
+        while len(self._entries) > self.max_entries:
+            self._evict(next(iter(self._entries)), self.EVICT_CAPACITY)
+
+    def __delitem__(self, user_id):
+        del self._entries[user_id]
+
+    def pop(self, user_id, default=None):
+        entry = self._entries.pop(user_id, None)
+        return entry[0] if entry else default
+
+    def expire(self):
+        """Buang semua draft yang idle lebih lama dari TTL; kembalikan jumlahnya."""
+        deadline = time.monotonic() - self.ttl
+        expired = 0
+        # Urutan LRU: yang paling lama tidak disentuh ada di depan
+        while self._entries:
+            user_id, (_, last_access) = next(iter(self._entries.items()))
+            if last_access > deadline:
+                break
+            self._evict(user_id, self.EVICT_IDLE)
+            expired += 1
+        return expired
+
+    def _evict(self, user_id, reason):
+        post_data, _ = self._entries.pop(user_id)
+        self.evicted += 1
+        if self._on_discard:
+            self._on_discard(user_id, post_data, reason)
+        if self._on_evict:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                return
+            loop.create_task(self._on_evict(user_id, post_data, reason))
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            self.expire()
+
+    def stats(self):
+        """Perkiraan pemakaian memori draft (dihitung saat dipanggil, O(jumlah draft))."""
+        seen = set()
+        total_bytes = 0
+        total_posts = 0
+        for post_data, _ in self._entries.values():
+            total_bytes += _sizeof(post_data, seen)
+            total_posts += len(post_data.entries)
+        oldest = next(iter(self._entries.values()))[1] if self._entries else None
+        return {
+            "sessions": len(self._entries),
+            "max_sessions": self.max_entries,
+            "posts": total_posts,
+            "approx_bytes": total_bytes,
+            "oldest_idle_seconds": int(time.monotonic() - oldest) if oldest is not None else 0,
+            "evicted": self.evicted,
+        }
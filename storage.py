@@ -0,0 +1,237 @@
+"""Penyimpanan draft persisten (default SQLite WAL) dengan write-behind batching."""
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from telegram import InlineKeyboardButton
+
+from buttons import ButtonSet
+from sessions import Post, PostData, PreviewSession
+
+logger = logging.getLogger(__name__)
+
+
+def open_database(path):
+    """Buka koneksi SQLite dalam mode WAL; dipakai bersama oleh semua tabel bot."""
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    # WAL + NORMAL: commit tidak menunggu fsync, tapi database tetap konsisten setelah crash
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def dump_post_data(post_data):
+    preview = post_data.preview
+    # Set button ditulis sekali per draft, entry cukup menyimpan namanya
+    button_sets = {post.button_set.name: post.button_set for post in post_data.entries if post.button_set}
+    return {
+        "is_multiple": post_data.is_multiple,
+        "state": post_data.state,
+        "current_index": post_data.current_index,
+        "revision": post_data.revision,
+        "entries": [
+            [post.photo, post.text, [[button.text, button.url] for button in post.buttons],
+             post.button_set.name if post.button_set else None]
+            for post in post_data.entries
+        ],
+        "button_sets": {name: button_set.dump() for name, button_set in button_sets.items()},
+        "preview": [
+            preview.chat_id, preview.preview_message_id, preview.control_message_id,
+            preview.is_photo, preview.index,
+        ] if preview else None,
+    }
+
+
+def load_post_data(data):
+    post_data = PostData(is_multiple=data["is_multiple"])
+    post_data.state = data["state"]
+    post_data.current_index = data["current_index"]
+    post_data.revision = data.get("revision", 0)
+    button_sets = {name: ButtonSet.load(name, buttons) for name, buttons in data.get("button_sets", {}).items()}
+    post_data.entries = [
+        Post(
+            photo, text, [InlineKeyboardButton(name, url=url) for name, url in buttons],
+            button_sets.get(set_name[0]) if set_name else None
+        )
+        # Draft lama tidak punya kolom nama set
+        for photo, text, buttons, *set_name in data["entries"]
+    ]
+    if data.get("preview"):
+        post_data.preview = PreviewSession(*data["preview"])
+    return post_data
+
+
+class DraftBackend:
+    """Antarmuka backend draft. Semua method dipanggil dari satu thread penulis."""
+
+    # False jika isi backend hilang saat proses mati
+    durable = True
+
+    def load(self, user_id):
+        """Kembalikan dict hasil `dump_post_data` atau None."""
+        raise NotImplementedError
+
+    def save_many(self, drafts):
+        """Simpan banyak draft sekaligus; nilai None berarti hapus."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class MemoryDraftBackend(DraftBackend):
+    """Backend tanpa disk (development / benchmark)."""
+
+    durable = False
+
+    def __init__(self):
+        self._data = {}
+
+    def load(self, user_id):
+        raw = self._data.get(user_id)
+        return json.loads(raw) if raw else None
+
+    def save_many(self, drafts):
+        for user_id, data in drafts.items():
+            if data is None:
+                self._data.pop(user_id, None)
+            else:
+                self._data[user_id] = json.dumps(data)
+
+
+class SQLiteDraftBackend(DraftBackend):
+    def __init__(self, path):
+        self._conn = open_database(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS drafts ("
+            " user_id INTEGER PRIMARY KEY,"
+            " data TEXT NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+
+    def load(self, user_id):
+        row = self._conn.execute("SELECT data FROM drafts WHERE user_id = ?", (user_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save_many(self, drafts):
+        now = time.time()
+        upserts = [(user_id, json.dumps(data), now) for user_id, data in drafts.items() if data is not None]
+        deletes = [(user_id,) for user_id, data in drafts.items() if data is None]
+        # Satu transaksi per batch: satu kali tulis WAL untuk semua perubahan
+        with self._conn:
+            self._conn.execute("BEGIN")
+            if upserts:
+                self._conn.executemany(
+                    "INSERT INTO drafts (user_id, data, updated_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(user_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+                    upserts
+                )
+            if deletes:
+                self._conn.executemany("DELETE FROM drafts WHERE user_id = ?", deletes)
+
+    def close(self):
+        self._conn.close()
+
+
+class DraftPersistence:
+    """Write-behind di atas DraftBackend.
+
+    Handler cukup memanggil `mark_dirty` (O(1), tanpa I/O); draft yang berubah diserialisasi
+    dan ditulis dalam satu batch tiap `flush_interval` detik di thread terpisah.
+    """
+
+    def __init__(self, backend_factory, flush_interval=0.5, max_missing=10000):
+        self.backend_factory = backend_factory
+        self.backend = None
+        self.flush_interval = flush_interval
+        self.max_missing = max_missing
+        self._dirty = {}  # user_id -> PostData, atau None untuk hapus
+        # User yang sudah dicek dan memang tidak punya draft tersimpan; LRU terbatas supaya tidak
+        # tumbuh terus oleh user yang hanya lewat (termasuk yang tidak diizinkan). Entri yang
+        # terbuang hanya berarti satu kali baca ulang ke backend.
+        self._missing = OrderedDict()
+        self._executor = None
+        self._task = None
+
+    async def start(self):
+        # Satu thread saja: koneksi SQLite dipakai berurutan, baca dan tulis tidak saling mendahului
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="drafts")
+        self.backend = await asyncio.get_running_loop().run_in_executor(self._executor, self.backend_factory)
+        self._task = asyncio.create_task(self._flush_loop())
+
+    @property
+    def durable(self):
+        return self.backend is not None and self.backend.durable
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+        if self.backend is not None:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self.backend.close)
+            self.backend = None
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def mark_dirty(self, user_id, post_data):
+        """Catat bahwa draft user berubah (None = draft dihapus)."""
+        if post_data is None:
+            if user_id in self._missing:
+                self._missing.move_to_end(user_id)
+                return  # sudah diketahui tidak ada, atau penghapusannya sudah antre
+            self._remember_missing(user_id)
+        else:
+            self._missing.pop(user_id, None)
+        self._dirty[user_id] = post_data
+
+    async def load(self, user_id):
+        """Ambil draft tersimpan (lazy, sekali per user setelah restart)."""
+        if user_id in self._missing:
+            self._missing.move_to_end(user_id)
+            return None
+        if self.backend is None:
+            return None
+        if user_id in self._dirty:
+            return self._dirty[user_id]
+        data = await asyncio.get_running_loop().run_in_executor(self._executor, self.backend.load, user_id)
+        if data is None:
+            self._remember_missing(user_id)
+            return None
+        return load_post_data(data)
+
+    def _remember_missing(self, user_id):
+        self._missing[user_id] = None
+        self._missing.move_to_end(user_id)
+        while len(self._missing) > self.max_missing:
+            self._missing.popitem(last=False)
+
+    async def flush(self):
+        if not self._dirty or self.backend is None:
+            return
+        pending, self._dirty = self._dirty, {}
+        batch = {
+            user_id: dump_post_data(post_data) if post_data is not None else None
+            for user_id, post_data in pending.items()
+        }
+        try:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self.backend.save_many, batch)
+        except Exception:
+            # Kembalikan ke antrian kecuali sudah ada perubahan yang lebih baru
+            for user_id, post_data in pending.items():
+                self._dirty.setdefault(user_id, post_data)
+            raise
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.exception("Error flushing drafts: %s", e)
@@ -0,0 +1,68 @@
+"""Load shedding di PerUserUpdateProcessor: jumlah update yang menunggu tetap terbatas saat dibanjiri."""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram import Update  # noqa: E402
+
+from concurrency import OVERLOADED, PerUserUpdateProcessor  # noqa: E402
+
+
+def _text_update(update_id, user_id):
+    return Update.de_json({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "u"},
+            "text": "halo",
+        },
+    }, None)
+
+
+async def _flood(processor, users, count):
+    """Kirim `count` update per user sementara handler tertahan; kembalikan (pending tertinggi, drop)."""
+    release = asyncio.Event()
+    dropped = []
+    processor.on_drop = lambda update, reason: dropped.append(reason)
+
+    async def handler():
+        await release.wait()
+
+    highest = 0
+    tasks = []
+    update_ids = iter(range(1, 1 << 30))
+    for _ in range(count):
+        for user_id in users:
+            tasks.append(asyncio.create_task(processor.process_update(_text_update(next(update_ids), user_id), handler())))
+            await asyncio.sleep(0)
+            highest = max(highest, processor.pending)
+    release.set()
+    await asyncio.gather(*tasks)
+    return highest, dropped
+
+
+def test_flood_from_one_user_is_bounded():
+    async def run():
+        processor = PerUserUpdateProcessor(8, max_pending=1000, max_user_pending=20)
+        highest, dropped = await _flood(processor, [1000], 500)
+        assert highest <= 20
+        assert len(dropped) == 500 - highest
+        assert set(dropped) == {OVERLOADED}
+        assert processor.pending == 0
+
+    asyncio.run(run())
+
+
+def test_flood_from_many_users_is_bounded():
+    async def run():
+        processor = PerUserUpdateProcessor(8, max_pending=100, max_user_pending=50)
+        highest, dropped = await _flood(processor, range(1000, 1050), 10)
+        assert highest <= 100
+        assert len(dropped) == 500 - 100
+        assert processor.pending == 0
+
+    asyncio.run(run())
@@ -0,0 +1,226 @@
+"""Mode webhook: HTTP listener kecil di atas asyncio yang mengisi update_queue Application."""
+import asyncio
+import hmac
+import json
+import logging
+import signal
+from urllib.parse import urlsplit
+
+from telegram import Update
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "x-telegram-bot-api-secret-token"
+MAX_BODY_SIZE = 1 << 20
+
+_REASONS = {
+    200: "OK",
+    204: "No Content",
+    400: "Bad Request",
+    403: "Forbidden",
+    404: "Not Found",
+    413: "Payload Too Large",
+    429: "Too Many Requests",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+class Request:
+    __slots__ = ("method", "path", "query", "headers", "body")
+
+    def __init__(self, method, path, query, headers, body):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body or b"null")
+
+
+def json_response(data, status=200):
+    return status, json.dumps(data).encode(), "application/json"
+
+
+class HTTPServer:
+    """HTTP/1.1 server minimal (keep-alive, Content-Length) tanpa dependency tambahan.
+
+    Route didaftarkan per (method, path); path yang diakhiri "*" dicocokkan sebagai prefix.
+    Handler menerima `Request` dan mengembalikan tuple (status, body, content_type).
+    """
+
+    def __init__(self, max_body_size=MAX_BODY_SIZE):
+        self.max_body_size = max_body_size
+        self._routes = {}
+        self._prefix_routes = []
+        self._server = None
+
+    def route(self, method, path, handler):
+        if path.endswith("*"):
+            self._prefix_routes.append((method, path[:-1], handler))
+        else:
+            self._routes[(method, path)] = handler
+
+    @property
+    def port(self):
+        return self._server.sockets[0].getsockname()[1] if self._server else None
+
+    async def start(self, host, port):
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def _find_handler(self, method, path):
+        handler = self._routes.get((method, path))
+        if handler:
+            return handler
+        for route_method, prefix, prefix_handler in self._prefix_routes:
+            if route_method == method and path.startswith(prefix):
+                return prefix_handler
+        return None
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self._write(writer, 400, b"", "text/plain", False)
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = headers.get("content-length", "0") or "0"
+                if not (length.isascii() and length.isdigit()):
+                    # Bukan angka (atau negatif): panjang body tidak bisa dipercaya, tutup koneksi
+                    await self._write(writer, 400, b"", "text/plain", False)
+                    break
+                length = int(length)
+                if length > self.max_body_size:
+                    await self._write(writer, 413, b"", "text/plain", False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                parts = urlsplit(target)
+                request = Request(method, parts.path, parts.query, headers, body)
+
+                handler = self._find_handler(method, request.path)
+                if handler is None:
+                    status, payload, content_type = 404, b"", "text/plain"
+                else:
+                    try:
+                        status, payload, content_type = await handler(request)
+                    except Exception as e:
+                        logger.exception("Error handling %s %s: %s", method, request.path, e)
+                        status, payload, content_type = 500, b"", "text/plain"
+
+                await self._write(writer, status, payload, content_type, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            # Koneksi putus atau server dimatikan; tidak ada yang perlu dibalas
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _write(writer, status, payload, content_type, keep_alive):
+        head = (
+            f"HTTP/1.1 {status} {_REASONS.get(status, 'Unknown')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + payload)
+        await writer.drain()
+
+
+def add_webhook_routes(server, application, url_path, secret_token=None):
+    """Daftarkan endpoint webhook (dengan cek secret token) dan health check."""
+
+    async def receive_update(request):
+        if secret_token:
+            received = request.headers.get(SECRET_HEADER, "")
+            if not hmac.compare_digest(received.encode(), secret_token.encode()):
+                return 403, b"", "text/plain"
+        try:
+            data = request.json()
+        except ValueError:
+            return 400, b"", "text/plain"
+        if not isinstance(data, dict):
+            return 400, b"", "text/plain"
+        if not application.running:
+            # Sedang start / shutdown: biarkan pengirim (Telegram atau front cluster) mengulang
+            return 503, b"", "text/plain"
+
+        await application.update_queue.put(Update.de_json(data, application.bot))
+        return 200, b"", "text/plain"
+
+    async def health(request):
+        status = 200 if application.running else 503
+        return json_response({"status": "ok" if status == 200 else "starting", "running": application.running}, status)
+
+    server.route("POST", url_path, receive_update)
+    server.route("GET", "/healthz", health)
+
+
+async def serve_webhook(application, *, listen, port, url_path, webhook_url, secret_token=None,
+                        stop_event=None, drop_pending_updates=False, server=None):
+    """Jalankan Application dalam mode webhook sampai stop_event di-set (atau SIGINT/SIGTERM).
+
+    `server` boleh diisi HTTPServer yang sudah punya route lain (misalnya /metrics).
+    Tanpa `webhook_url`, webhook tidak didaftarkan ke Telegram (worker di belakang front cluster).
+    """
+    server = server or HTTPServer()
+    add_webhook_routes(server, application, url_path, secret_token)
+
+    if stop_event is None:
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop_event.set)
+            except NotImplementedError:
+                pass
+
+    await application.initialize()
+    if application.post_init:
+        await application.post_init(application)
+    try:
+        await application.start()
+        await server.start(listen, port)
+        if webhook_url:
+            # Daftarkan webhook setelah listener siap supaya push pertama tidak ditolak
+            await application.bot.set_webhook(
+                url=webhook_url,
+                secret_token=secret_token or None,
+                allowed_updates=Update.ALL_TYPES,
+                drop_pending_updates=drop_pending_updates,
+            )
+        logger.info("Webhook aktif di %s:%s%s", listen, server.port, url_path)
+        await stop_event.wait()
+    finally:
+        await server.stop()
+        if application.running:
+            await application.stop()
+            if application.post_stop:
+                await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)